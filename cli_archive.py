@@ -0,0 +1,242 @@
+"""
+Append-only archive of the cli outputs of a run.
+
+Each output is compressed into its own block and appended to <path>. A sidecar index, <path>.idx, gets one json line per output:
+{"router", "command", "step", "timestamp", "offset", "length", "size"}, where offset and length locate the compressed block.
+Readers memory-map the archive, so any output can be pulled by router, command, or step without reading the rest.
+
+Parent_Test archives every exec_commands() output when test_data["cli_archive"] is set (see Parent_Test.get_cli_archive()).
+
+Usage
+-----
+python cli_archive.py run.cliarc --router rtsw-1 --command "show bgp" --last
+python cli_archive.py run.cliarc --step "Wait for BGP" --list
+"""
+
+import argparse, json, mmap, os, re, sys, threading, zlib
+from time import time
+from typing import List
+
+
+class CliArchiveWriter:
+    """
+    Appends outputs to an archive. Safe to use from several threads.
+
+    path: str
+
+    level: int (default: 6)
+        zlib compression level.
+
+    flush_every: int (default: 50)
+        Outputs buffered before the files are flushed. flush() and close() also flush them.
+    """
+
+    def __init__(self, path: str, level: int = 6, flush_every: int = 50):
+        self.path = path
+        self.level = level
+        self.flush_every = flush_every
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.data_file = open(path, "ab")
+        self.index_file = open(f"{path}.idx", "a", encoding="utf-8")
+        self.offset = self.data_file.tell()
+        self.unflushed = 0
+        self.outputs = 0
+        self.size = 0
+        self.compressed_size = 0
+        self.lock = threading.Lock()
+
+    def add(self, router: str, command: str, output, step: str = "") -> dict:
+        """
+        Appends an output and returns its index entry.
+        """
+        output = output if isinstance(output, str) else str(output)
+        encoded_output = output.encode("utf-8", errors="replace")
+        block = zlib.compress(encoded_output, self.level)
+
+        with self.lock:
+            entry = {
+                "router": router,
+                "command": command,
+                "step": step,
+                "timestamp": round(time(), 3),
+                "offset": self.offset,
+                "length": len(block),
+                "size": len(encoded_output),
+            }
+            # the block is written before its index entry, so every indexed entry has its data
+            self.data_file.write(block)
+            self.index_file.write(json.dumps(entry) + "\n")
+            self.offset += len(block)
+            self.outputs += 1
+            self.size += len(encoded_output)
+            self.compressed_size += len(block)
+            self.unflushed += 1
+            if self.unflushed >= self.flush_every:
+                self._flush()
+        return entry
+
+    def _flush(self):
+        self.data_file.flush()
+        self.index_file.flush()
+        self.unflushed = 0
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            if not self.data_file.closed:
+                self._flush()
+                self.data_file.close()
+                self.index_file.close()
+
+    def summary(self) -> str:
+        return (
+            f"archived {self.outputs} cli outputs in {self.path} "
+            f"({self.size / 1e6:.1f} MB, {self.compressed_size / 1e6:.1f} MB compressed)"
+        )
+
+
+class CliArchive:
+    """
+    Reads an archive written by CliArchiveWriter.
+    Index entries without data, e.g. from a run that was killed mid-write, are ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = []
+        self.load()
+
+    def load(self):
+        """
+        (Re)reads the index, and maps the archive into memory.
+        """
+        self.data_file = open(self.path, "rb")
+        data_size = os.fstat(self.data_file.fileno()).st_size
+        self.data = (
+            mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if data_size
+            else b""
+        )
+
+        self.entries = []
+        with open(f"{self.path}.idx", encoding="utf-8") as index_file:
+            for line in index_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry["offset"] + entry["length"] <= data_size:
+                    self.entries.append(entry)
+
+        self.by_router = {}
+        for position, entry in enumerate(self.entries):
+            self.by_router.setdefault(entry["router"], []).append(position)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def output(self, entry: dict) -> str:
+        block = self.data[entry["offset"] : entry["offset"] + entry["length"]]
+        return zlib.decompress(block).decode("utf-8")
+
+    def find(
+        self,
+        router: str = None,
+        command: str = None,
+        step: str = None,
+        since: float = None,
+        until: float = None,
+    ) -> List[dict]:
+        """
+        Returns the index entries, in the order they were archived, that match every given criterion.
+
+        router: str
+            Exact router name.
+
+        command, step: str
+            Regexes searched in the command and the step title.
+
+        since, until: float
+            Timestamps (seconds since the epoch).
+        """
+        if router is None:
+            positions = range(len(self.entries))
+        else:
+            positions = self.by_router[router] if router in self.by_router else []
+        command_pattern = re.compile(command) if command is not None else None
+        step_pattern = re.compile(step) if step is not None else None
+
+        return [
+            self.entries[position]
+            for position in positions
+            if (
+                command_pattern is None
+                or command_pattern.search(self.entries[position]["command"])
+            )
+            and (
+                step_pattern is None
+                or step_pattern.search(self.entries[position]["step"])
+            )
+            and (since is None or self.entries[position]["timestamp"] >= since)
+            and (until is None or self.entries[position]["timestamp"] <= until)
+        ]
+
+    def search(self, **criteria) -> List[str]:
+        """
+        Returns the outputs of the entries that match the criteria (see find()).
+        """
+        return [self.output(entry) for entry in self.find(**criteria)]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pull cli outputs from an archive.")
+    parser.add_argument("path")
+    parser.add_argument("--router", default=None)
+    parser.add_argument("--command", default=None, help="Regex searched in commands")
+    parser.add_argument("--step", default=None, help="Regex searched in step titles")
+    parser.add_argument(
+        "--list", action="store_true", help="List the matching entries without outputs"
+    )
+    parser.add_argument(
+        "--last", action="store_true", help="Only show the last matching entry"
+    )
+    arguments = parser.parse_args(argv)
+
+    with CliArchive(arguments.path) as archive:
+        entries = archive.find(
+            router=arguments.router, command=arguments.command, step=arguments.step
+        )
+        if arguments.last:
+            entries = entries[-1:]
+
+        for entry in entries:
+            header = f"[{entry['timestamp']:.3f}] {entry['router']}: {entry['command']}"
+            header += f" (step: {entry['step']})" if entry["step"] else ""
+            if arguments.list:
+                print(f"{header}, {entry['size']} bytes")
+            else:
+                print(header)
+                print(archive.output(entry))
+                print()
+
+    return 0 if entries else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
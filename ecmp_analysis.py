@@ -0,0 +1,288 @@
+"""
+Load-balance analysis for ECMP rates.
+
+Rates are kept as a NumPy array shaped (samples, members), where a member is an ECMP path (e.g. an outbound interface).
+Members are grouped by device, and every metric is computed for all samples, for all members and for each device in one pass.
+Every metric is scale-free, so the verdicts don't depend on the unit of the rates (Mbps, pps, ...).
+Devices without members are left out of the analysis.
+"""
+
+from statistics import NormalDist
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+# method name -> default parameters
+DEFAULT_METHODS = {
+    "min_ratio": {"ratio": 0.8},
+    "stdev_band": {"stdev": 3},
+    "threshold": {"threshold": None},
+    "cv": {"maximum": 0.1},
+    "jain": {"minimum": 0.95},
+    "max_min_ratio": {"maximum": 1.5},
+}
+
+
+class RunningStats:
+    """
+    Per-member running mean and variance (Welford's algorithm).
+    Memory stays O(members) no matter how many samples are added.
+    """
+
+    def __init__(self, members: int):
+        self.count = 0
+        self.mean = np.zeros(members)
+        self.m2 = np.zeros(members)  # sum of squared differences from the mean
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def confidence_half_width(self, confidence: float = 0.95) -> np.ndarray:
+        """
+        Half width of each member's confidence interval for the mean (normal approximation).
+        """
+        if self.count < 2:
+            return np.full_like(self.mean, np.inf)
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return z * self.std / np.sqrt(self.count)
+
+    def is_precise(
+        self, relative_precision: float, confidence: float = 0.95, min_samples: int = 3
+    ) -> bool:
+        """
+        Returns True if every member's confidence interval is within +/- relative_precision of its mean.
+        """
+        if self.count < max(2, min_samples):
+            return False
+        return bool(
+            np.all(
+                self.confidence_half_width(confidence)
+                <= relative_precision * np.abs(self.mean)
+            )
+        )
+
+
+def to_rate_matrix(
+    data: Union[list, dict, np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray, List[str], List[str]]:
+    """
+    Converts rates into (rates, groups, devices, empty_devices).
+
+    data: list, np.ndarray, or dict
+        [rate, ...] or [[rate, ...], ...] shaped (members,) or (samples, members), or
+        {device: rates shaped (members,) or (samples, members)}.
+        All devices must have the same number of samples.
+
+    Output
+    ------
+    rates: np.ndarray shaped (samples, members)
+    groups: np.ndarray shaped (members,), the index of each member's device in devices
+    devices: names of the devices with at least one member ([""] if data is not a dict)
+    empty_devices: names of the devices without members
+    """
+    if not isinstance(data, dict):
+        data = {"": data}
+
+    blocks, devices, empty_devices = [], [], []
+    for device, rates in data.items():
+        rates = np.asarray(rates, dtype=float)
+        if rates.ndim == 1:
+            rates = rates[np.newaxis, :]
+        if rates.shape[-1] == 0:
+            empty_devices.append(device)
+            continue
+        blocks.append(rates)
+        devices.append(device)
+
+    if not blocks:
+        return np.empty((1, 0)), np.empty(0, dtype=int), [], empty_devices
+
+    sample_counts = {block.shape[0] for block in blocks}
+    if len(sample_counts) > 1:
+        raise ValueError(
+            f"All devices must have the same number of samples, got {sorted(sample_counts)}"
+        )
+
+    groups = np.repeat(np.arange(len(blocks)), [block.shape[1] for block in blocks])
+    return np.concatenate(blocks, axis=1), groups, devices, empty_devices
+
+
+def _metrics(
+    sums, sums_of_squares, counts, minimums, maximums
+) -> Dict[str, np.ndarray]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sums / counts
+        variance = np.clip(sums_of_squares / counts - mean**2, 0, None)
+        std = np.sqrt(variance)
+        return {
+            "members": np.broadcast_to(counts, mean.shape),
+            "mean": mean,
+            "std": std,
+            "min": minimums,
+            "max": maximums,
+            "cv": np.where(mean > 0, std / mean, np.inf),
+            "jain": np.where(
+                sums_of_squares > 0, sums**2 / (counts * sums_of_squares), 1.0
+            ),
+            "max_min_ratio": np.where(minimums > 0, maximums / minimums, np.inf),
+        }
+
+
+def distribution_metrics(
+    rates: np.ndarray, groups: np.ndarray = None
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Returns (overall, per_device) metrics: members, mean, std, min, max, cv (coefficient of variation), jain (Jain's fairness index), and max_min_ratio.
+    overall metrics are shaped (samples,), and per_device metrics are shaped (samples, devices).
+    """
+    rates = np.atleast_2d(np.asarray(rates, dtype=float))
+    if groups is None:
+        groups = np.zeros(rates.shape[1], dtype=int)
+
+    overall = _metrics(
+        rates.sum(axis=1),
+        (rates**2).sum(axis=1),
+        rates.shape[1],
+        rates.min(axis=1),
+        rates.max(axis=1),
+    )
+
+    order = np.argsort(groups, kind="stable")
+    rates, groups = rates[:, order], groups[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    counts = np.diff(np.r_[starts, len(groups)])
+    per_device = _metrics(
+        np.add.reduceat(rates, starts, axis=1),
+        np.add.reduceat(rates**2, starts, axis=1),
+        counts,
+        np.minimum.reduceat(rates, starts, axis=1),
+        np.maximum.reduceat(rates, starts, axis=1),
+    )
+
+    return overall, per_device
+
+
+def check(method: str, metrics: Dict[str, np.ndarray], **params) -> np.ndarray:
+    """
+    Evaluates a method against metrics from distribution_metrics(), and returns whether each sample (and device) passed.
+
+    method: str
+        min_ratio: minimum >= ratio * average
+        stdev_band: all rates fall within average +/- stdev standard deviations
+        threshold: all rates fall within average +/- threshold
+        cv: coefficient of variation <= maximum
+        jain: Jain's fairness index >= minimum
+        max_min_ratio: maximum / minimum <= maximum
+    """
+    params = {**DEFAULT_METHODS[method], **params}
+    mean, std = metrics["mean"], metrics["std"]
+
+    if method == "min_ratio":
+        return metrics["min"] >= params["ratio"] * mean
+    elif method == "stdev_band":
+        band = params["stdev"] * std
+        return (metrics["min"] >= mean - band) & (metrics["max"] <= mean + band)
+    elif method == "threshold":
+        if params["threshold"] is None:
+            raise ValueError("The threshold method needs a threshold")
+        return (metrics["min"] >= mean - params["threshold"]) & (
+            metrics["max"] <= mean + params["threshold"]
+        )
+    elif method == "cv":
+        return metrics["cv"] <= params["maximum"]
+    elif method == "jain":
+        return metrics["jain"] >= params["minimum"]
+    elif method == "max_min_ratio":
+        return metrics["max_min_ratio"] <= params["maximum"]
+
+
+def analyze(
+    data: Union[list, dict, np.ndarray],
+    methods: Union[list, dict] = None,
+    scope: str = "overall",
+) -> dict:
+    """
+    Computes distribution metrics for data (see to_rate_matrix()), then evaluates each method (see check()).
+
+    methods: list or dict (default: None)
+        [method, ...] or {method: {parameter: value}}. If None, use {"min_ratio": {"ratio": 0.8}}.
+
+    scope: str (default: "overall")
+        "overall" checks all members together, "device" checks each device's members separately, and "both" does both.
+
+    Output
+    ------
+    {
+        "devices": [device, ...],
+        "empty_devices": [device without members, ...], which are skipped,
+        "samples": number of samples,
+        "overall": {metric: np.ndarray shaped (samples,)},
+        "per_device": {metric: np.ndarray shaped (samples, devices)},
+        "checks": {
+            method: {
+                "overall": np.ndarray of bool shaped (samples,),
+                "per_device": np.ndarray of bool shaped (samples, devices),
+                "passed": bool,
+            }
+        },
+        "passed": bool,
+    }
+    """
+    if methods is None:
+        methods = {"min_ratio": {}}
+    elif not isinstance(methods, dict):
+        methods = {method: {} for method in methods}
+
+    unknown_methods = [method for method in methods if method not in DEFAULT_METHODS]
+    if unknown_methods:
+        raise ValueError(f"Unknown ECMP analysis methods: {', '.join(unknown_methods)}")
+    if scope not in ("overall", "device", "both"):
+        raise ValueError(f"Unknown ECMP analysis scope: {scope}")
+
+    rates, groups, devices, empty_devices = to_rate_matrix(data)
+    result = {
+        "devices": devices,
+        "empty_devices": empty_devices,
+        "samples": rates.shape[0],
+        "overall": {},
+        "per_device": {},
+        "checks": {},
+        "passed": True,
+    }
+    if rates.shape[1] == 0:
+        result["passed"] = False
+        return result
+
+    result["overall"], result["per_device"] = distribution_metrics(rates, groups)
+
+    for method, params in methods.items():
+        passed_overall = check(method, result["overall"], **(params or {}))
+        passed_per_device = check(method, result["per_device"], **(params or {}))
+        passed = True
+        if scope in ("overall", "both"):
+            passed = passed and bool(passed_overall.all())
+        if scope in ("device", "both"):
+            passed = passed and bool(passed_per_device.all())
+
+        result["checks"][method] = {
+            "overall": passed_overall,
+            "per_device": passed_per_device,
+            "passed": passed,
+        }
+        result["passed"] = result["passed"] and passed
+
+    return result
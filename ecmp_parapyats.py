@@ -5,28 +5,235 @@ import sys
 
 sys.path.append("cafykit/lib/")
 
-from pyats import aetest
-from pyats.aetest.loop import Iteration
-from pyats.easypy import run
-from ats.log.utils import banner
-import logging
-import sste_common, sste_exr, sste_cxr, sste_trigger, sste_cli_keys, sste_spitfire, sste_tgn
-
-import yaml, pdb, json
-from texttable import Texttable
-import re, random, time, collections
-from functools import reduce
+import re
 from time import time, sleep
 from typing import Any, Union, Dict, List, Tuple
 
-from parapyats import print_, Parent_Test, time_to_string, error_to_string
-import re
+from parapyats import (
+    print_,
+    Parent_Test,
+    time_to_string,
+    error_to_string,
+    ColumnarTable,
+    lazy_import,
+    unique,
+)
+
+ipaddress = lazy_import("ipaddress")
+random = lazy_import("random")
+
+
+class BgpPeerSnapshotStore:
+    """
+    Indexes a golden "show bgp ipv6 unicast summary wide" snapshot by neighbor address, and tracks which peers are not restored yet.
+    Each update() only compares the unrestored peers, and reports what changed since the previous update.
+    Once every peer is restored, the latest snapshot is fully compared once more in case a restored peer has flapped since.
+    """
+
+    def __init__(self, golden_snapshot: dict, fields: List[str] = ["St_PfxRcd"]):
+        self.fields = fields
+        self.golden = self.index(golden_snapshot)
+        self.last = dict(self.golden)
+        self.unrestored = set(self.golden)
+        self.extra = set()
+
+    def index(self, snapshot: Union[dict, ColumnarTable]) -> Dict[str, tuple]:
+        """
+        Returns {neighbor: (field values, ...)}.
+        """
+        if isinstance(snapshot, ColumnarTable):
+            return snapshot.records(self.fields)
+
+        neighbors = (
+            snapshot["Neighbor"] if snapshot and "Neighbor" in snapshot.keys() else {}
+        )
+        return {
+            neighbor: tuple(
+                peer[field] if field in peer.keys() else None for field in self.fields
+            )
+            for neighbor, peer in neighbors.items()
+        }
+
+    def update(self, snapshot: dict) -> dict:
+        """
+        Compares a new snapshot to the golden one.
+
+        Output
+        ------
+        {
+            "restored": [neighbor, ...] restored since the previous update,
+            "changed": {neighbor: (previous values, new values)} for unrestored peers that changed since the previous update,
+            "regressed": [neighbor, ...] restored earlier, but found different in the full check,
+            "new_extra": [neighbor, ...] not in the golden snapshot, that appeared since the previous update,
+        }
+        """
+        current = self.index(snapshot)
+        changes = {"restored": [], "changed": {}, "regressed": [], "new_extra": []}
+
+        for neighbor in list(self.unrestored):
+            values = current[neighbor] if neighbor in current else None
+            if values == self.golden[neighbor]:
+                self.unrestored.discard(neighbor)
+                changes["restored"].append(neighbor)
+            elif values != self.last[neighbor]:
+                changes["changed"][neighbor] = (self.last[neighbor], values)
+            self.last[neighbor] = values
+
+        extra = current.keys() - self.golden.keys()
+        changes["new_extra"] = sorted(extra - self.extra)
+        self.extra = extra
+
+        if not self.unrestored:
+            for neighbor, golden_values in self.golden.items():
+                values = current[neighbor] if neighbor in current else None
+                if values != golden_values:
+                    self.unrestored.add(neighbor)
+                    self.last[neighbor] = values
+                    changes["regressed"].append(neighbor)
+
+        return changes
+
+    def is_restored(self) -> bool:
+        return not self.unrestored and not self.extra
+
+
+class RibResolutionCache:
+    """
+    Per-router cache of IPv6 route resolutions: {route: (next_hop, directly connected interface)}.
+    Entries come from "show route ipv6 <route>" lookups as they are needed, or from one "show route ipv6" dump (see load()), which is searched by longest prefix match.
+    Each router's entries are dropped once its config generation (see Parent_Test.config_generation()) changes.
+    """
+
+    route_pattern = re.compile(r"^[A-Za-z][A-Za-z0-9 *+%]{0,8}?\s+([0-9A-Fa-f:]+/\d+)")
+    next_hop_pattern = re.compile(r"\bvia\s+([0-9A-Fa-f:]+)")
+    interface_pattern = re.compile(r"([A-Za-z][A-Za-z-]*\d+(?:/\d+)+(?:\.\d+)?)\s*$")
+
+    def __init__(self):
+        self.routers = {}
+        self.hits = 0
+        self.lookups = 0
+
+    def _router(self, router: str, generation: int) -> dict:
+        if (
+            router not in self.routers
+            or self.routers[router]["generation"] != generation
+        ):
+            self.routers[router] = {
+                "generation": generation,
+                "routes": {},
+                "prefixes": None,  # prefix length -> {network: (next_hop, interface)}
+            }
+        return self.routers[router]
+
+    def invalidate(self, router: str = None):
+        if router is None:
+            self.routers = {}
+        elif router in self.routers:
+            del self.routers[router]
+
+    def is_loaded(self, router: str, generation: int) -> bool:
+        return self._router(router, generation)["prefixes"] is not None
+
+    def load(self, router: str, generation: int, rib: str) -> int:
+        """
+        Indexes the raw output of "show route ipv6" by prefix. Returns the number of prefixes indexed.
+        """
+        prefixes = {}
+        entries = []
+        for line in rib.splitlines():
+            match = self.route_pattern.match(line)
+            if match:
+                entries.append([match.group(1), line])
+            elif entries and line[:1].isspace():
+                entries[-1][1] += " " + line.strip()
+
+        for prefix, entry in entries:
+            try:
+                network = ipaddress.IPv6Network(prefix, strict=False)
+            except ValueError:
+                continue
+            if "directly connected" in entry:
+                interface = self.interface_pattern.search(entry.rstrip(", "))
+                if not interface:
+                    continue
+                resolution = ("", interface.group(1))
+            else:
+                next_hop = self.next_hop_pattern.search(entry)
+                if not next_hop:
+                    continue
+                resolution = (next_hop.group(1), "")
+            prefixes.setdefault(network.prefixlen, {})[
+                int(network.network_address)
+            ] = resolution
+
+        self._router(router, generation)["prefixes"] = dict(
+            sorted(prefixes.items(), reverse=True)
+        )
+        return sum(len(networks) for networks in prefixes.values())
+
+    def lookup(self, router: str, generation: int, route: str):
+        """
+        Returns (next_hop, interface) from cached lookups, or from the longest matching prefix of a loaded RIB.
+        Returns None if the route is unknown.
+        """
+        cache = self._router(router, generation)
+        if route in cache["routes"]:
+            return cache["routes"][route]
+        if cache["prefixes"] is None:
+            return None
+
+        try:
+            network = ipaddress.IPv6Network(route, strict=False)
+        except ValueError:
+            return None
+        address = int(network.network_address)
+        for prefix_length, networks in cache["prefixes"].items():
+            if prefix_length > network.prefixlen:
+                continue
+            masked_address = address >> (128 - prefix_length) << (128 - prefix_length)
+            if masked_address in networks:
+                cache["routes"][route] = networks[masked_address]
+                return networks[masked_address]
+        return None
+
+    def resolve(
+        self, router: str, generation: int, route: str, query, max_hops: int = 32
+    ) -> str:
+        """
+        Follows next hops from route until one is directly connected, and returns that interface.
+
+        query: function
+            Looks up a route on the router, and returns (next_hop, interface). Only called if the route is not cached.
+        """
+        cache = self._router(router, generation)
+        for hop in range(max_hops):
+            resolution = self.lookup(router, generation, route)
+            if resolution is None:
+                self.lookups += 1
+                resolution = tuple(query(route))
+                cache["routes"][route] = resolution
+            else:
+                self.hits += 1
+
+            next_hop, interface = resolution
+            if interface:
+                return interface
+            if not next_hop:
+                raise ValueError(
+                    f"{route} has neither a next hop nor a connected interface"
+                )
+            route = next_hop
+
+        raise ValueError(f"Cannot resolve {route} within {max_hops} hops")
 
 
 class ECMP_Test(Parent_Test):
+    rib_cache = RibResolutionCache()
+
     @classmethod
     def clear_bgp_sessions_hard(cls):
         cls.run_cmds("clear bgp *")
+        cls.note_config_change()
         cls.wait(5 * 60)
 
     @classmethod
@@ -34,6 +241,7 @@ class ECMP_Test(Parent_Test):
         cls.run_cmds(
             ["clear bgp ipv6 unicast * soft in", "clear bgp ipv6 unicast * soft out"]
         )
+        cls.note_config_change()
 
     @classmethod
     def show_bgp_neighbors(cls):
@@ -154,7 +362,8 @@ class ECMP_Test(Parent_Test):
             else:
                 fail_txt += f"\nFirst unreachable neighbor ({unreachable_neighbor}) can be ping'ed stably."
 
-        cls.run_cmds(f"show logging | include {unreachable_neighbor}")
+        if unreachable_neighbor:
+            cls.log("\n".join(cls.search_syslog(include=unreachable_neighbor)))
 
         return cls.failed(fail_txt)
 
@@ -163,6 +372,7 @@ class ECMP_Test(Parent_Test):
         parsed_output = cls.run_cmds(
             "show bgp ipv6 unicast summary wide",
             "show_bgp_ipv6_unicast_summary_wide.textfsm",
+            columnar=True,
         )
         cls.log("Got a snapshot of BGP peers.")
         return parsed_output
@@ -176,30 +386,62 @@ class ECMP_Test(Parent_Test):
         cls.script_args["new_bgp_snapshot"] = cls.take_bgp_peers_snapshot()
 
     @classmethod
-    def verify_bgp_peers_restored(cls, attempts=20, gap=30):
+    def verify_bgp_peers_restored(cls, attempts=20, gap=30, fields: List[str] = None):
+        """
+        Takes new BGP peer snapshots until every peer matches the golden snapshot (see BgpPeerSnapshotStore).
+        Each attempt only logs the peers that changed since the previous attempt.
+
+        fields: list (default: None)
+            Peer fields to compare. If None, use test_data["bgp_snapshot_fields"], or ["St_PfxRcd"] if it is undefined.
+            St_PfxRcd holds the state of a peer that is not established, and the prefix count otherwise.
+        """
+        if fields is None:
+            fields = (
+                cls.test_data["bgp_snapshot_fields"]
+                if "bgp_snapshot_fields" in cls.test_data.keys()
+                else ["St_PfxRcd"]
+            )
+        snapshot_store = BgpPeerSnapshotStore(
+            cls.script_args["golden_bgp_snapshot"], fields
+        )
+
         validation_pass = False
         for attempt in range(attempts):
             cls.log("BGP peer validation attempt: " + str(attempt + 1))
             cls.take_new_bgp_peers_snapshot()
+            changes = snapshot_store.update(cls.script_args["new_bgp_snapshot"])
 
             msg = []
-            bgp_restored = sste_common.compare_dicts(
-                cls.script_args["golden_bgp_snapshot"],
-                cls.script_args["new_bgp_snapshot"],
-                snapshot_value_range={},
-                filenames=["Golden Snapshot", "New Snapshot"],
-                exclude_keys={},
-                msg=msg,
-            )
-
-            if bgp_restored:
+            if changes["restored"]:
+                msg.append(
+                    f"{len(changes['restored'])} peer(s) now match the golden snapshot"
+                )
+            for neighbor, (previous, new) in sorted(changes["changed"].items()):
+                msg.append(
+                    f"{neighbor}: {previous} -> {new} (golden: {snapshot_store.golden[neighbor]})"
+                )
+            for neighbor in changes["regressed"]:
+                msg.append(f"{neighbor} changed again after it was restored")
+            for neighbor in changes["new_extra"]:
+                msg.append(f"{neighbor} is not in the golden snapshot")
+            if msg:
+                cls.log("\n".join(msg))
+
+            if snapshot_store.is_restored():
                 validation_pass = True
                 break
             elif attempt < attempts - 1:
-                cls.log("Difference(s) found. Next attempt starts in 30 seconds ...")
+                cls.log(
+                    f"{len(snapshot_store.unrestored) + len(snapshot_store.extra)} difference(s) found. Next attempt starts in {gap} seconds ..."
+                )
                 cls.wait(gap)
             else:
-                cls.log("Difference(s) found.")
+                cls.log(
+                    "Unrestored peer(s): "
+                    + ", ".join(
+                        sorted(snapshot_store.unrestored | snapshot_store.extra)
+                    )
+                )
 
         time_elapsed = time_to_string(attempt * gap)
         if validation_pass:
@@ -284,40 +526,144 @@ class ECMP_Test(Parent_Test):
 
     @classmethod
     def get_subnet_path_count(cls, receiver_type="intra_as"):
-        current_router = cls.test_data["UUT"]
+        path_counts = cls.get_subnet_path_counts([receiver_type])
+        if path_counts[receiver_type]["paths"] is None:
+            return cls.failed(path_counts[receiver_type]["error"])
 
-        if receiver_type == "intra_as":
-            cls.switch_router(cls.test_data["intra_as_receiver"])
-        else:
-            cls.switch_router(cls.test_data["extra_as_receiver"])
+        return path_counts[receiver_type]["paths"]
 
-        passed = True
-        try:
-            cls.clear_bgp_sessions_soft()
+    @classmethod
+    def poll_subnet_path_count(
+        cls,
+        stable_polls: int = 3,
+        poll_interval: float = 2,
+        timeout: float = 60,
+        min_settle: float = 10,
+    ) -> dict:
+        """
+        Soft-clears BGP, then polls bestpath-compare for {bgp_subnet} until the total path count is the same <stable_polls> times in a row, or until <timeout> seconds pass.
+        Right after the clear, the count may still be the pre-clear one, so it is only accepted as stable once it has changed, or once <min_settle> seconds have passed since the clear.
 
-            cls.wait(10)
+        Output
+        ------
+        {"paths": last path count, "polls": number of polls, "stable": bool, "seconds": time spent}
+        """
+        start_time = time()
+        cls.clear_bgp_sessions_soft()
 
+        path_counts = []
+        while True:
             subnet_data = cls.run_cmds(
                 "show bgp ipv6 unicast {bgp_subnet} bestpath-compare",
                 "show_bgp_ipv6_unicast_bestpath_compare.textfsm",
             )
+            try:
+                path_counts.append(int(subnet_data["Path"][""]["Total_paths"]))
+            except Exception as e:
+                print_(f"data format is: {subnet_data}")
+                raise e
 
-            num_paths = int(subnet_data["Path"][""]["Total_paths"])
-            cls.log(f"Number of paths: {num_paths}")
+            settled = (
+                path_counts[-1] != path_counts[0] or time() - start_time >= min_settle
+            )
+            stable = (
+                settled
+                and len(path_counts) >= stable_polls
+                and all(
+                    path_count == path_counts[-1]
+                    for path_count in path_counts[-stable_polls:]
+                )
+            )
+            if stable or time() - start_time >= timeout:
+                break
+            sleep(poll_interval)
 
-        except Exception as e:
-            failed_message = error_to_string(e)
-            cls.log(failed_message)
-            print_(f"data format is: {subnet_data}")
-            passed = False
+        return {
+            "paths": path_counts[-1],
+            "polls": len(path_counts),
+            "stable": stable,
+            "seconds": time() - start_time,
+        }
 
-        cls.switch_router(current_router)
+    @classmethod
+    def get_subnet_path_counts(
+        cls,
+        receiver_types: List[str] = ["intra_as", "extra_as"],
+        stable_polls: int = 3,
+        poll_interval: float = 2,
+        timeout: float = 60,
+        min_settle: float = 10,
+    ) -> Dict[str, dict]:
+        """
+        Gets the path count of {bgp_subnet} on several receivers at the same time, each receiver on its own ssh session (see device_context() and poll_subnet_path_count()).
+        The receiver of a receiver type is test_data["<receiver type>_receiver"]. Receiver types that share a receiver are polled once.
 
-        if passed:
-            return num_paths
+        Output
+        ------
+        {receiver_type: {"receiver": router, "paths": path count or None, "polls": int, "stable": bool, "seconds": float, "error": str}}
+        """
+        from concurrent.futures import ThreadPoolExecutor
 
-        else:
-            return cls.failed(failed_message)
+        def get_path_count(receiver: str):
+            device_cls = None
+            try:
+                device_cls = cls.device_context(receiver)
+                result = device_cls.poll_subnet_path_count(
+                    stable_polls, poll_interval, timeout, min_settle
+                )
+                result["error"] = ""
+            except Exception as e:
+                result = {
+                    "paths": None,
+                    "polls": 0,
+                    "stable": False,
+                    "seconds": 0,
+                    "error": f"Cannot get the path count on {receiver}: {error_to_string(e)}",
+                }
+            finally:
+                if device_cls is not None:
+                    cls.close_device_context(device_cls)
+            return result
+
+        receivers = {
+            receiver_type: cls.test_data[f"{receiver_type}_receiver"]
+            for receiver_type in receiver_types
+        }
+        unique_receivers = unique(list(receivers.values()))
+        with ThreadPoolExecutor(max_workers=len(unique_receivers) or 1) as executor:
+            futures = {
+                receiver: executor.submit(get_path_count, receiver)
+                for receiver in unique_receivers
+            }
+        results = {receiver: future.result() for receiver, future in futures.items()}
+
+        from texttable import Texttable
+
+        path_counts = {}
+        table = Texttable()
+        table.header(["Receiver type", "Receiver", "Paths", "Polls", "Stable", "Time"])
+        for receiver_type, receiver in receivers.items():
+            result = results[receiver]
+
+            path_counts[receiver_type] = {
+                "receiver": receiver,
+                **result,
+            }
+            table.add_row(
+                [
+                    receiver_type,
+                    receiver,
+                    result["paths"] if result["paths"] is not None else "-",
+                    result["polls"],
+                    result["stable"],
+                    time_to_string(result["seconds"]),
+                ]
+            )
+            if result["error"]:
+                cls.log(result["error"], "warning")
+        cls.log(table.draw())
+
+        return path_counts
 
     @classmethod
     def set_xr_bgp_test6_data(
@@ -441,18 +787,51 @@ class ECMP_Test(Parent_Test):
             return cls.failed(f"Apply config: failed")
         return True
 
+    @classmethod
+    def resolve_route(cls, route: str, bulk: bool = None) -> str:
+        """
+        Returns the directly connected interface that route resolves to on the current router (see RibResolutionCache).
+
+        bulk: bool (default: None)
+            If True, load the whole IPv6 RIB with one "show route ipv6" the first time, and resolve routes locally.
+            If False, run "show route ipv6 <route>" for each uncached hop.
+            If None, use test_data["rib_cache_bulk"], or False if it is undefined.
+        """
+        if bulk is None:
+            bulk = (
+                cls.test_data["rib_cache_bulk"]
+                if "rib_cache_bulk" in cls.test_data.keys()
+                else False
+            )
+        router = cls.script_args["current_alias"]
+        generation = cls.config_generation(router)
+
+        if bulk and not cls.rib_cache.is_loaded(router, generation):
+            prefix_count = cls.rib_cache.load(
+                router, generation, cls.run_cmds("show route ipv6", log_output=False)
+            )
+            cls.log(f"Loaded {prefix_count} IPv6 prefixes into the RIB cache")
+
+        def query(route):
+            parsed_output = cls.run_cmds(
+                f"show route ipv6 {route}", "show_route_ipv6_get_source.textfsm"
+            )
+            return parsed_output["next_hop"], parsed_output["directly_connected"]
+
+        interface = cls.rib_cache.resolve(router, generation, route, query)
+
+        if cls.timing is not None:
+            cls.timing["RIB cache"] = (
+                f"{cls.rib_cache.hits} hits, {cls.rib_cache.lookups} CLI lookups"
+            )
+        return interface
+
     @classmethod
     def get_source_device(cls, testcase_name, route=None):
         if not route:
             route = cls.test_data["testcase_data"][testcase_name]["route"]
         try:
-            parsed_output = {"directly_connected": ""}
-            while parsed_output["directly_connected"] == "":
-                parsed_output = cls.run_cmds(
-                    f"show route ipv6 {route}", "show_route_ipv6_get_source.textfsm"
-                )
-                route = parsed_output["next_hop"]
-            source_interface = parsed_output["directly_connected"]
+            source_interface = cls.resolve_route(route)
             device = int(source_interface.split("/")[1]) + 1
             cls.script_args["source_device"] = device
         except Exception as e:
@@ -591,114 +970,248 @@ class ECMP_Test(Parent_Test):
 
     @classmethod
     def get_traffic_stats_for_each_device(
-        cls, interested_devices: List[str], stat_name: str = "OutMbps"
+        cls,
+        interested_devices: List[str],
+        stat_name: str = "OutMbps",
+        samples: int = None,
+        interval: float = None,
+        relative_precision: float = None,
+        confidence: float = None,
     ):
         """
         output structure: {
             "rtsw-1": [175.5, 174.7],
             "rtsw-2": [186.3, 188.5],
         }
+
+        If samples > 1, averages up to <samples> bulk snapshots (see get_averaged_traffic_data()) instead of reading each interface once.
+        samples, interval, relative_precision, and confidence default to the same keys in test_data["ecmp_rate_sampling"].
+        Without them, each interface is read once.
         """
         interfaces_split_by_devices = cls.get_lldp_neighbors_by_devices(
             interested_devices
         )
 
-        traffic_data_by_devices = {
-            target_device: cls.get_traffic_data_for_interfaces(local_ports)
-            for target_device, local_ports in interfaces_split_by_devices.items()
-        }
-        """
-        traffic_data = cls.get_traffic_data()
+        sampling_settings = (
+            cls.test_data["ecmp_rate_sampling"]
+            if "ecmp_rate_sampling" in cls.test_data.keys()
+            else {}
+        )
+        get_setting = lambda value, key, default: (
+            value
+            if value is not None
+            else sampling_settings[key] if key in sampling_settings.keys() else default
+        )
+        samples = get_setting(samples, "samples", 1)
+
+        if samples <= 1:
+            traffic_data_by_devices = {
+                target_device: cls.get_traffic_data_for_interfaces(local_ports)
+                for target_device, local_ports in interfaces_split_by_devices.items()
+            }
+            return traffic_data_by_devices
+
+        interfaces = [
+            local_port
+            for local_ports in interfaces_split_by_devices.values()
+            for local_port in local_ports
+        ]
+        rates = cls.get_averaged_traffic_data(
+            interfaces,
+            stat_name=stat_name,
+            samples=samples,
+            interval=get_setting(interval, "interval", 30),
+            relative_precision=get_setting(
+                relative_precision, "relative_precision", 0.02
+            ),
+            confidence=get_setting(confidence, "confidence", 0.95),
+        )
 
-        traffic_data_by_devices = {
-            target_device: [
-                float(traffic_data["Interface"][local_port][stat_name])
-                if local_port in traffic_data["Interface"].keys()
-                else 0.0
-                for local_port in local_ports
+        traffic_data_by_devices = {}
+        start = 0
+        for target_device, local_ports in interfaces_split_by_devices.items():
+            traffic_data_by_devices[target_device] = rates[
+                start : start + len(local_ports)
             ]
-            for target_device, local_ports in interfaces_split_by_devices.items()
-        }
-        """
+            start += len(local_ports)
 
         return traffic_data_by_devices
 
     @classmethod
-    def verify_similar_rates(cls, data: List[float], threshold: float, stdev: int):
-        # method: minimum >= 80% average
-        sample_size = len(data)
-        average = sum(data) / sample_size
-        theoretical_minimum = 0.8*average
-        minimum = min(data)
-
-        minimum_is_in_range = minimum >= theoretical_minimum
+    def get_averaged_traffic_data(
+        cls,
+        interfaces: List[str],
+        stat_name: str = "OutMbps",
+        samples: int = 10,
+        interval: float = 30,
+        relative_precision: float = 0.02,
+        confidence: float = 0.95,
+    ) -> List[float]:
+        """
+        Takes up to <samples> snapshots of "show interfaces counters rates physical", <interval> seconds apart, and returns each interface's mean <stat_name>.
+        Only a running mean and variance are kept per interface (see ecmp_analysis.RunningStats).
+        Stops early once every interface's <confidence> confidence interval is within +/- relative_precision of its mean.
+        Interfaces missing from the output are counted as 0.
+        """
+        import numpy as np
+        import ecmp_analysis
+
+        stats = ecmp_analysis.RunningStats(len(interfaces))
+        missing_interfaces = set()
+        for sample in range(1, samples + 1):
+            traffic_data = cls.get_traffic_data()
+            interface_data = (
+                traffic_data["Interface"] if "Interface" in traffic_data.keys() else {}
+            )
+            missing_interfaces.update(
+                interface for interface in interfaces if interface not in interface_data
+            )
+            stats.update(
+                [
+                    (
+                        float(interface_data[interface][stat_name])
+                        if interface in interface_data
+                        else 0.0
+                    )
+                    for interface in interfaces
+                ]
+            )
 
-        theoretical_minimum = format(theoretical_minimum, ".2f").rstrip("0").rstrip(".")
-        minimum = format(minimum, ".2f").rstrip("0").rstrip(".")
-        if minimum_is_in_range:
-            cls.log("All frames have similar rates.")
-            # cls.log(f"All rates (minimum: {minimum}) are at least 50% of the average (50% {average} = {theoretical_minimum})")
-            return True
+            if stats.is_precise(relative_precision, confidence):
+                cls.log(
+                    f"Rates are within +/- {relative_precision:.0%} of their means after {sample} samples"
+                )
+                break
+            elif sample < samples:
+                cls.wait(interval)
         else:
-            fail_summary = "Gap in frame rates is too high."
-            # fail_summary = f"minimum rate ({minimum}) < 50% of the average (50% {average} = {theoretical_minimum})"
-            return cls.failed(fail_summary)
+            widest = np.max(
+                stats.confidence_half_width(confidence)
+                / np.where(stats.mean > 0, stats.mean, np.inf),
+                initial=0,
+            )
+            cls.log(
+                f"Averaged {samples} samples. The widest confidence interval is +/- {widest:.1%} of its mean"
+            )
 
-        """
-        # method: average +/- stdev*standard_deviation
-        from math import pow, sqrt
-        sample_size = len(data)
-        average = sum(data) / sample_size
-        standard_deviation = sqrt(sum([pow(x-average, 2) for x in data])/sample_size)
-        theoretical_maximum = average + stdev*standard_deviation
-        theoretical_minimum = average - stdev*standard_deviation
-        maximum = max(data)
-        minimum = min(data)
-
-        maximum_is_in_range, minimum_is_in_range = maximum <= theoretical_maximum, minimum >= theoretical_minimum
-        
-        average = format(average, '.2f').rstrip("0").rstrip(".")
-        standard_deviation = format(standard_deviation, '.2f').rstrip("0").rstrip(".")
-        theoretical_maximum = format(theoretical_maximum, '.2f').rstrip("0").rstrip(".")
-        theoretical_minimum = format(theoretical_minimum, '.2f').rstrip("0").rstrip(".")
-        minimum = format(minimum, '.2f').rstrip("0").rstrip(".")
-        maximum = format(maximum, '.2f').rstrip("0").rstrip(".")
-        cls.log(f"Average: {average}, standard deviation: {standard_deviation}, average +/- {stdev} standard deviations: ({theoretical_minimum}, {theoretical_maximum}), range: ({minimum}, {maximum})")
+        if missing_interfaces:
+            cls.log(
+                f"No {stat_name} for {', '.join(sorted(missing_interfaces))}. Counted as 0",
+                "warning",
+            )
 
-        fail_summary = []
-        if not minimum_is_in_range:
-            fail_summary.append(f"minimum rate ({minimum}) < average-{stdev} standard deviations ({theoretical_minimum})")
-        if not maximum_is_in_range:
-            fail_summary.append(f"maximum rate ({maximum}) > average+{stdev} standard deviations ({theoretical_maximum})")
-        fail_summary = '\n'.join(fail_summary)
-
-        if fail_summary:
-            return cls.failed(fail_summary)
-        else:
-            cls.log(f"All rates fall within average +/- {stdev} standard deviations")
-            return True
+        return stats.mean.tolist()
+
+    @classmethod
+    def verify_similar_rates(
+        cls,
+        data: Union[List[float], Dict[str, List[float]]],
+        threshold: float = None,
+        stdev: int = None,
+        methods: Union[list, dict] = None,
+        scope: str = None,
+    ):
         """
+        Verifies that rates are evenly balanced (see ecmp_analysis.analyze()).
+
+        data: list or dict
+            [rate, ...], or {device: [rate, ...]} as returned by get_traffic_stats_for_each_device().
+            Each device's rates can also be [[rate, ...], ...] shaped (samples, members).
+
+        threshold: float (default: None)
+            Used by the "threshold" method, if it is selected and has no threshold of its own.
+
+        stdev: int (default: None)
+            Used by the "stdev_band" method, if it is selected and has no stdev of its own.
+
+        methods: list or dict (default: None)
+            [method, ...] or {method: {parameter: value}}.
+            If None, use test_data["ecmp_analysis"]["methods"], or {"min_ratio": {"ratio": 0.8}} if it is undefined.
 
+        scope: str (default: None)
+            "overall", "device", or "both".
+            If None, use test_data["ecmp_analysis"]["scope"], or "overall" if it is undefined.
         """
-        # method: average +/- threshold
-        average = sum(data) / len(data)
-        theoretical_maximum = average+threshold
-        theoretical_minimum = average-threshold
-        maximum = max(data)
-        minimum = min(data)
+        import ecmp_analysis
 
-        passed = (maximum <= theoretical_maximum) and (minimum >= theoretical_minimum)
+        analysis_settings = (
+            cls.test_data["ecmp_analysis"]
+            if "ecmp_analysis" in cls.test_data.keys()
+            else {}
+        )
+        if methods is None:
+            methods = (
+                analysis_settings["methods"]
+                if "methods" in analysis_settings.keys()
+                else {"min_ratio": {"ratio": 0.8}}
+            )
+        if scope is None:
+            scope = (
+                analysis_settings["scope"]
+                if "scope" in analysis_settings.keys()
+                else "overall"
+            )
+        if not isinstance(methods, dict):
+            methods = {method: {} for method in methods}
+        methods = {method: dict(params or {}) for method, params in methods.items()}
+        if "threshold" in methods and threshold is not None:
+            methods["threshold"].setdefault("threshold", threshold)
+        if "stdev_band" in methods and stdev is not None:
+            methods["stdev_band"].setdefault("stdev", stdev)
 
-        average, minimum, maximum = format(average, '.2f').strip("0"), format(minimum, '.2f').strip("0"), format(maximum, '.2f').strip("0")
-        summary = f"Average: {average}, Range: ({minimum}, {maximum})"
+        try:
+            analysis = ecmp_analysis.analyze(data, methods, scope)
+        except ValueError as e:
+            return cls.failed(f"Cannot analyze rates: {e}")
+
+        from texttable import Texttable
+
+        to_string = lambda value: format(float(value), ".2f").rstrip("0").rstrip(".")
+        table = Texttable()
+        table.header(["Device", "Members", "Average", "Min", "Max", "CV", "Jain"])
+        for column, device in enumerate(analysis["devices"]):
+            metrics = {
+                metric: values[:, column].mean()
+                for metric, values in analysis["per_device"].items()
+            }
+            table.add_row(
+                [
+                    device or "all",
+                    int(metrics["members"]),
+                    to_string(metrics["mean"]),
+                    to_string(metrics["min"]),
+                    to_string(metrics["max"]),
+                    format(metrics["cv"], ".3f"),
+                    format(metrics["jain"], ".3f"),
+                ]
+            )
+        cls.log(table.draw())
 
-        if passed:
-            cls.log(summary)
+        if analysis["empty_devices"]:
+            cls.log(
+                f"Skipped devices without rates: {', '.join(analysis['empty_devices'])}",
+                "warning",
+            )
+
+        fail_summary = []
+        for method, result in analysis["checks"].items():
+            if result["passed"]:
+                continue
+            failed_devices = [
+                device
+                for column, device in enumerate(analysis["devices"])
+                if not result["per_device"][:, column].all()
+            ]
+            fail_summary.append(
+                f"{method} check failed"
+                + (f" on {', '.join(failed_devices)}" if any(failed_devices) else "")
+            )
+
+        if analysis["passed"]:
+            cls.log(f"All rates are balanced ({', '.join(methods)})")
             return True
-        
         else:
-            return cls.failed(summary)
-        """
+            return cls.failed("Gap in rates is too high: " + "; ".join(fail_summary))
 
     @classmethod
     def check_traffic_loss(cls, traffic_num: int = 1, passx_threshold: int = None):
@@ -714,7 +1227,14 @@ class ECMP_Test(Parent_Test):
         3. for a testcase, in cls.test_data[<testcase_name>]["acceptable_traffic_loss_threshold"] (overriding the global definition), or
         4. as this function's parameter (overriding both global and testcase definitions).
         """
-        traffic_stats = cls.get_ixia_stats(traffic_num, ["Loss %"])
+        try:
+            streams = cls.get_traffic_streams(traffic_num)
+        except KeyError as e:
+            streams = None
+
+        traffic_stats = cls.sampled_ixia_stats(streams)
+        if traffic_stats is None:
+            traffic_stats = cls.get_ixia_stats(traffic_num, ["Loss %"])
 
         if passx_threshold is None:
             passx_threshold = (
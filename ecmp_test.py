@@ -1,22 +1,9 @@
 #!/bin/env python
-import sys, inspect
+import sys
 
 sys.path.append("cafykit/lib/")
 
 from pyats import aetest
-from pyats.aetest.loop import Iteration
-from pyats.easypy import run
-from ats.log.utils import banner
-import logging
-import sste_common, sste_exr, sste_cxr, sste_trigger, sste_cli_keys, sste_spitfire, sste_tgn
-
-import yaml, pdb, json
-from texttable import Texttable
-import re, random, time, collections
-from functools import reduce
-from time import time, sleep
-from typing import Any, Union
-from cgi import test
 
 from parapyats import tree, print_
 from ecmp_parapyats import ECMP_Test as Test
@@ -56,9 +43,9 @@ class CommonSetup(aetest.CommonSetup):
         )
         devices_to_back_up = list(set(golden_config_devices + lock_devices))
 
-        for device_name in devices_to_back_up:
-            Test.start_step(f"Back up current configurations for {device_name}") \
-            (Test.backup_running_config)(target_router=device_name)
+        Test.run_device_lifecycle(
+            {device_name: ["backup"] for device_name in devices_to_back_up}
+        )
 
     @aetest.skipUnless(Test.keep_running(), "Automation has failed already")
     @aetest.subsection
@@ -68,9 +55,9 @@ class CommonSetup(aetest.CommonSetup):
             if "golden_configs" in Test.test_data.keys()
             else []
         )
-        for device_name in golden_config_devices:
-            Test.start_step(f"Apply golden config to {device_name}") \
-            (Test.apply_golden_configs)(target_router=device_name)
+        Test.run_device_lifecycle(
+            {device_name: ["golden"] for device_name in golden_config_devices}
+        )
 
     @aetest.skipUnless(Test.keep_running(), "Automation has failed already")
     @aetest.subsection
@@ -168,13 +155,8 @@ class xr_ecmp_test1(aetest.Testcase):
 
         print_(traffic_data_by_rtsws)
 
-        all_traffic_data = [
-            data_point
-            for rtsw, traffic_data in traffic_data_by_rtsws.items()
-            for data_point in traffic_data
-        ]
-        Test.start_step(f"Ensure the outbound packet rates for all interfaces fall within 3 standard deviations of the average rate") \
-            (Test.verify_similar_rates)(data=all_traffic_data, threshold=threshold, stdev=stdev)
+        Test.start_step(f"Ensure the outbound packet rates are balanced across all interfaces") \
+            (Test.verify_similar_rates)(data=traffic_data_by_rtsws, threshold=threshold, stdev=stdev)
 
     @aetest.skipUnless(Test.keep_running(), "Automation has failed already")
     @aetest.test.loop(num_paths=[64, 32, 16, 8])
@@ -220,14 +202,13 @@ class CommonCleanup(aetest.CommonCleanup):
         )
         all_configured_devices = list(set(golden_config_devices + lock_devices))
 
-        for device_name in all_configured_devices:
-            Test.start_step("Load pre-test configurations", continue_=True) \
-            (Test.restore_running_config)(target_router=device_name)
-
-            lcs = 8
-            wait = device_name == all_configured_devices[-1]
-            Test.start_step(f"Reload LCs on {device_name}", continue_=True) \
-            (Test.lc_reload_on_device)(device_name, lcs, wait)
+        Test.run_device_lifecycle(
+            {
+                device_name: ["restore", "reload_lcs"]
+                for device_name in all_configured_devices
+            },
+            lcs=8,
+        )
 
     @aetest.skipUnless(Test.keep_running(), "Automation has failed already")
     @aetest.subsection
@@ -9,37 +9,79 @@ For specific use cases, please refer to bgp_tests.py, ecmp_tests.py, and functio
 
 Note: this framework is built on sste frameworks, which are proprietary and unavailable here.
 """
-import cmd
-import sys, inspect
+
+import sys, os
 
 sys.path.append("cafykit/lib/")
-import copy
 
-from pyats import aetest
-from pyats.aetest.loop import Iteration
-from pyats.easypy import run
-from ats.log.utils import banner
+import importlib, importlib.util
 import logging
-import sste_common, sste_exr, sste_cxr, sste_trigger, sste_cli_keys, sste_spitfire, sste_tgn
-
-import yaml, pdb, json
-from texttable import Texttable
-import re, random, collections
-from functools import reduce
-from time import time, sleep
+import re, collections, threading, contextlib, atexit
+from functools import reduce, wraps
+from time import time, sleep, perf_counter
 from typing import Any, Union, Dict, List, Tuple
 import operator
 
 
-try:
-    cli_mapping = sste_cli_keys.cli_mapping
-    cli_parser_exclude_keys = sste_cli_keys.cli_parser_exclude_keys
-    cli_parser_non_matching_keys = sste_cli_keys.cli_parser_non_matching_keys
-
-except ImportError:
-    cli_parser_exclude_keys = {}
-    cli_parser_non_matching_keys = {}
-    cli_mapping = {}
+def lazy_import(name: str):
+    """
+    Imports module <name>, but only runs its code on the first access to one of its attributes.
+    The module is registered in sys.modules like any import, so it is loaded once, and functions patched on it (e.g. by sste_replay) are the ones parapyats calls.
+    Raises ModuleNotFoundError right away if the module doesn't exist.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+    parent_name, _, child_name = name.rpartition(".")
+    if parent_name:
+        setattr(sys.modules[parent_name], child_name, module)
+    return module
+
+
+# Modules that are only used inside functions are loaded on first use, so importing parapyats stays cheap.
+# Check with: python parapyats_benchmark.py --import-budget <milliseconds>
+aetest = lazy_import("pyats.aetest")
+sste_common = lazy_import("sste_common")
+sste_exr = lazy_import("sste_exr")
+sste_cxr = lazy_import("sste_cxr")
+sste_trigger = lazy_import("sste_trigger")
+sste_cli_keys = lazy_import("sste_cli_keys")
+sste_spitfire = lazy_import("sste_spitfire")
+sste_tgn = lazy_import("sste_tgn")
+yaml = lazy_import("yaml")
+pdb = lazy_import("pdb")
+copy = lazy_import("copy")
+inspect = lazy_import("inspect")
+json = lazy_import("json")
+queue = lazy_import("queue")
+random = lazy_import("random")
+test_data_loader = lazy_import("test_data_loader")
+
+
+def __getattr__(name: str):
+    """
+    Reads cli_mapping, cli_parser_exclude_keys, and cli_parser_non_matching_keys from sste_cli_keys on first access.
+    """
+    if name in (
+        "cli_mapping",
+        "cli_parser_exclude_keys",
+        "cli_parser_non_matching_keys",
+    ):
+        try:
+            value = getattr(sste_cli_keys, name)
+        except ImportError:
+            value = {}
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
 
 def tree():
@@ -50,22 +92,101 @@ def error_to_string(e):
     return f"{type(e).__name__}: {', '.join(e.args)}"
 
 
-def print_(text, end="\n"):
+async_log_writer = None  # AsyncLogWriter, while asynchronous logging is on
+
+# held around every sste_tgn call, since IxiaStatsSampler's thread shares script_args and the REST session with the main thread
+tgn_lock = threading.RLock()
+
+# text -> test_data_loader.FormatTemplate, see Parent_Test._format()
+format_templates = {}
+MAX_FORMAT_TEMPLATES = 20000
+
+
+def truncate_items(value, max_items: int):
+    """
+    Returns a copy of value in which dicts and lists, at any depth, keep only their first max_items items.
+    """
+    if isinstance(value, dict):
+        truncated = {
+            key: truncate_items(item, max_items)
+            for key, item in list(value.items())[:max_items]
+        }
+        if len(value) > max_items:
+            truncated["..."] = f"{len(value) - max_items} more items"
+        return truncated
+    if isinstance(value, (list, tuple)):
+        truncated = [truncate_items(item, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            truncated.append(f"... {len(value) - max_items} more items")
+        return truncated
+    return value
+
+
+def format_text(text, max_items: int = None, max_chars: int = None) -> str:
+    """
+    Formats text the way print_() shows it: strings as they are, dicts and lists as indented json, and anything else with str().
+    If max_items is given, dicts and lists only show their first max_items items (see truncate_items()).
+    If max_chars is given, the result is cut to max_chars characters.
+    """
     if isinstance(text, str):
-        print(text, end=end)
+        formatted = text
     else:
+        if max_items is not None:
+            text = truncate_items(text, max_items)
         try:
             text.keys()
-            print(json.dumps(text, indent=4), end=end)
+            formatted = json.dumps(text, indent=4)
         except Exception as e:
             try:
                 text[0]
-                print(json.dumps(text, indent=4), end=end)
+                formatted = json.dumps(text, indent=4)
             except Exception as e:
-                print(str(text), end=end)
+                formatted = str(text)
+
+    if max_chars is not None and len(formatted) > max_chars:
+        formatted = (
+            f"{formatted[:max_chars]}... ({len(formatted) - max_chars} more characters)"
+        )
+    return formatted
+
+
+def print_(text, end="\n"):
+    if async_log_writer is not None:
+        async_log_writer.put(("print", text, end))
+        return
+    print(format_text(text), end=end)
     sys.stdout.flush()
 
 
+def traced(category: str, *attribute_names: str):
+    """
+    Decorates a Parent_Test function to record a span (see Parent_Test.span()) for each call while span tracing is on.
+    The parameters named in attribute_names are recorded as the span's attributes.
+    Place it under @classmethod.
+    """
+
+    def decorate(function):
+        signatures = []  # read on the first traced call, since inspect is loaded lazily
+
+        @wraps(function)
+        def wrapper(cls, *args, **kwargs):
+            if cls.get_span_tracer() is None:
+                return function(cls, *args, **kwargs)
+
+            if not signatures:
+                signatures.append(inspect.signature(function))
+            arguments = signatures[0].bind_partial(cls, *args, **kwargs).arguments
+            attributes = {
+                name: arguments[name] for name in attribute_names if name in arguments
+            }
+            with cls.span(function.__name__, category, **attributes):
+                return function(cls, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
 def get_time(time_now):
     multiplier = 1
     pattern = "(\d*).*s"
@@ -112,6 +233,1065 @@ def unique(sequence: list):
     return [x for x in sequence if not (x in seen or seen.add(x))]
 
 
+def to_number(value) -> float:
+    """
+    Converts a stat such as "1,234", "0.5", or 12 to a float. Returns 0.0 if the value is blank or not a number.
+    """
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        return 0.0
+
+
+class AsyncLogWriter(threading.Thread):
+    """
+    Writes print_() and Parent_Test.log() messages on a background thread, so that callers only enqueue them.
+    Messages are formatted on this thread (see format_text()), and printed messages are written and flushed in batches of up to batch_size.
+    Logged dicts and lists are copied (see truncate_items()) when they are enqueued, so changes made to them afterwards don't show up.
+    If this thread has stopped, messages are written by the caller instead.
+    Use Parent_Test.start_async_logging() to start one.
+
+    max_items: int (default: 100)
+        Items shown per dict or list in a logged object.
+
+    max_chars: int (default: 100000)
+        Characters shown per message.
+
+    batch_size: int (default: 256)
+
+    queue_size: int (default: 10000)
+        Messages that can wait to be written. Callers block while the queue is full and this thread is running.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 100,
+        max_chars: int = 100000,
+        batch_size: int = 256,
+        queue_size: int = 10000,
+    ):
+        super().__init__(name="async_log_writer", daemon=True)
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.batches = 0
+
+    def put(self, record: tuple):
+        """
+        record: ("print", text, end) or ("log", logger, level, message)
+        """
+        if record[0] == "print":
+            record = ("print", self.snapshot(record[1]), record[2])
+        elif record[0] == "log":
+            record = record[:3] + (self.snapshot(record[3]),)
+
+        while self.is_alive():
+            try:
+                self.queue.put(record, timeout=1)
+                return
+            except queue.Full:
+                pass
+        self.write_record(record)
+
+    def snapshot(self, text):
+        """
+        Returns a copy of text that the caller can keep changing: dicts and lists are copied by truncate_items(), and other objects are formatted.
+        """
+        if isinstance(text, str):
+            return text
+        try:
+            if isinstance(text, (dict, list, tuple)):
+                return truncate_items(text, self.max_items)
+        except Exception as e:
+            pass
+        return self.format(text)
+
+    def write_record(self, record: tuple):
+        """
+        Writes a print or log record right away, on the caller's thread.
+        """
+        if record[0] == "print":
+            self.write([self.format(record[1]) + record[2]])
+        elif record[0] == "log":
+            logger, level, message = record[1:]
+            logger.log(level, self.format(message))
+
+    def flush(self, timeout: float = None):
+        """
+        Waits until every message enqueued so far is written.
+        """
+        written = threading.Event()
+        while self.is_alive():
+            try:
+                self.queue.put(("flush", written), timeout=1)
+                break
+            except queue.Full:
+                pass
+        deadline = None if timeout is None else time() + timeout
+        # checks every second that this thread is still running to write it
+        while self.is_alive() and not written.wait(1):
+            if deadline is not None and time() >= deadline:
+                break
+
+    def stop(self):
+        """
+        Writes the remaining messages and stops the thread.
+        """
+        if self.is_alive():
+            self.queue.put(("stop",))
+            self.join()
+
+    def format(self, text) -> str:
+        try:
+            return format_text(text, self.max_items, self.max_chars)
+        except Exception as e:
+            return f"Unable to format a message: {error_to_string(e)}"
+
+    def write(self, lines: List[str]):
+        if lines:
+            sys.stdout.write("".join(lines))
+            sys.stdout.flush()
+            self.written += len(lines)
+            self.batches += 1
+
+    def run(self):
+        running = True
+        while running:
+            records = [self.queue.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines, flushes = [], []
+            for record in records:
+                if record[0] == "print":
+                    lines.append(self.format(record[1]) + record[2])
+                elif record[0] == "log":
+                    # printed messages before this one are written first to keep them in order
+                    self.write(lines)
+                    lines = []
+                    logger, level, message = record[1:]
+                    try:
+                        logger.log(level, self.format(message))
+                    except Exception as e:
+                        lines.append(f"Unable to log a message: {error_to_string(e)}\n")
+                elif record[0] == "flush":
+                    flushes.append(record[1])
+                elif record[0] == "stop":
+                    running = False
+            self.write(lines)
+
+            for written in flushes:
+                written.set()
+
+
+class IxiaStatsSampler(threading.Thread):
+    """
+    Polls the ixia traffic stats view every <interval> seconds on a background thread.
+    Each poll holds tgn_lock, so it never runs at the same time as the main thread's sste_tgn calls.
+    For each stream, the last <max_samples> samples of the numeric columns are kept in a ring buffer of (timestamp, values) tuples.
+    Use Parent_Test.start_ixia_sampler() to start one.
+    """
+
+    columns = ["Tx Frames", "Rx Frames", "Loss %", "Tx Frame Rate", "Rx Frame Rate"]
+
+    def __init__(self, script_args, tgn, interval: float = 5, max_samples: int = 720):
+        super().__init__(name="ixia_stats_sampler", daemon=True)
+        self.script_args = script_args
+        self.tgn = tgn
+        self.interval = interval
+        self.max_samples = max_samples
+        self.buffers = {}
+        self.failed_samples = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        with tgn_lock:
+            stats = sste_tgn.tgn_get_stats_flexible(
+                self.script_args, self.tgn, print_output=False
+            )
+        timestamp = time()
+
+        with self.lock:
+            for stream, stream_stats in stats.items():
+                if stream not in self.buffers:
+                    self.buffers[stream] = collections.deque(maxlen=self.max_samples)
+                values = tuple(
+                    to_number(stream_stats[column]) if column in stream_stats else 0.0
+                    for column in self.columns
+                )
+                self.buffers[stream].append((timestamp, values))
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                self.failed_samples += 1
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout=self.interval + 5)
+
+    def samples(self, stream: str, since: float = 0) -> list:
+        """
+        Returns the buffered (timestamp, {column: value}) samples of a stream taken after <since>, oldest first.
+        """
+        with self.lock:
+            buffer = list(self.buffers[stream]) if stream in self.buffers else []
+        return [
+            (timestamp, dict(zip(self.columns, values)))
+            for timestamp, values in buffer
+            if timestamp > since
+        ]
+
+    def latest(self, streams: list = None, since: float = 0) -> dict:
+        """
+        Returns {stream: {column: value}} using each stream's latest sample taken after <since>.
+        Streams without such a sample are left out.
+        """
+        with self.lock:
+            streams = list(self.buffers.keys()) if streams is None else streams
+            latest_samples = {
+                stream: self.buffers[stream][-1]
+                for stream in streams
+                if stream in self.buffers and self.buffers[stream]
+            }
+        return {
+            stream: dict(zip(self.columns, values))
+            for stream, (timestamp, values) in latest_samples.items()
+            if timestamp > since
+        }
+
+    def loss_curve(self, stream: str, since: float = 0) -> list:
+        """
+        Returns [(timestamp, Loss %), ...] for a stream.
+        """
+        return [
+            (timestamp, values["Loss %"])
+            for timestamp, values in self.samples(stream, since)
+        ]
+
+    def as_arrays(self, streams: list = None, since: float = 0, until: float = None):
+        """
+        Returns (timestamps, streams, values) for the polls taken between <since> and <until> that include every stream.
+        values is a NumPy array shaped (polls, streams, columns), in the order of self.columns.
+        """
+        import numpy as np
+
+        until = time() if until is None else until
+        with self.lock:
+            streams = list(self.buffers.keys()) if streams is None else streams
+            buffers = {
+                stream: list(self.buffers[stream])
+                for stream in streams
+                if stream in self.buffers
+            }
+        streams = [stream for stream in streams if stream in buffers]
+        if not streams:
+            return np.empty(0), [], np.empty((0, 0, len(self.columns)))
+
+        timestamps = np.array([timestamp for timestamp, _ in buffers[streams[0]]])
+        timestamps = timestamps[(timestamps > since) & (timestamps <= until)]
+        values = []
+        for stream in streams:
+            stream_timestamps = np.array(
+                [timestamp for timestamp, _ in buffers[stream]]
+            )
+            stream_values = np.array([row for _, row in buffers[stream]])
+            timestamps = np.intersect1d(timestamps, stream_timestamps)
+            values.append((stream_timestamps, stream_values))
+
+        values = np.stack(
+            [
+                stream_values[np.isin(stream_timestamps, timestamps)]
+                for stream_timestamps, stream_values in values
+            ],
+            axis=1,
+        )
+        return timestamps, streams, values
+
+
+class IxiaTrafficState:
+    """
+    Caches which ixia traffic items are known to be enabled or disabled.
+    update() only sends the items whose state changes: one bulk enable request, one bulk disable request, then one apply.
+    If nothing changes, nothing is sent and the apply is skipped.
+    Items whose apply failed are forgotten, so the next update() sends them again.
+    Parent_Test also forgets every item when a testcase starts, and the items it starts or stops.
+    tgn_module defaults to sste_tgn. Any object with the same ixia_enable_traffic_item(), ixia_disable_traffic_item(), and ixia_apply_traffic_items() functions can be used instead, e.g. a client of a local mock REST server.
+    """
+
+    def __init__(self, tgn_module=None):
+        self.tgn_module = sste_tgn if tgn_module is None else tgn_module
+        self.enabled = set()
+        self.disabled = set()
+        self.applies = 0
+        self.failed_applies = 0
+        self.skipped_applies = 0
+
+    def forget(self, streams: list = None):
+        """
+        Marks streams (all streams if None) as unknown, e.g. after they are changed outside of this class.
+        """
+        if streams is None:
+            self.enabled, self.disabled = set(), set()
+        else:
+            self.enabled -= set(streams)
+            self.disabled -= set(streams)
+
+    def plan(self, enable: list = [], disable: list = []) -> Tuple[list, list]:
+        """
+        Returns the streams that need to be enabled and disabled to reach the target state.
+        """
+        to_enable = [stream for stream in unique(enable) if stream not in self.enabled]
+        to_disable = [
+            stream
+            for stream in unique(disable)
+            if stream not in self.disabled and stream not in to_enable
+        ]
+        return to_enable, to_disable
+
+    def update(
+        self,
+        script_args,
+        tgn_api: str,
+        enable: list = [],
+        disable: list = [],
+        max_apply_attempts: int = 1,
+        wait=sleep,
+    ) -> dict:
+        """
+        Enables and disables the streams that changed, then applies the traffic items once.
+
+        Output
+        ------
+        {
+            "enabled": streams enabled,
+            "disabled": streams disabled,
+            "failed": streams that could not be enabled/disabled,
+            "applied": True if applied, False if the apply failed, None if it was skipped,
+        }
+        """
+        to_enable, to_disable = self.plan(enable, disable)
+        result = {"enabled": [], "disabled": [], "failed": [], "applied": None}
+
+        if to_enable:
+            if self.tgn_module.ixia_enable_traffic_item(
+                script_args, tgn_api, to_enable
+            ):
+                self.enabled.update(to_enable)
+                self.disabled.difference_update(to_enable)
+                result["enabled"] = to_enable
+            else:
+                self.forget(to_enable)
+                result["failed"] += to_enable
+
+        if to_disable:
+            if self.tgn_module.ixia_disable_traffic_item(
+                script_args, tgn_api, to_disable
+            ):
+                self.disabled.update(to_disable)
+                self.enabled.difference_update(to_disable)
+                result["disabled"] = to_disable
+            else:
+                self.forget(to_disable)
+                result["failed"] += to_disable
+
+        if not result["enabled"] and not result["disabled"]:
+            self.skipped_applies += 1
+            return result
+
+        result["applied"] = False
+        for attempt in range(max(1, max_apply_attempts)):
+            if self.tgn_module.ixia_apply_traffic_items(script_args, tgn_api):
+                result["applied"] = True
+                break
+            elif attempt < max_apply_attempts - 1:
+                print_(
+                    f"Attempt to apply traffic items failed {attempt+1} time{'s' if attempt else ''}"
+                )
+                wait(5)
+        if result["applied"]:
+            self.applies += 1
+        else:
+            self.failed_applies += 1
+            self.forget(result["enabled"] + result["disabled"])
+
+        return result
+
+
+class TgnSession:
+    """
+    Keeps one connection to the traffic generator and reuses it across ixia helpers.
+    A session is considered valid until a TGN operation fails, or until it has been idle longer than max_idle seconds.
+    Only then does run() reconnect, and it retries the failed operation once.
+    """
+
+    def __init__(self, max_idle: float = None):
+        self.max_idle = max_idle
+        self.connected = False
+        self.last_used = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.reuses = 0
+
+    def is_valid(self) -> bool:
+        return self.connected and (
+            self.max_idle is None or time() - self.last_used < self.max_idle
+        )
+
+    def invalidate(self):
+        self.connected = False
+
+    def connect(self, script_args, testbed, test_data) -> bool:
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+
+        # tgn_connect() does not reliably return a status, so only an explicit False is treated as a failure
+        self.connected = (
+            sste_tgn.tgn_connect(script_args, testbed, test_data["tgn"], test_data)
+            is not False
+        )
+        self.last_used = time()
+        return self.connected
+
+    def ensure(self, script_args, testbed, test_data) -> bool:
+        """
+        Connects if the session is not valid. Returns whether the session is connected.
+        """
+        if self.is_valid():
+            self.reuses += 1
+            return True
+        return self.connect(script_args, testbed, test_data)
+
+    def run(self, script_args, testbed, test_data, operation, *args, **kwargs):
+        """
+        Runs a TGN operation, e.g. sste_tgn.tgn_start_traffic, on the session.
+        If the operation fails or raises, reconnects and runs it once more.
+        Holds tgn_lock throughout.
+        """
+        with tgn_lock:
+            self.ensure(script_args, testbed, test_data)
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                print_(f"TGN operation {operation.__name__} failed: {e}. Reconnecting.")
+                result = False
+
+            if not result:
+                self.invalidate()
+                if not self.connect(script_args, testbed, test_data):
+                    return result
+                result = operation(*args, **kwargs)
+
+            self.last_used = time()
+            return result
+
+    def summary(self) -> str:
+        return f"{self.connects} connects ({self.reconnects} reconnects), {self.reuses} reuses"
+
+
+class ColumnarTable:
+    """
+    A parsed textfsm table stored by column instead of as a nested dict of strings.
+    A column whose values are all integers (or all floats) that convert back to the same strings is stored as a NumPy array.
+    Any other column is dictionary-encoded: a NumPy array of codes into a list of interned strings.
+    Rows are indexed by their key fields (the textfsm "Key" values), and can be read like the nested dict from sste_common.string_to_textfsm_dict():
+        table["Neighbor"][neighbor]["St_PfxRcd"] or table[neighbor]["St_PfxRcd"]
+    Like the nested dict, rows, records, and columns return strings. array() returns a typed column.
+    """
+
+    def __init__(self, headers: list, rows: list, key_fields: list = None):
+        import numpy as np
+
+        self.headers = list(headers)
+        self.key_fields = [field for field in (key_fields or []) if field in headers]
+        self.value_fields = [
+            field for field in self.headers if field not in self.key_fields
+        ]
+        self.length = len(rows)
+
+        self.columns = {}  # field -> np.ndarray of values or codes
+        self.dictionaries = {}  # field -> [string, ...] for dictionary-encoded fields
+        for column, field in enumerate(self.headers):
+            values = [row[column] for row in rows]
+            typed_values = self._typed(values)
+            if typed_values is not None:
+                self.columns[field] = typed_values
+                continue
+
+            dictionary, codes = {}, []
+            for value in values:
+                value = str(value)
+                if value not in dictionary:
+                    dictionary[value] = len(dictionary)
+                codes.append(dictionary[value])
+            self.dictionaries[field] = [sys.intern(value) for value in dictionary]
+            self.columns[field] = np.array(
+                codes, dtype=np.uint16 if len(dictionary) <= 1 << 16 else np.uint32
+            )
+
+        self._build_index()
+
+    def _build_index(self):
+        self.index = {}  # key -> row number
+        key_columns = [self.column(field) for field in self.key_fields]
+        for row_number, key in enumerate(zip(*key_columns)):
+            self.index[key[0] if len(key) == 1 else key] = row_number
+
+    def __getstate__(self) -> dict:
+        # the index is rebuilt on unpickling/deep-copying instead of being copied
+        state = dict(self.__dict__)
+        del state["index"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._build_index()
+
+    @staticmethod
+    def _typed(values: list):
+        import numpy as np
+
+        if not values or not all(isinstance(value, str) for value in values):
+            return None
+        for dtype, convert in ((np.int64, int), (np.float64, float)):
+            try:
+                converted = [convert(value) for value in values]
+            except ValueError:
+                continue
+            if all(str(number) == value for number, value in zip(converted, values)):
+                return np.array(converted, dtype=dtype)
+        return None
+
+    @classmethod
+    def from_textfsm(cls, cli_output: str, textfsm_file: str):
+        from textfsm import TextFSM
+
+        with open(textfsm_file, "r") as template:
+            fsm = TextFSM(template)
+        rows = fsm.ParseText(cli_output)
+        key_fields = [
+            value.name for value in fsm.values if "Key" in value.OptionNames()
+        ]
+        return cls(fsm.header, rows, key_fields)
+
+    @classmethod
+    def from_records(cls, records: List[dict], key_fields: list = None):
+        """
+        Builds a table from [{field: value}], e.g. the simple_output of run_cmds().
+        """
+        headers = unique([field for record in records for field in record])
+        rows = [
+            [record[field] if field in record else "" for field in headers]
+            for record in records
+        ]
+        return cls(headers, rows, key_fields)
+
+    @classmethod
+    def from_nested_dict(cls, nested: dict):
+        """
+        Builds a table from the nested dict format: {key_field: {key: {field: value, <next key_field>: {...}}}}.
+        """
+        key_fields, headers, rows = [], [], []
+
+        def is_key_level(node):
+            return (
+                isinstance(node, dict)
+                and len(node) == 1
+                and isinstance(next(iter(node.values())), dict)
+                and all(
+                    isinstance(child, dict)
+                    for child in next(iter(node.values())).values()
+                )
+            )
+
+        def walk(node, depth, key):
+            if not is_key_level(node):
+                for field in node:
+                    if field not in headers:
+                        headers.append(field)
+                rows.append((key, node))
+                return
+            key_field, children = next(iter(node.items()))
+            if depth == len(key_fields):
+                key_fields.append(key_field)
+            for key_value, child in children.items():
+                walk(child, depth + 1, key + (key_value,))
+
+        walk(nested, 0, ())
+        headers = key_fields + [field for field in headers if field not in key_fields]
+        return cls(
+            headers,
+            [
+                list(key)
+                + [
+                    values[field] if field in values else ""
+                    for field in headers[len(key) :]
+                ]
+                for key, values in rows
+                if len(key) == len(key_fields)
+            ],
+            key_fields,
+        )
+
+    def to_nested_dict(self) -> dict:
+        nested = {}
+        value_columns = [self.column(field) for field in self.value_fields]
+        key_columns = [self.column(field) for field in self.key_fields]
+        for key, values in zip(zip(*key_columns), zip(*value_columns)):
+            node = nested
+            for key_field, key_value in zip(self.key_fields, key):
+                node = node.setdefault(key_field, {}).setdefault(str(key_value), {})
+            node.update(
+                {field: str(value) for field, value in zip(self.value_fields, values)}
+            )
+        return nested
+
+    def column(self, field: str) -> List[str]:
+        """
+        Returns the values of a field as strings.
+        """
+        if field in self.dictionaries:
+            dictionary = self.dictionaries[field]
+            return [dictionary[code] for code in self.columns[field].tolist()]
+        return [str(value) for value in self.columns[field].tolist()]
+
+    def array(self, field: str):
+        """
+        Returns the values of a field as a NumPy array: int64 or float64 for numeric fields, and object (strings) otherwise.
+        """
+        import numpy as np
+
+        if field in self.dictionaries:
+            return np.array(self.dictionaries[field], dtype=object)[self.columns[field]]
+        return self.columns[field]
+
+    def row(self, row_number: int) -> dict:
+        return {
+            field: (
+                self.dictionaries[field][self.columns[field][row_number]]
+                if field in self.dictionaries
+                else str(self.columns[field][row_number].item())
+            )
+            for field in self.value_fields
+        }
+
+    def records(self, fields: list = None) -> dict:
+        """
+        Returns {key: (field values, ...)} for all rows.
+        """
+        fields = self.value_fields if fields is None else fields
+        columns = [
+            self.column(field) if field in self.columns else [None] * self.length
+            for field in fields
+        ]
+        return dict(zip(self.index.keys(), zip(*columns)))
+
+    def __getitem__(self, key):
+        if key in self.index:
+            return self.row(self.index[key])
+        if self.key_fields and key == self.key_fields[0]:
+            return self  # table["Neighbor"][neighbor], as with the nested dict format
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self.index else default
+
+    def __contains__(self, key) -> bool:
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def keys(self):
+        return self.index.keys()
+
+    def items(self):
+        return ((key, self.row(row_number)) for key, row_number in self.index.items())
+
+
+class CliErrorScanner:
+    """
+    Compiled rules for finding error messages in cli outputs.
+    Rules have the format {cmd_prefix: {error_message: [troubleshoot category, ...]}}, where the cmd_prefix "*" applies to every cmd.
+    The rules that apply to a cmd are found by walking a trie of cmd prefixes, and their messages are searched in one pass with a combined regex, compiled once for each set of messages.
+    The regex is searched again from one character after each match instead of after its end, so overlapping messages (e.g. "fatal error" and "error") are all found in the same pass.
+    """
+
+    def __init__(self, rules: Dict[str, Dict[str, List[str]]]):
+        self.rules = []  # [{error_message: [troubleshoot category, ...]}]
+        # char -> node; a node's None key holds the indices of rules that end there
+        self.trie = {}
+        for cmd_prefix, error_details in rules.items():
+            self.rules.append(dict(error_details or {}))
+            node = self.trie
+            for char in "" if cmd_prefix == "*" else cmd_prefix:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(len(self.rules) - 1)
+        # frozenset of rule indices -> (compiled regex or None, {error_message: categories}, {error_message: (messages it starts with, ...)})
+        self.patterns = {}
+
+    def matching_rules(self, cmd: str) -> List[int]:
+        """
+        Returns the indices of the rules whose cmd prefix cmd starts with.
+        """
+        node = self.trie
+        matched = list(node[None]) if None in node else []
+        for char in cmd:
+            if char not in node:
+                break
+            node = node[char]
+            if None in node:
+                matched += node[None]
+        return matched
+
+    def _pattern(self, rule_indices: frozenset):
+        if rule_indices not in self.patterns:
+            categories = {}
+            for rule_index in sorted(rule_indices):
+                for error_message, troubleshoot_categories in self.rules[
+                    rule_index
+                ].items():
+                    categories.setdefault(error_message, [])
+                    categories[error_message] += [
+                        category
+                        for category in troubleshoot_categories
+                        if category not in categories[error_message]
+                    ]
+            # longest first, so that a match is the longest message starting at its offset
+            pattern = (
+                re.compile(
+                    "|".join(
+                        re.escape(error_message)
+                        for error_message in sorted(categories, key=len, reverse=True)
+                    )
+                )
+                if categories
+                else None
+            )
+            # the shorter messages found at the same offset as a match
+            prefixes = {
+                error_message: tuple(
+                    other_message
+                    for other_message in categories
+                    if other_message != error_message
+                    and error_message.startswith(other_message)
+                )
+                for error_message in categories
+            }
+            self.patterns[rule_indices] = (pattern, categories, prefixes)
+        return self.patterns[rule_indices]
+
+    def scan(self, cmds: Union[str, list], raw_output: str) -> List[dict]:
+        """
+        Returns the first occurrence of each error message that applies to the cmds:
+        [{"message": error_message, "offset": index in raw_output, "categories": [troubleshoot category, ...]}]
+        """
+        if isinstance(cmds, str):
+            cmds = [cmds]
+        rule_indices = frozenset(
+            rule_index for cmd in cmds for rule_index in self.matching_rules(cmd)
+        )
+        pattern, categories, prefixes = self._pattern(rule_indices)
+        if pattern is None or not raw_output:
+            return []
+
+        # matches are found in offset order, so the first hit of each message is its first occurrence
+        hits = {}
+        position = 0
+        while len(hits) < len(categories):
+            match = pattern.search(raw_output, position)
+            if match is None:
+                break
+            for error_message in (match.group(),) + prefixes[match.group()]:
+                if error_message not in hits:
+                    hits[error_message] = {
+                        "message": error_message,
+                        "offset": match.start(),
+                        "categories": categories[error_message],
+                    }
+            position = match.start() + 1
+        return list(hits.values())
+
+
+class SyslogIndex:
+    """
+    A local copy of a router's syslog that only fetches lines logged after the last line it has.
+    The first fetch runs "show logging". Later fetches run "show logging start <month> <day> <hh:mm:ss>" from the last timestamp, and drop the lines already indexed at that second.
+    Lines without a timestamp are appended to the previous entry, and the lines before the first entry (the command timestamp and the buffer header) are dropped.
+    """
+
+    # "RP/0/RP0/CPU0:Oct 19 18:13:57.123 UTC: ..."; the location and the timezone are optional.
+    # The line must start with the timestamp, so that the "Mon Oct 19 18:13:57.123 UTC" line XR prints before the output,
+    # or a timestamp in a message, does not start an entry.
+    timestamp_pattern = re.compile(
+        r"(?:[^\s:]*:\s*)*([A-Z][a-z]{2})\s+(\d{1,2})\s+(\d{2}:\d{2}:\d{2})(?:\.\d+)?(?:\s+[A-Z]{3,5})?\s*:"
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Empties the index, e.g. after "clear logging".
+        """
+        self.entries = []  # [(timestamp, line)], oldest first
+        self.last_timestamp = None  # (month, day, hh:mm:ss)
+        self.lines_at_last_timestamp = set()
+
+    def fetch_cmd(self) -> str:
+        if self.last_timestamp is None:
+            return "show logging"
+        return "show logging start {} {} {}".format(*self.last_timestamp)
+
+    def add(self, output: str) -> int:
+        """
+        Indexes the output of fetch_cmd(). Returns the number of new entries.
+        """
+        new_entries = []
+        for line in (output or "").splitlines():
+            match = self.timestamp_pattern.match(line)
+            if match:
+                new_entries.append([match.groups(), line])
+            elif new_entries and line.strip():
+                new_entries[-1][1] += "\n" + line
+
+        new_entries = [
+            (timestamp, line)
+            for timestamp, line in new_entries
+            if not (
+                timestamp == self.last_timestamp
+                and line in self.lines_at_last_timestamp
+            )
+        ]
+        if new_entries:
+            if new_entries[-1][0] != self.last_timestamp:
+                self.last_timestamp = new_entries[-1][0]
+                self.lines_at_last_timestamp = set()
+            self.lines_at_last_timestamp.update(
+                line
+                for timestamp, line in new_entries
+                if timestamp == self.last_timestamp
+            )
+            self.entries += new_entries
+        return len(new_entries)
+
+    def search(
+        self,
+        include: Union[str, List[str]] = [],
+        exclude: Union[str, List[str]] = [],
+        since: int = 0,
+    ) -> List[str]:
+        """
+        Returns the indexed lines that contain every include text and none of the exclude texts.
+
+        since: int (default: 0)
+            Only search entries from this position onwards, e.g. len(entries) noted earlier.
+        """
+        include = [include] if isinstance(include, str) else include
+        exclude = [exclude] if isinstance(exclude, str) else exclude
+        return [
+            line
+            for _, line in self.entries[since:]
+            if all(text in line for text in include)
+            and not any(text in line for text in exclude)
+        ]
+
+
+class StepProfiler:
+    """
+    Profiles the steps whose titles match any of its patterns with cProfile, and compares tracemalloc snapshots taken before and after each of them.
+    Each profiled step writes <folder>/<number>_<step title>.prof (readable with pstats or snakeviz) and a .txt summary of its top functions and allocations, which is also logged.
+    cProfile only sees the thread that runs the step, so work done in device_context() threads is not included.
+
+    steps: str, list, or None (default: None)
+        Regexes searched in step titles. None profiles every step.
+
+    folder: str (default: "step_profiles")
+
+    top: int (default: 10)
+        Number of functions (by cumulative time) and allocation sites (by size) to summarize.
+
+    allocations: bool (default: True)
+        Whether to trace allocations. Tracing slows the step down noticeably more than cProfile does.
+    """
+
+    def __init__(
+        self,
+        steps: Union[str, List[str]] = None,
+        folder: str = "step_profiles",
+        top: int = 10,
+        allocations: bool = True,
+    ):
+        if isinstance(steps, str):
+            steps = [steps]
+        self.patterns = None if steps is None else [re.compile(step) for step in steps]
+        self.folder = folder
+        self.top = top
+        self.allocations = allocations
+        self.profiled_steps = 0
+
+    def wants(self, step_txt: str) -> bool:
+        return self.patterns is None or any(
+            pattern.search(step_txt) for pattern in self.patterns
+        )
+
+    def summary(self, step_txt: str, seconds: float, profile, before, after) -> str:
+        import io, pstats, tracemalloc
+
+        stats_output = io.StringIO()
+        stats = pstats.Stats(profile, stream=stats_output)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        lines = [f"Profile of '{step_txt}' ({seconds:.3f}s)", stats_output.getvalue()]
+
+        if before is not None:
+            ignore_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            differences = after.filter_traces(ignore_tracemalloc).compare_to(
+                before.filter_traces(ignore_tracemalloc), "lineno"
+            )
+            lines.append(f"Top {self.top} allocations:")
+            lines += [f"    {difference}" for difference in differences[: self.top]]
+        return "\n".join(lines)
+
+    def wrap(self, step_txt: str, func, log) -> callable:
+        """
+        Returns func wrapped to be profiled. log(message) receives the summary.
+        If the profile cannot be summarized or saved, log(message, "warning") receives the error instead, and the step's own result or exception is kept.
+        """
+        import cProfile, tracemalloc
+
+        def profiled(*args, **kwargs):
+            self.profiled_steps += 1
+            file_name = re.sub(r"\W+", "_", step_txt).strip("_")[:80]
+            path = os.path.join(self.folder, f"{self.profiled_steps:03d}_{file_name}")
+
+            started_tracing = self.allocations and not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            before = tracemalloc.take_snapshot() if self.allocations else None
+            profile = cProfile.Profile()
+            start_time = time()
+            try:
+                return profile.runcall(func, *args, **kwargs)
+            finally:
+                seconds = time() - start_time
+                after = tracemalloc.take_snapshot() if self.allocations else None
+                if started_tracing:
+                    tracemalloc.stop()
+
+                try:
+                    summary = self.summary(step_txt, seconds, profile, before, after)
+                    os.makedirs(self.folder, exist_ok=True)
+                    profile.dump_stats(f"{path}.prof")
+                    with open(f"{path}.txt", "w") as summary_file:
+                        summary_file.write(summary)
+                    log(f"{summary}\nSaved the profile to {path}.prof")
+                except Exception as e:
+                    log(
+                        f"Unable to save the profile of '{step_txt}': {type(e).__name__}: {e}",
+                        "warning",
+                    )
+
+        return profiled
+
+
+class SpanTracer:
+    """
+    Records nested spans, e.g. steps, router switches, cli calls, parses, and waits, as Chrome trace events.
+    save() writes a json file that chrome://tracing or https://ui.perfetto.dev opens as a flame chart per thread.
+
+    path: str (default: "parapyats_trace.json")
+
+    max_events: int (default: 1000000)
+        Spans beyond this many are dropped and counted instead.
+    """
+
+    def __init__(self, path: str = "parapyats_trace.json", max_events: int = 1000000):
+        self.path = path
+        self.max_events = max_events
+        self.events = []
+        self.threads = {}  # thread id -> thread name
+        self.dropped = 0
+        self.pid = os.getpid()
+        self.start_time = perf_counter()
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, attributes: dict = {}):
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start_time, perf_counter(), attributes)
+
+    def add(
+        self,
+        name: str,
+        category: str,
+        start_time: float,
+        end_time: float,
+        attributes: dict = {},
+    ):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start_time - self.start_time) * 1e6, 1),
+            "dur": round((end_time - start_time) * 1e6, 1),
+            "pid": self.pid,
+            "tid": thread.ident,
+            "args": {
+                key: (
+                    value
+                    if isinstance(value, (int, float, bool)) or value is None
+                    else str(value)[:1000]
+                )
+                for key, value in attributes.items()
+            },
+        }
+        with self.lock:
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+                return
+            self.events.append(event)
+            self.threads[thread.ident] = thread.name
+
+    def save(self, path: str = None) -> str:
+        path = self.path if path is None else path
+        with self.lock:
+            thread_names = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "tid": thread_id,
+                    "args": {"name": thread_name},
+                }
+                for thread_id, thread_name in self.threads.items()
+            ]
+            trace = {
+                "traceEvents": thread_names + self.events,
+                "displayTimeUnit": "ms",
+                "otherData": {"dropped_spans": self.dropped},
+            }
+        with open(path, "w") as trace_file:
+            json.dump(trace, trace_file)
+        return path
+
+
 class Parent_Test:
     testscript = None
     script_args = None
@@ -128,6 +1308,23 @@ class Parent_Test:
     automation_is_passing = True  # used for flow control
     testcase_passed = True  # used for troubleshooting at the end of a testcase
     step_passed = True  # used in troubleshootable_step() to troubleshoot a step
+    ixia_sampler = None  # IxiaStatsSampler, if started
+    ixia_state_changed_at = 0  # when ixia traffic was last started/stopped
+    ixia_traffic_state = None  # IxiaTrafficState, created on first use
+    tgn_session = None  # TgnSession, created on first use
+    config_generations = {}  # router alias -> number of config/state changes seen
+    cli_error_scanner = None  # (custom rules, CliErrorScanner), compiled on first use
+    syslog_indexes = {}  # router alias -> SyslogIndex
+    # router alias -> router clock at the last check_traceback_dumps()
+    traceback_checked_at = {}
+    # guards the class-level dicts changed from device_context() threads
+    shared_state_lock = threading.RLock()
+    sste_backend = None  # backend installed from test_data["sste_backend"], if any
+    step_profiler = None  # (settings, StepProfiler), created on first use
+    span_tracer = None  # (settings, SpanTracer), created on first use
+    cli_archive = None  # (settings, CliArchiveWriter), created on first use
+    step_title = ""  # title of the latest step started
+    compiled_test_data = None  # (testcase_data, CompiledTestData), for test_data not loaded by load_test_data()
 
     @classmethod
     def initialize(cls):
@@ -160,6 +1357,8 @@ class Parent_Test:
     def set_testcase(cls, testcase):
         cls.set_logger(testcase)
         cls.testcase = testcase
+        if Parent_Test.ixia_traffic_state is not None:
+            Parent_Test.ixia_traffic_state.forget()
 
     @classmethod
     def set_steps(cls, steps):
@@ -182,6 +1381,71 @@ class Parent_Test:
     @classmethod
     def set_test_data(cls, test_data):
         cls.test_data = test_data
+        if (
+            test_data
+            and "strict_templates" in test_data.keys()
+            and test_data["strict_templates"]
+        ):
+            cls.check_format_templates()
+        if (
+            test_data
+            and "async_logging" in test_data.keys()
+            and test_data["async_logging"]
+        ):
+            settings = test_data["async_logging"]
+            cls.start_async_logging(**(settings if isinstance(settings, dict) else {}))
+        if (
+            test_data
+            and "sste_backend" in test_data.keys()
+            and Parent_Test.sste_backend is None
+        ):
+            cls.install_sste_backend(test_data["sste_backend"])
+
+    @classmethod
+    def start_async_logging(cls, **settings) -> AsyncLogWriter:
+        """
+        Routes print_() and log() through an AsyncLogWriter started with the given settings, unless one is running already.
+        test_data["async_logging"] (True, or AsyncLogWriter's parameters) starts it from set_test_data().
+        Queued messages are written before each step starts and finishes, and before the log is uploaded.
+        """
+        global async_log_writer
+        if async_log_writer is None:
+            async_log_writer = AsyncLogWriter(**settings)
+            async_log_writer.start()
+            atexit.register(cls.stop_async_logging)
+        return async_log_writer
+
+    @classmethod
+    def stop_async_logging(cls):
+        global async_log_writer
+        log_writer = async_log_writer
+        if log_writer is not None:
+            async_log_writer = None
+            log_writer.stop()
+
+    @classmethod
+    def flush_logs(cls):
+        """
+        Waits until every queued message is written, if asynchronous logging is on.
+        """
+        if async_log_writer is not None:
+            async_log_writer.flush()
+
+    @classmethod
+    def install_sste_backend(cls, settings: dict):
+        """
+        Replaces the sste functions that reach devices with a backend module's, e.g. to record or replay a session (see sste_replay).
+        settings["module"] (default: "sste_replay") names the module. The other settings are passed to its install() function.
+        """
+        import importlib
+
+        settings = dict(settings)
+        module = importlib.import_module(
+            settings.pop("module") if "module" in settings.keys() else "sste_replay"
+        )
+        Parent_Test.sste_backend = module.install(**settings)
+        print_(f"Installed {module.__name__} backend ({settings})")
+        return Parent_Test.sste_backend
 
     @classmethod
     def set_testbed(cls, testbed):
@@ -243,6 +1507,15 @@ class Parent_Test:
     def log(cls, message: str, log_type="info"):
         if cls.logger is None:
             print_(message)
+        elif async_log_writer is not None:
+            level = {
+                "info": logging.INFO,
+                "warning": logging.WARNING,
+                "error": logging.ERROR,
+                "debug": logging.DEBUG,
+            }
+            if log_type in level:
+                async_log_writer.put(("log", cls.logger, level[log_type], message))
         else:
             if log_type == "info":
                 cls.logger.info(message)
@@ -258,6 +1531,7 @@ class Parent_Test:
         cls.step_passed = True
 
         if cls.step is not None:
+            cls.flush_logs()
             step = cls.step
             cls.step = None
             step.passed(explanation)
@@ -271,6 +1545,7 @@ class Parent_Test:
         cls.step_passed = True
 
         if cls.step is not None:
+            cls.flush_logs()
             step = cls.step
             cls.step = None
             step.passx(explanation)
@@ -286,6 +1561,7 @@ class Parent_Test:
         cls.automation_is_passing = False
 
         if cls.step is not None:
+            cls.flush_logs()
             step = cls.step
             cls.step = None
             step.failed(explanation)
@@ -302,6 +1578,7 @@ class Parent_Test:
         cls.automation_is_passing = False
 
         if cls.step is not None:
+            cls.flush_logs()
             step = cls.step
             cls.step = None
             step.failed(explanation)
@@ -316,6 +1593,7 @@ class Parent_Test:
         cls.step_passed = True
 
         if cls.step is not None:
+            cls.flush_logs()
             step = cls.step
             cls.step = None
             step.skipped(explanation)
@@ -326,6 +1604,7 @@ class Parent_Test:
             return True
 
     @classmethod
+    @traced("wait", "seconds")
     def wait(cls, seconds):
         cls.log(f"Wait {seconds} seconds")
         for i in range(1, int(seconds / 10) + 1):
@@ -491,28 +1770,149 @@ class Parent_Test:
         step_txt = cls._format(step_txt)
 
         def inner(func):
+            func = cls.profile_step(step_txt, cls.trace_step(step_txt, func))
+
             def wrapper(*args, **kwargs):
                 output = None
+                cls.flush_logs()
                 with cls.steps.start(step_txt, continue_=continue_) as step:
                     cls.step = step
+                    cls.step_title = step_txt
+                    # without stopping traffic, the loss of the whole step is only known from counters taken now
+                    ixia_baseline = (
+                        cls.snapshot_ixia_counters()
+                        if ixia_goal in ("lossless", "lossy")
+                        and not cls.uses_disruptive_ixia_stats()
+                        else None
+                    )
                     try:
                         output = func(*args, **kwargs)
+                        cls.flush_logs()
                         if ixia_goal != "skip":
-                            cls.sanity_traffic_check(cls, ixia_goal=ixia_goal)
+                            cls.sanity_traffic_check(
+                                ixia_goal=ixia_goal, baseline=ixia_baseline
+                            )
                         cls.step = None
                         return output
                     except Exception as e:
                         if ixia_goal != "skip":
-                            cls.sanity_traffic_check(cls, ixia_goal=ixia_goal)
+                            cls.sanity_traffic_check(
+                                ixia_goal=ixia_goal, baseline=ixia_baseline
+                            )
                         fail_message = error_to_string(e)
                         cls.error(
                             fail_message,
                             troubleshoot_categories=error_troubleshoot_categories,
                         )
 
-            return wrapper
+            return wrapper
+
+        return inner
+
+    @classmethod
+    def get_step_profiler(cls) -> StepProfiler:
+        """
+        Returns the StepProfiler set up by test_data["step_profiling"], or None if it is undefined or False.
+        test_data["step_profiling"] is either True (profile every step) or StepProfiler's parameters, e.g. {"steps": ["Wait for BGP"], "top": 20}.
+        """
+        settings = (
+            cls.test_data["step_profiling"]
+            if cls.test_data and "step_profiling" in cls.test_data.keys()
+            else None
+        )
+        if not settings:
+            return None
+        if (
+            Parent_Test.step_profiler is None
+            or Parent_Test.step_profiler[0] is not settings
+        ):
+            Parent_Test.step_profiler = (
+                settings,
+                (
+                    StepProfiler(**settings)
+                    if isinstance(settings, dict)
+                    else StepProfiler()
+                ),
+            )
+        return Parent_Test.step_profiler[1]
+
+    @classmethod
+    def profile_step(cls, step_txt: str, func):
+        """
+        Returns func wrapped by the step profiler if step_txt is to be profiled (see get_step_profiler()).
+        Otherwise, returns func itself, so steps run without any profiling overhead.
+        """
+        step_profiler = cls.get_step_profiler()
+        if step_profiler is None or not step_profiler.wants(step_txt):
+            return func
+        return step_profiler.wrap(step_txt, func, cls.log)
+
+    @classmethod
+    def get_span_tracer(cls) -> SpanTracer:
+        """
+        Returns the SpanTracer set up by test_data["span_trace"], or None if it is undefined or False.
+        test_data["span_trace"] is either True, the path of the trace file, or SpanTracer's parameters, e.g. {"path": "ecmp_trace.json"}.
+        The trace is saved by disconnect() or save_span_trace().
+        """
+        settings = (
+            cls.test_data["span_trace"]
+            if cls.test_data and "span_trace" in cls.test_data.keys()
+            else None
+        )
+        if not settings:
+            return None
+        if (
+            Parent_Test.span_tracer is None
+            or Parent_Test.span_tracer[0] is not settings
+        ):
+            if isinstance(settings, dict):
+                span_tracer = SpanTracer(**settings)
+            elif isinstance(settings, str):
+                span_tracer = SpanTracer(settings)
+            else:
+                span_tracer = SpanTracer()
+            Parent_Test.span_tracer = (settings, span_tracer)
+        return Parent_Test.span_tracer[1]
+
+    @classmethod
+    def span(cls, name: str, category: str, **attributes):
+        """
+        Returns a context manager that records a span, with the current router and the given attributes, while span tracing is on.
+        Otherwise, returns one that does nothing.
+
+        Example
+        -------
+        with Test.span("show clock", "exec", command="show clock"):
+            Test.run_cmds("show clock")
+        """
+        span_tracer = cls.get_span_tracer()
+        if span_tracer is None:
+            return contextlib.nullcontext()
+        if cls.script_args and "current_alias" in cls.script_args:
+            attributes.setdefault("router", cls.script_args["current_alias"])
+        return span_tracer.span(name, category, attributes)
+
+    @classmethod
+    def trace_step(cls, step_txt: str, func):
+        """
+        Returns func wrapped to record a "step" span if span tracing is on. Otherwise, returns func itself.
+        """
+        if cls.get_span_tracer() is None:
+            return func
+
+        @wraps(func)
+        def traced_step(*args, **kwargs):
+            with cls.span(step_txt, "step", testcase=cls.testcase):
+                return func(*args, **kwargs)
+
+        return traced_step
 
-        return inner
+    @classmethod
+    def save_span_trace(cls, path: str = None):
+        span_tracer = cls.get_span_tracer()
+        if span_tracer is not None:
+            path = span_tracer.save(path)
+            cls.log(f"Saved {len(span_tracer.events)} spans to {path}")
 
     @classmethod
     def update_troubleshooting_categories(
@@ -610,13 +2010,20 @@ class Parent_Test:
         step_txt = cls._format(step_txt)
 
         def inner(step_function: callable):
+            step_function = cls.profile_step(
+                step_txt, cls.trace_step(step_txt, step_function)
+            )
+
             def wrapper(*args, **kwargs):
                 output = None
                 continue__ = continue_ or enable_troubleshooting
+                cls.flush_logs()
                 with cls.steps.start(step_txt, continue_=continue__) as main_step:
                     cls.step = main_step
+                    cls.step_title = step_txt
                     try:
                         output = step_function(*args, **kwargs)
+                        cls.flush_logs()
                         cls.step = None
                         return output
                     except Exception as e:
@@ -730,6 +2137,7 @@ class Parent_Test:
         return inner
 
     @classmethod
+    @traced("router", "router", "alias")
     def switch_router(cls, router: str = None, alias: str = None, via: str = ""):
         """
         If router is None, attempt to ssh into the original router.
@@ -775,6 +2183,89 @@ class Parent_Test:
                 cls.log("No need to switch router")
                 return True
 
+    @classmethod
+    def device_context(cls, router: str, via: str = ""):
+        """
+        Creates a copy of this class that owns its own script_args, test_data, and ssh session to router.
+        Every function reads cls.script_args and cls.test_data, so the copy's functions run on router without switching the shared session.
+        This allows several routers to be worked on from separate threads.
+        Pass the copy to close_device_context() when done with it, or use device_session(), so that its session is not left open.
+        The class-level dicts shared by the copies (config_generations, syslog_indexes) are only changed under Parent_Test.shared_state_lock.
+        pyats steps are not thread-safe, so the copy has no steps: step-finishing functions (failed(), skipped(), etc.) only log and set the copy's flags.
+
+        Example
+        -------
+        router_b = Test.device_context("router-b")
+        router_b.run_cmds("show logging")
+        """
+        script_args = copy.copy(cls.script_args)
+        script_args["uut_list"] = (
+            dict(cls.script_args["uut_list"]) if "uut_list" in cls.script_args else {}
+        )
+        # Forget the shared session to router, so that switch_router() opens the copy's own
+        script_args["uut_list"].pop(router, None)
+        script_args["current_alias"] = None
+        test_data = copy.copy(cls.test_data)
+        test_data["UUT"] = router
+
+        device_cls = type(
+            f"{cls.__name__}_{router}",
+            (cls,),
+            {
+                "script_args": script_args,
+                "test_data": test_data,
+                "steps": None,
+                "step": None,
+                "automation_is_passing": True,
+                "testcase_passed": True,
+                "step_passed": True,
+                "troubleshoot_categories": [],
+            },
+        )
+        device_cls.switch_router(router, via=via)
+        return device_cls
+
+    @classmethod
+    def close_device_context(cls, device_cls):
+        """
+        Releases the sessions opened by a device_context() copy.
+        A session to a router this class has no session to is handed over to this class, so later calls reuse it.
+        A session to a router this class already has a session to is disconnected.
+        """
+        with Parent_Test.shared_state_lock:
+            if "uut_list" not in cls.script_args:
+                cls.script_args["uut_list"] = {}
+            uut_list = cls.script_args["uut_list"]
+            for alias, session_data in device_cls.script_args["uut_list"].items():
+                if alias not in uut_list:
+                    uut_list[alias] = session_data
+                elif uut_list[alias]["session"] is not session_data["session"]:
+                    try:
+                        session_data["session"].disconnect()
+                    except Exception as e:
+                        cls.log(
+                            f"Cannot disconnect {device_cls.__name__} from {alias}: {type(e).__name__}: {e}"
+                        )
+        device_cls.script_args["uut_list"] = {}
+        device_cls.script_args["current_alias"] = None
+
+    @classmethod
+    @contextlib.contextmanager
+    def device_session(cls, router: str, via: str = ""):
+        """
+        device_context() as a context manager: the copy is passed to close_device_context() on exit.
+
+        Example
+        -------
+        with Test.device_session("router-b") as router_b:
+            router_b.run_cmds("show logging")
+        """
+        device_cls = cls.device_context(router, via=via)
+        try:
+            yield device_cls
+        finally:
+            cls.close_device_context(device_cls)
+
     @classmethod
     def _connect_to_uut(cls, connect_via: str = None):
         nest_data = {
@@ -800,7 +2291,7 @@ class Parent_Test:
         """
 
         args = {"sste_commands": "['show configuration commit changes last 2']"}
-        sste_common.exec_commands(args, cls.script_args)
+        cls.exec_commands(args)
         sste_common.get_version_info(cls.script_args, cls.testbed)
         sste_common.init_nest_data(nest_data, cls.script_args, cls.testbed)
 
@@ -846,8 +2337,285 @@ class Parent_Test:
             )
 
         cls.log("Connected to traffic generator")
+
+        if "ixia_sampling_interval" in cls.test_data.keys():
+            cls.start_ixia_sampler()
+
         return True
 
+    @classmethod
+    def start_ixia_sampler(cls, interval: float = None, max_samples: int = None):
+        """
+        Starts polling ixia traffic stats in the background (see IxiaStatsSampler).
+        sanity_traffic_check(), check_traffic_loss(), and ensure_ixia_is_running() read the sampled stats instead of querying ixia while it runs.
+
+        interval: float (default: None)
+            Seconds between samples. If None, use test_data["ixia_sampling_interval"], or 5 if it is undefined.
+
+        max_samples: int (default: None)
+            Samples kept per stream. If None, use test_data["ixia_max_samples"], or 720 if it is undefined.
+        """
+        if interval is None:
+            interval = (
+                cls.test_data["ixia_sampling_interval"]
+                if "ixia_sampling_interval" in cls.test_data.keys()
+                else 5
+            )
+        if max_samples is None:
+            max_samples = (
+                cls.test_data["ixia_max_samples"]
+                if "ixia_max_samples" in cls.test_data.keys()
+                else 720
+            )
+
+        cls.stop_ixia_sampler()
+        Parent_Test.ixia_sampler = IxiaStatsSampler(
+            cls.script_args, cls.test_data["tgn"], float(interval), int(max_samples)
+        )
+        Parent_Test.ixia_sampler.start()
+        cls.log(f"Sampling ixia traffic stats every {interval} seconds")
+        return True
+
+    @classmethod
+    def stop_ixia_sampler(cls):
+        if cls.ixia_sampler is not None:
+            cls.ixia_sampler.stop()
+            Parent_Test.ixia_sampler = None
+            cls.log("Stopped sampling ixia traffic stats")
+        return True
+
+    @classmethod
+    def sampled_ixia_stats(cls, streams: list = None) -> dict:
+        """
+        Returns the sampler's latest stats taken after ixia traffic was last started/stopped, in tgn_get_stats_flexible()'s format.
+        Returns None if the sampler is not running or has no such sample for every requested stream, so that the caller can query ixia instead.
+        """
+        if cls.ixia_sampler is None or not cls.ixia_sampler.is_alive():
+            return None
+
+        stats = cls.ixia_sampler.latest(streams, since=cls.ixia_state_changed_at)
+        if not stats or (streams is not None and len(stats) < len(unique(streams))):
+            return None
+
+        return stats
+
+    @classmethod
+    def get_loss_curve(cls, stream: str, since: float = 0) -> list:
+        """
+        Returns the sampled [(timestamp, Loss %), ...] of a stream. Requires start_ixia_sampler().
+        """
+        if cls.ixia_sampler is None:
+            return []
+        return cls.ixia_sampler.loss_curve(stream, since)
+
+    @classmethod
+    def _traffic_streams(cls, traffic: Union[int, str, list] = None):
+        """
+        If traffic is an integer, assume it is a testcase traffic group number.
+        If traffic is a string, assume it is a traffic stream name.
+        Returns a list of traffic stream names, or None (all streams).
+        """
+        if isinstance(traffic, int):
+            try:
+                traffic = cls.get_traffic_streams(traffic)
+            except KeyError as e:
+                traffic = None
+        if isinstance(traffic, str):
+            traffic = [traffic]
+        return traffic
+
+    @classmethod
+    def snapshot_traffic_counters(cls, traffic: Union[int, str, list] = None) -> dict:
+        """
+        Takes one snapshot of every stream's Tx/Rx frame counters and Tx frame rate.
+        traffic is interpreted as in get_ixia_stats().
+
+        Output
+        ------
+        {"time": timestamp, "streams": NumPy array of names, "tx": ..., "rx": ..., "tx_rate": ...}
+        """
+        import numpy as np
+
+        fields = ["Tx Frames", "Rx Frames", "Tx Frame Rate"]
+        with tgn_lock:
+            stats = sste_tgn.tgn_get_stats_flexible(
+                cls.script_args,
+                cls.test_data["tgn"],
+                cls._traffic_streams(traffic),
+                fields,
+                print_output=False,
+            )
+        timestamp = time()
+
+        streams = list(stats.keys())
+        counters = np.array(
+            [
+                [to_number(stats[stream].get(field, 0)) for field in fields]
+                for stream in streams
+            ],
+            dtype=float,
+        ).reshape(len(streams), len(fields))
+
+        return {
+            "time": timestamp,
+            "streams": np.array(streams, dtype=object),
+            "tx": counters[:, 0],
+            "rx": counters[:, 1],
+            "tx_rate": counters[:, 2],
+        }
+
+    @classmethod
+    def compute_outage_durations(cls, before: dict, after: dict) -> dict:
+        """
+        Computes each stream's outage between two snapshot_traffic_counters() snapshots:
+            frames lost = Tx frames sent - Rx frames received between the snapshots
+            outage seconds = frames lost / Tx rate
+        The Tx rate is the Tx Frame Rate of the second snapshot, or the average Tx rate between the snapshots if ixia reports none.
+        All arithmetic is done on NumPy arrays across all streams at once.
+
+        Output
+        ------
+        {"streams": names, "frames_lost": ..., "tx_rate": ..., "outage_seconds": ...}, all NumPy arrays
+        """
+        import numpy as np
+
+        streams, before_index, after_index = np.intersect1d(
+            before["streams"].astype(str),
+            after["streams"].astype(str),
+            return_indices=True,
+        )
+        tx = after["tx"][after_index] - before["tx"][before_index]
+        rx = after["rx"][after_index] - before["rx"][before_index]
+        seconds = max(after["time"] - before["time"], 0.001)
+
+        tx_rate = after["tx_rate"][after_index]
+        tx_rate = np.where(tx_rate > 0, tx_rate, tx / seconds)
+        frames_lost = np.clip(tx - rx, 0, None)
+        outage_seconds = np.divide(
+            frames_lost, tx_rate, out=np.zeros_like(frames_lost), where=tx_rate > 0
+        )
+
+        return {
+            "streams": streams,
+            "frames_lost": frames_lost,
+            "tx_rate": tx_rate,
+            "outage_seconds": outage_seconds,
+        }
+
+    @classmethod
+    def get_loss_timeline(
+        cls,
+        traffic: Union[int, str, list] = None,
+        since: float = 0,
+        until: float = None,
+    ) -> dict:
+        """
+        Uses the sampler's buffers (see start_ixia_sampler()) to compute, for each interval between two polls, the seconds of traffic lost by each stream.
+        Returns None if the sampler is not running.
+
+        Output
+        ------
+        {"time": [end of each interval], "outage_seconds": {stream: [seconds lost in each interval]}}
+        """
+        import numpy as np
+
+        if cls.ixia_sampler is None:
+            return None
+
+        timestamps, streams, values = cls.ixia_sampler.as_arrays(
+            cls._traffic_streams(traffic), since, until
+        )
+        if len(timestamps) < 2:
+            return {"time": [], "outage_seconds": {stream: [] for stream in streams}}
+
+        columns = IxiaStatsSampler.columns
+        deltas = np.diff(values, axis=0)
+        tx, rx = (
+            deltas[:, :, columns.index("Tx Frames")],
+            deltas[:, :, columns.index("Rx Frames")],
+        )
+        seconds = np.diff(timestamps)[:, None]
+        tx_rate = values[1:, :, columns.index("Tx Frame Rate")]
+        tx_rate = np.where(tx_rate > 0, tx_rate, tx / seconds)
+
+        frames_lost = np.clip(tx - rx, 0, None)
+        outage_seconds = np.divide(
+            frames_lost, tx_rate, out=np.zeros_like(frames_lost), where=tx_rate > 0
+        )
+
+        return {
+            "time": timestamps[1:].tolist(),
+            "outage_seconds": dict(zip(streams, outage_seconds.T.tolist())),
+        }
+
+    @classmethod
+    def record_convergence(cls, label: str, outages: dict, timeline: dict = None):
+        """
+        Stores compute_outage_durations()'s result in script_args["convergence"][label] as {stream: outage seconds}, and the longest outage in the timing report.
+        """
+        import numpy as np
+
+        if "convergence" not in cls.script_args:
+            cls.script_args["convergence"] = {}
+
+        outage_seconds = dict(
+            zip(outages["streams"].tolist(), outages["outage_seconds"].tolist())
+        )
+        cls.script_args["convergence"][label] = outage_seconds
+        if timeline is not None:
+            if "convergence_timeline" not in cls.script_args:
+                cls.script_args["convergence_timeline"] = {}
+            cls.script_args["convergence_timeline"][label] = timeline
+
+        if outage_seconds:
+            longest = int(np.argmax(outages["outage_seconds"]))
+            longest_stream = outages["streams"][longest]
+            longest_seconds = outages["outage_seconds"][longest]
+            summary = f"{longest_seconds:.3f}s (longest, {longest_stream})"
+            if cls.timing is not None:
+                cls.timing[f"{label} outage"] = summary
+            cls.log(f"{label} outage: {summary}")
+        else:
+            cls.log(f"{label} outage: no traffic stats", "warning")
+
+        return outage_seconds
+
+    @classmethod
+    def measure_convergence(
+        cls, label: str, traffic: Union[int, str, list] = None, settle_time: int = 0
+    ):
+        """
+        Snapshots the traffic counters, runs the inner function (the trigger), waits settle_time seconds, then snapshots the counters again.
+        Each stream's outage (frames lost / Tx rate) is logged and stored by record_convergence().
+        If the sampler is running, the loss timeline around the trigger is stored in script_args["convergence_timeline"][label].
+        Traffic must be running throughout.
+
+        Example
+        -------
+        Test.measure_convergence("Clear BGP", traffic=1, settle_time=60) \\
+            (Test.clear_bgp_sessions_hard)()
+        """
+
+        def inner(func: callable):
+            def wrapper(*args, **kwargs):
+                before = cls.snapshot_traffic_counters(traffic)
+                output = func(*args, **kwargs)
+                if settle_time:
+                    cls.wait(settle_time)
+                after = cls.snapshot_traffic_counters(traffic)
+
+                timeline = cls.get_loss_timeline(
+                    traffic, since=before["time"], until=after["time"]
+                )
+                cls.record_convergence(
+                    label, cls.compute_outage_durations(before, after), timeline
+                )
+                return output
+
+            return wrapper
+
+        return inner
+
     @classmethod
     def check_system_NSR_state(cls):
         if sste_common.get_nsr_state(
@@ -932,7 +2700,7 @@ class Parent_Test:
         args = {
             "sste_commands": f"['show running-config | file harddisk:/{destination}']"
         }
-        sste_common.exec_commands(args, cls.script_args)
+        cls.exec_commands(args)
 
         cls.log(f"Backed up running config to {destination}")
         return True
@@ -1003,6 +2771,38 @@ class Parent_Test:
         cls.log("Test parameters are set")
         return True
 
+    @classmethod
+    def get_compiled_test_data(cls):
+        """
+        Returns the CompiledTestData of test_data (see test_data_loader).
+        test_data loaded by load_test_data() carries it already. Any other test_data is compiled on first use,
+        and again whenever test_data["testcase_data"] is replaced.
+        """
+        compiled = getattr(cls.test_data, "compiled", None)
+        if compiled is not None:
+            return compiled
+
+        testcase_data = cls.test_data.get("testcase_data")
+        if (
+            Parent_Test.compiled_test_data is None
+            or Parent_Test.compiled_test_data[0] is not testcase_data
+        ):
+            Parent_Test.compiled_test_data = (
+                testcase_data,
+                test_data_loader.compile_test_data(cls.test_data),
+            )
+        return Parent_Test.compiled_test_data[1]
+
+    @classmethod
+    def get_traffic_streams(cls, traffic_num) -> list:
+        """
+        Returns the stream names in the current testcase's traffic group <traffic_num>, i.e. test_data["testcase_data"][testcase]["traffic"]["group<traffic_num>"].
+        Returns None (all streams) if the group is null, and raises KeyError if the group is undefined.
+        """
+        traffic_groups = cls.get_compiled_test_data().traffic_groups[cls.testcase]
+        streams = traffic_groups[f"group{traffic_num}"]
+        return None if streams is None else list(streams)
+
     @classmethod
     def get_testcases(cls, module_name: str) -> list:
         classes = inspect.getmembers(sys.modules[module_name], inspect.isclass)
@@ -1023,13 +2823,10 @@ class Parent_Test:
 
     @classmethod
     def skip_inactive_tests(cls, testcases: list):
-        target_testcases = cls.test_data["active_testcases"]
-        always_skipped_testcases = cls.test_data["always_skip_testcases"]
-        target_testcases = [
-            testcase
-            for testcase in target_testcases
-            if not testcase in always_skipped_testcases
-        ]
+        # Raises KeyError like test_data lookups do, rather than skipping every testcase
+        for key in ("active_testcases", "always_skip_testcases"):
+            cls.test_data[key]
+        target_testcases = set(cls.get_compiled_test_data().active_testcases)
 
         inactive_testcases = [
             testcase_class
@@ -1050,9 +2847,7 @@ class Parent_Test:
             "sste_commands": ["show platform | i R(S)*P"],
             "sste_delay": 30,
         }
-        exclude_nodes = sste_common.exec_commands(
-            args, cls.testscript.parameters["script_args"]
-        )
+        exclude_nodes = cls.exec_commands(args)
         if "node_list" in cls.test_data:
             for node in cls.test_data["node_list"].split(","):
                 if node not in exclude_nodes:
@@ -1247,13 +3042,14 @@ class Parent_Test:
         """
         For a given line, if {some_key} exists, run string.format(**replacewith).
         if replacewith is None, it is assumed to be cls.test_data
+        Each distinct line is parsed once into a FormatTemplate (see test_data_loader), which renders it by looking its keys up.
         """
-        needs_replacing = re.findall("{\w+}", line)
-        if needs_replacing:
+        template = cls.get_format_template(line)
+        if template.formats:
             if replacewith is None:
                 replacewith = cls.test_data
             try:
-                line = line.format(**replacewith)
+                line = template.render(replacewith)
             except KeyError as e:
                 fail_message = (
                     f"{type(e).__name__} when formatting {line}: {', '.join(e.args)}"
@@ -1261,6 +3057,36 @@ class Parent_Test:
                 cls.log(fail_message, "warning")
         return line
 
+    @classmethod
+    def get_format_template(cls, line: str):
+        """
+        Returns the FormatTemplate of line, parsing it on first use.
+        Templates found in test_data's configs are parsed when test_data is compiled (see get_compiled_test_data()).
+        """
+        template = format_templates.get(line)
+        if template is None:
+            compiled = cls.get_compiled_test_data() if cls.test_data else None
+            if compiled is not None and line in compiled.templates:
+                template = compiled.templates[line]
+            else:
+                template = test_data_loader.FormatTemplate(line)
+            if len(format_templates) >= MAX_FORMAT_TEMPLATES:
+                format_templates.clear()
+            format_templates[line] = template
+        return template
+
+    @classmethod
+    def check_format_templates(cls):
+        """
+        Raises TestDataError if templates in test_data's configs use keys test_data lacks.
+        Called by set_test_data() if test_data["strict_templates"] is True, so they are reported before the test starts, instead of as warnings when they are formatted.
+        """
+        errors = test_data_loader.check_templates(
+            cls.test_data, cls.get_compiled_test_data()
+        )
+        if errors:
+            raise test_data_loader.TestDataError("test_data", errors)
+
     @classmethod
     def get_setting(cls, config_data: dict):
         """
@@ -1277,6 +3103,7 @@ class Parent_Test:
         return setting
 
     @classmethod
+    @traced("config", "config_data")
     def copy_to_router(cls, config_data: dict):
         """
         config_data must have "path" and "file", which refer to a file on the local server.
@@ -1317,10 +3144,10 @@ class Parent_Test:
 
         if copy_successful:
             args = {"sste_commands": f"['run chmod 777 /harddisk:/{filename}']"}
-            sste_common.exec_commands(args, cls.script_args)
+            cls.exec_commands(args)
 
             module_args = {"sste_commands": f"['dir harddisk:/{filename}']"}
-            output = sste_common.exec_commands(module_args, cls.script_args)
+            output = cls.exec_commands(module_args)
 
             copied_file_exists = not (
                 output.replace("\n", "").find("Path does not exist") > 0
@@ -1336,6 +3163,29 @@ class Parent_Test:
             cls.failed(f"Unable to copy config{cls.get_setting(config_data)}")
 
     @classmethod
+    def config_generation(cls, router: str = None) -> int:
+        """
+        Returns how many times the router's (the current router's by default) config or routing state has been changed by this script.
+        Caches of router state compare it to know when they are stale.
+        """
+        router = cls.script_args["current_alias"] if router is None else router
+        return (
+            Parent_Test.config_generations[router]
+            if router in Parent_Test.config_generations
+            else 0
+        )
+
+    @classmethod
+    def note_config_change(cls, router: str = None):
+        """
+        Marks the router's (the current router's by default) config or routing state as changed, e.g. after a commit, a rollback, or a BGP clear.
+        """
+        router = cls.script_args["current_alias"] if router is None else router
+        with Parent_Test.shared_state_lock:
+            Parent_Test.config_generations[router] = cls.config_generation(router) + 1
+
+    @classmethod
+    @traced("config", "config_data")
     def commit_replace(cls, config_data: dict):
         """
         config_data must have "file", which refers to an existing file on harddisk:/
@@ -1360,6 +3210,7 @@ class Parent_Test:
             }
 
             output = sste_common.safe_config_commands(args, cls.script_args)
+            cls.note_config_change()
 
             if output:
                 if "Failed to commit one or more configuration items" in output:
@@ -1383,6 +3234,7 @@ class Parent_Test:
             cls.skipped(f"Cannot find harddisk:{filename}")
 
     @classmethod
+    @traced("config", "config_data")
     def configure(cls, config_data: dict):
         """
         Applies a given set of config instructions using either "conf t" or commit replace. Rolls back the config if rollback is True.
@@ -1406,6 +3258,7 @@ class Parent_Test:
         }
 
         output = sste_common.safe_config_commands(args, cls.script_args)
+        cls.note_config_change()
 
         if output:
             cls.log(f"Finished applying configs{cls.get_setting(config_data)}")
@@ -1414,6 +3267,7 @@ class Parent_Test:
             cls.failed(f"Cannot apply configs{cls.get_setting(config_data)}")
 
     @classmethod
+    @traced("config", "config_data")
     def rollback_configs(cls, config_data: Union[str, list, dict, int]):
         """
         If config_data is an int, it is assumed to be the number of rollbacks needed:
@@ -1452,9 +3306,8 @@ class Parent_Test:
                     f"rollback configuration last {num_rollbacks}",
                 ],
             }
-            rollback_successful = sste_common.exec_commands(
-                module_args, cls.script_args
-            )
+            rollback_successful = cls.exec_commands(module_args)
+            cls.note_config_change()
 
             if rollback_successful:
                 cls.log(f"Rolled back {num_rollbacks} configs")
@@ -1473,6 +3326,7 @@ class Parent_Test:
         cls.run_on_router(device_name)(cls.rollback_configs)(rollbacks_needed)
 
     @classmethod
+    @traced("config", "config_data", "rollback")
     def apply_configs_(
         cls, config_data: Union[str, list, dict], rollback=False, replacewith=None
     ):
@@ -1630,6 +3484,168 @@ class Parent_Test:
         for router in target_routers:
             cls.apply_golden_configs(router)
 
+    @classmethod
+    def _run_lifecycle_stage(cls, stage: str, router: str, lcs=8):
+        """
+        Runs one device lifecycle stage on the current router. Used by run_device_lifecycle().
+        """
+        if stage == "backup":
+            return cls.backup_running_config_()
+        elif stage == "golden":
+            return cls.apply_golden_configs_(router)
+        elif stage == "restore":
+            return cls.restore_running_config_()
+        elif stage == "reload_lcs":
+            return cls.lc_reload(lcs, wait=False)
+        else:
+            return cls.failed(f"Unknown device lifecycle stage '{stage}'")
+
+    @classmethod
+    def _report_lifecycle_result(cls, passed: bool, explanation: str):
+        if passed is None:
+            return cls.skipped(explanation)
+        elif passed:
+            return cls.passed(explanation)
+        else:
+            return cls.failed(explanation)
+
+    @classmethod
+    def run_device_lifecycle(
+        cls,
+        stages_by_router: Dict[str, List[str]],
+        max_parallel: int = None,
+        lcs=8,
+        readiness_wait: int = 10 * 60,
+    ):
+        """
+        Runs the lifecycle stages of several routers concurrently, each router on its own ssh session (see device_context()).
+        Each router's stages run in the given order. If a stage fails, the router's remaining stages are skipped.
+        Once every router is done, each stage is reported as its own step, and if any LC was reloaded, wait readiness_wait seconds once for all of them.
+
+        Parameters
+        ----------
+        stages_by_router: Dict[str, List[str]]
+            {router: [stage, ...]}. The stage options are:
+            "backup": backup_running_config_()
+            "golden": apply_golden_configs_()
+            "restore": restore_running_config_()
+            "reload_lcs": lc_reload() without waiting
+
+        max_parallel: int (default: None)
+            The number of routers worked on at the same time.
+            If None, use test_data["max_parallel_devices"], or 4 if it is undefined.
+
+        lcs: int, list (default: 8)
+            The LCs to reload in the "reload_lcs" stage
+
+        readiness_wait: int (default: 600)
+            The number of seconds to wait for reloaded LCs
+
+        Example
+        -------
+        Test.run_device_lifecycle({"router-a": ["restore", "reload_lcs"], "router-b": ["restore"]})
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        stage_titles = {
+            "backup": "Back up current configurations",
+            "golden": "Apply golden config",
+            "restore": "Load pre-test configurations",
+            "reload_lcs": "Reload LCs",
+        }
+
+        if max_parallel is None:
+            max_parallel = (
+                cls.test_data["max_parallel_devices"]
+                if "max_parallel_devices" in cls.test_data.keys()
+                else 4
+            )
+        max_parallel = max(1, int(max_parallel))
+
+        def run_stages(router: str, stages: List[str]):
+            try:
+                device_cls = cls.device_context(router)
+            except Exception as e:
+                explanation = f"Cannot ssh into {router}: {error_to_string(e)}"
+                return None, [(stage, False, explanation) for stage in stages]
+
+            results = []
+            try:
+                for i, stage in enumerate(stages):
+                    stage_start_time = time()
+                    device_cls.step_passed = True
+                    try:
+                        if (
+                            device_cls._run_lifecycle_stage(stage, router, lcs=lcs)
+                            is False
+                        ):
+                            device_cls.failed(f"{stage} returned False")
+                    except Exception as e:
+                        device_cls.failed(error_to_string(e))
+                    time_spent = time_to_string(time() - stage_start_time)
+
+                    if not device_cls.step_passed:
+                        results.append(
+                            (
+                                stage,
+                                False,
+                                f"{stage} failed on {router} after {time_spent}",
+                            )
+                        )
+                        results += [
+                            (
+                                skipped_stage,
+                                None,
+                                f"{skipped_stage} skipped on {router} because {stage} failed",
+                            )
+                            for skipped_stage in stages[i + 1 :]
+                        ]
+                        break
+
+                    results.append(
+                        (stage, True, f"{stage} finished on {router} in {time_spent}")
+                    )
+            finally:
+                cls.close_device_context(device_cls)
+
+            return device_cls, results
+
+        start_time = time()
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            futures = {
+                router: executor.submit(run_stages, router, stages)
+                for router, stages in stages_by_router.items()
+            }
+        results_by_router = {
+            router: future.result() for router, future in futures.items()
+        }
+
+        all_stages = unique(
+            [stage for stages in stages_by_router.values() for stage in stages]
+        )
+        cls.record_timing(
+            f"Device lifecycle ({', '.join(all_stages)})", time() - start_time
+        )
+
+        lcs_reloaded = False
+        for router, (_, results) in results_by_router.items():
+            for stage, passed, explanation in results:
+                lcs_reloaded = lcs_reloaded or (stage == "reload_lcs" and passed)
+                cls.start_step(
+                    f"{stage_titles.get(stage, stage)} on {router}", continue_=True
+                )(cls._report_lifecycle_result)(passed, explanation)
+
+        if lcs_reloaded and readiness_wait:
+            cls.start_step("Wait for reloaded LCs to be ready", continue_=True)(
+                cls.wait
+            )(readiness_wait)
+
+        return all(
+            passed
+            for _, results in results_by_router.values()
+            for _, passed, _ in results
+        )
+
     @classmethod
     def remove_configs(cls, configs: Union[str, list, dict]):
         """
@@ -1667,11 +3683,9 @@ class Parent_Test:
         Apply them all in the order of lowest (most negative) to biggest (most positive, usually -1).
         """
         testcase_configs = cls.test_data["testcase_data"][cls.testcase]["configs"]
-
-        cleanup_config_nums = [
-            config_num for config_num in testcase_configs.keys() if config_num < 0
+        _, cleanup_config_nums = cls.get_compiled_test_data().config_numbers[
+            cls.testcase
         ]
-        cleanup_config_nums.sort()
 
         for config_num in cleanup_config_nums:
             config_data = testcase_configs[config_num]
@@ -1704,13 +3718,25 @@ class Parent_Test:
         return parsed_output
 
     @classmethod
+    @traced("parse", "textfsm_file", "simple_output", "columnar")
     def parse_with_textfsm(
-        cls, cli_output: str, textfsm_file: str, simple_output: bool = False
+        cls,
+        cli_output: str,
+        textfsm_file: str,
+        simple_output: bool = False,
+        columnar: bool = False,
     ):
         if not textfsm_file.startswith(cls.test_data["textfsm_folder"]):
             textfsm_file = cls.full_textfsm_path(textfsm_file)
 
-        if simple_output:
+        if columnar:
+            try:
+                parsed_output = ColumnarTable.from_textfsm(cli_output, textfsm_file)
+            except Exception as e:
+                cls.log("Failed to parse cli output using textfsm.", "warning")
+                cls.log("{}.".format(str(e)), "warning")
+                parsed_output = ColumnarTable([], [])
+        elif simple_output:
             parsed_output = cls.string_to_list_of_single_layer_textfsm_dictionary(
                 cli_output, textfsm_file
             )
@@ -1721,42 +3747,128 @@ class Parent_Test:
 
         return parsed_output
 
+    @classmethod
+    def get_cli_error_scanner(cls) -> CliErrorScanner:
+        """
+        Compiles the error rules once (see CliErrorScanner).
+        Rules in test_data["cli_error_rules"] ({cmd_prefix: {error_message: [troubleshoot category, ...]}}) are added to the default rules.
+        """
+        # None rather than a new {} when undefined, so that the identity check below keeps the compiled scanner
+        custom_rules = (
+            cls.test_data["cli_error_rules"]
+            if cls.test_data and "cli_error_rules" in cls.test_data.keys()
+            else None
+        )
+        if (
+            Parent_Test.cli_error_scanner is None
+            or Parent_Test.cli_error_scanner[0] is not custom_rules
+        ):
+            cmd_prefix_and_error_messages_and_troubleshoot_categories = {
+                "*": {},
+                "show lldp neighbor": {
+                    "'sysdb' detected the 'warning' condition": [
+                        "sysdb",
+                    ],
+                    "took too long to process a request": [],
+                },
+            }
+            for cmd_prefix, error_details in (custom_rules or {}).items():
+                cmd_prefix_and_error_messages_and_troubleshoot_categories.setdefault(
+                    cmd_prefix, {}
+                ).update(error_details)
+
+            Parent_Test.cli_error_scanner = (
+                custom_rules,
+                CliErrorScanner(
+                    cmd_prefix_and_error_messages_and_troubleshoot_categories
+                ),
+            )
+        return Parent_Test.cli_error_scanner[1]
+
     @classmethod
     def check_cli_output_for_errors(cls, cmds, raw_output):
         """
-        Checks a cli output for error messages using the cmd_prefix_and_error_messages_and_troubleshoot_categories dictionary.
+        Checks a cli output for error messages using the compiled error rules (see get_cli_error_scanner()).
         If an error is found, update cls.troubleshoot_categories and enable the "failed" troubleshoot level.
         Return True if an error is found. Else, return False.
         """
-        cmd_prefix_and_error_messages_and_troubleshoot_categories = {
-            "*": {},
-            "show lldp neighbor": {
-                "'sysdb' detected the 'warning' condition": [
-                    "sysdb",
-                ],
-                "took too long to process a request": [],
-            },
-        }
+        hits = cls.get_cli_error_scanner().scan(cmds, raw_output)
 
-        if isinstance(cmds, str):
-            cmds = [cmds]
+        for hit in hits:
+            print_(f"Found '{hit['message']}' at offset {hit['offset']} of the output")
+            cls.update_troubleshooting_categories(hit["categories"])
+            cls.testcase_passed = False
+
+        return bool(hits)
+
+    @classmethod
+    def get_cli_archive(cls):
+        """
+        Returns the CliArchiveWriter set up by test_data["cli_archive"], or None if it is undefined or False (see cli_archive).
+        test_data["cli_archive"] is either True (archive to cli_archives/<start time>.cliarc), the path of the archive, or CliArchiveWriter's parameters.
+        """
+        settings = (
+            cls.test_data["cli_archive"]
+            if cls.test_data and "cli_archive" in cls.test_data.keys()
+            else None
+        )
+        if not settings:
+            return None
+        if (
+            Parent_Test.cli_archive is None
+            or Parent_Test.cli_archive[0] is not settings
+        ):
+            from cli_archive import CliArchiveWriter
+
+            if isinstance(settings, dict):
+                cli_archive = CliArchiveWriter(**settings)
+            elif isinstance(settings, str):
+                cli_archive = CliArchiveWriter(settings)
+            else:
+                from datetime import datetime
+
+                cli_archive = CliArchiveWriter(
+                    f"cli_archives/{datetime.now():%Y%m%d_%H%M%S}.cliarc"
+                )
+            Parent_Test.cli_archive = (settings, cli_archive)
+        return Parent_Test.cli_archive[1]
 
-        error_found = False
-        for (
-            cmd_prefix,
-            error_details,
-        ) in cmd_prefix_and_error_messages_and_troubleshoot_categories.items():
-            prefix_matched = cmd_prefix == "*" or any(
-                cmd.startswith(cmd_prefix) for cmd in cmds
+    @classmethod
+    def exec_commands(cls, args: dict):
+        """
+        Runs sste_common.exec_commands(args, cls.script_args) on the current router, and archives the output if the cli archive is on (see get_cli_archive()).
+        """
+        cmds = args["sste_commands"]
+        command = cmds if isinstance(cmds, str) else "\n".join(cmds)
+        with cls.span(command, "exec", command=command):
+            output = sste_common.exec_commands(args, cls.script_args)
+
+        cli_archive = cls.get_cli_archive()
+        if cli_archive is not None:
+            router = (
+                cls.script_args["current_alias"]
+                if "current_alias" in cls.script_args
+                else ""
             )
-            if prefix_matched:
-                for error_message, troubleshoot_categories in error_details.items():
-                    if error_message in raw_output:
-                        cls.update_troubleshooting_categories(troubleshoot_categories)
-                        cls.testcase_passed = False
-                        error_found = True
+            cli_archive.add(router, command, output, step=cls.step_title)
+        return output
+
+    @classmethod
+    def search_cli_archive(
+        cls, router: str = None, command: str = None, step: str = None
+    ) -> List[str]:
+        """
+        Returns the archived outputs that match router, and the regexes command and step (see cli_archive.CliArchive.find()).
+        Returns [] if the cli archive is off.
+        """
+        cli_archive = cls.get_cli_archive()
+        if cli_archive is None:
+            return []
+        from cli_archive import CliArchive
 
-        return error_found
+        cli_archive.flush()
+        with CliArchive(cli_archive.path) as archive:
+            return archive.search(router=router, command=command, step=step)
 
     @classmethod
     def run_cmds(
@@ -1768,6 +3880,7 @@ class Parent_Test:
         check_for_errors: bool = True,
         retries: int = 1,
         log_output: bool = True,
+        columnar: bool = False,
     ):
         """
         run the given cmds.
@@ -1807,6 +3920,10 @@ class Parent_Test:
         log_output: bool (Default: True)
             The "log_output" parameter in sste_common.exec_commands()'s args argument.
 
+        columnar: bool (Default: False)
+            If True, return each parsed output as a ColumnarTable instead of a dictionary.
+            Only applies if textfsm file is not None. Takes precedence over simple_output.
+
         Output
         ------
         List in, list out.
@@ -1820,12 +3937,13 @@ class Parent_Test:
 
         cls.script_args["trigger_start_time"] = time()
 
+        if any(cmd.startswith("clear logging") for cmd in cmds):
+            cls.get_syslog_index().reset()
+
         need_to_rerun = False
         for i in range(retries):
             outputs = [
-                sste_common.exec_commands(
-                    {"sste_commands": [cmd], "log_output": log_output}, cls.script_args
-                )
+                cls.exec_commands({"sste_commands": [cmd], "log_output": log_output})
                 for cmd in cmds
             ]
 
@@ -1853,13 +3971,18 @@ class Parent_Test:
             if isinstance(textfsm_files, str):
                 outputs = [
                     cls.parse_with_textfsm(
-                        output, textfsm_files, simple_output=simple_output
+                        output,
+                        textfsm_files,
+                        simple_output=simple_output,
+                        columnar=columnar,
                     )
                     for output in outputs
                 ]
             else:
                 outputs = [
-                    cls.parse_with_textfsm(output, file, simple_output=simple_output)
+                    cls.parse_with_textfsm(
+                        output, file, simple_output=simple_output, columnar=columnar
+                    )
                     for output, file in zip(outputs, textfsm_files)
                 ]
 
@@ -1872,65 +3995,157 @@ class Parent_Test:
     def clear_syslog(cls):
         cls.run_cmds("clear logging")
 
+    @classmethod
+    def get_syslog_index(cls, router: str = None) -> SyslogIndex:
+        router = cls.script_args["current_alias"] if router is None else router
+        with Parent_Test.shared_state_lock:
+            if router not in Parent_Test.syslog_indexes:
+                Parent_Test.syslog_indexes[router] = SyslogIndex()
+            return Parent_Test.syslog_indexes[router]
+
+    @classmethod
+    def fetch_syslog(cls) -> SyslogIndex:
+        """
+        Adds the current router's syslog lines logged since the last fetch to its local index (see SyslogIndex), and returns the index.
+        """
+        syslog_index = cls.get_syslog_index()
+        new_entries = syslog_index.add(
+            cls.run_cmds(syslog_index.fetch_cmd(), log_output=False)
+        )
+        print_(f"Indexed {new_entries} new syslog entries")
+        return syslog_index
+
+    @classmethod
+    def search_syslog(
+        cls,
+        include: Union[str, List[str]] = [],
+        exclude: Union[str, List[str]] = [],
+        since: int = 0,
+    ) -> List[str]:
+        """
+        Fetches new syslog lines from the current router, then searches its local index (see SyslogIndex.search()).
+        """
+        return cls.fetch_syslog().search(include, exclude, since)
+
     @classmethod
     def identify_ixia_traffic(cls, base_url=""):
         base_url = base_url if base_url else cls.test_data["tgn_api"]
-        sste_tgn.ixia_get_traffic_items(cls.script_args, cls.test_data["tgn_api"])
+        with tgn_lock:
+            sste_tgn.ixia_get_traffic_items(cls.script_args, cls.test_data["tgn_api"])
 
         cls.log(f"identified traffic: {cls.script_args['ixia_streamlist']}")
         return True
 
+    @classmethod
+    def get_ixia_traffic_state(cls) -> IxiaTrafficState:
+        if Parent_Test.ixia_traffic_state is None:
+            Parent_Test.ixia_traffic_state = IxiaTrafficState()
+        return Parent_Test.ixia_traffic_state
+
+    @classmethod
+    def update_ixia_traffic_state(
+        cls, enable: list = [], disable: list = [], max_apply_attempts: int = 1
+    ) -> dict:
+        """
+        Enables/disables only the traffic items whose cached state differs, then applies once (see IxiaTrafficState.update()).
+        Skips the apply if nothing changed.
+        """
+        traffic_state = cls.get_ixia_traffic_state()
+        with tgn_lock:
+            result = traffic_state.update(
+                cls.script_args,
+                cls.test_data["tgn_api"],
+                enable=enable,
+                disable=disable,
+                max_apply_attempts=max_apply_attempts,
+                wait=cls.wait,
+            )
+
+        if result["applied"] is None:
+            print_("No change to traffic items. Skipped applying traffic items.")
+        elif result["applied"]:
+            print_("Applied traffic items")
+        else:
+            print_("Cannot apply traffic. There may be no change to apply. Proceeding.")
+
+        if cls.timing is not None:
+            cls.timing["Ixia traffic item applies"] = (
+                f"{traffic_state.applies} applied, {traffic_state.failed_applies} failed, {traffic_state.skipped_applies} skipped"
+            )
+        return result
+
     @classmethod
     def disable_all_ixia_traffic(cls):
         if "ixia_streamlist" not in cls.script_args:
             cls.script_args["ixia_streamlist"] = {}
 
-        ixia_url = cls.test_data["tgn_api"]
-        streams = cls.script_args["ixia_streamlist"]
+        streams = list(cls.script_args["ixia_streamlist"])
+        result = cls.update_ixia_traffic_state(disable=streams)
 
-        disabled_all = True
-        for stream in streams:
-            stream_disabled = sste_tgn.ixia_disable_traffic_item(
-                cls.script_args, ixia_url, stream
-            )
-            if stream_disabled:
-                cls.log("Disabled traffic item: " + stream)
-            else:
-                cls.log("Failed to disable traffic item: " + stream, "warning")
-                disabled_all = False
-
-        sste_tgn.ixia_apply_traffic_items(cls.script_args, ixia_url)
+        for stream in result["disabled"]:
+            cls.log("Disabled traffic item: " + stream)
+        for stream in result["failed"]:
+            cls.log("Failed to disable traffic item: " + stream, "warning")
 
-        if disabled_all:
+        if not result["failed"]:
             cls.log("Disabled all traffic items")
             return True
         else:
             return cls.failed("Failed to disable all traffic items")
 
+    @classmethod
+    def get_tgn_session(cls) -> TgnSession:
+        if Parent_Test.tgn_session is None:
+            Parent_Test.tgn_session = TgnSession(
+                max_idle=(
+                    cls.test_data["tgn_session_max_idle"]
+                    if "tgn_session_max_idle" in cls.test_data.keys()
+                    else None
+                )
+            )
+        return Parent_Test.tgn_session
+
+    @classmethod
+    def run_on_tgn(cls, operation, *args, **kwargs):
+        """
+        Runs a sste_tgn operation on the shared TGN session, connecting only if the session is not valid (see TgnSession).
+        Connection reuse is reported in the timing report.
+
+        operation: function
+            sste_tgn function that takes (script_args, test_data["tgn"], ...), e.g. sste_tgn.tgn_start_traffic.
+        """
+        tgn_session = cls.get_tgn_session()
+        result = tgn_session.run(
+            cls.script_args,
+            cls.testbed,
+            cls.test_data,
+            operation,
+            cls.script_args,
+            cls.test_data["tgn"],
+            *args,
+            **kwargs,
+        )
+
+        if cls.timing is not None:
+            cls.timing["TGN sessions"] = tgn_session.summary()
+        return result
+
     @classmethod
     def start_ixia_traffic(
         cls, traffic_num: int, enable_first: bool = True, max_apply_attempts: int = 3
     ):
-        testcase_data = cls.test_data["testcase_data"][cls.testcase]
-        streams = testcase_data["traffic"][f"group{traffic_num}"]
-        if isinstance(streams, str):
-            streams = [streams]
+        streams = cls.get_traffic_streams(traffic_num)
 
         if streams:
-            sste_tgn.tgn_connect(
-                cls.script_args, cls.testbed, cls.test_data["tgn"], cls.test_data
-            )
-            cls.log("Connected to tgn")
-
             enabled_streams = not enable_first or cls.enable_ixia_traffic(
                 traffic_num=traffic_num, max_apply_attempts=max_apply_attempts
             )
 
             # if enabled_streams:
-            traffic_started = sste_tgn.tgn_start_traffic(
-                cls.script_args, cls.test_data["tgn"], streams
-            )
+            traffic_started = cls.run_on_tgn(sste_tgn.tgn_start_traffic, streams)
+            cls.get_ixia_traffic_state().forget(streams)
 
+            Parent_Test.ixia_state_changed_at = time()
             if traffic_started:
                 cls.log(f"Started traffic streams {', '.join(streams)}")
                 return True
@@ -1942,18 +4157,12 @@ class Parent_Test:
         if traffic_num is None:
             streams = None
         else:
-            testcase_data = cls.test_data["testcase_data"][cls.testcase]
-            streams = testcase_data["traffic"][f"group{traffic_num}"]
+            streams = cls.get_traffic_streams(traffic_num)
 
         if streams is None or streams:
-            sste_tgn.tgn_connect(
-                cls.script_args, cls.testbed, cls.test_data["tgn"], cls.test_data
-            )
-            cls.log("Connected to tgn")
-
-            traffic_stopped = sste_tgn.tgn_stop_traffic(
-                cls.script_args, cls.test_data["tgn"], streams
-            )
+            traffic_stopped = cls.run_on_tgn(sste_tgn.tgn_stop_traffic, streams)
+            cls.get_ixia_traffic_state().forget(streams)
+            Parent_Test.ixia_state_changed_at = time()
 
             if traffic_stopped:
                 if streams:
@@ -1968,78 +4177,138 @@ class Parent_Test:
     def enable_ixia_traffic(cls, traffic_num: int, max_apply_attempts: int = 3):
         """
         Through REST API, enables the specified traffic items on IXIA VM, then apply it.
+        Traffic items that are already enabled are not sent again, and nothing is applied if no traffic item changed.
         """
-        testcase_data = cls.test_data["testcase_data"][cls.testcase]
-        streams = testcase_data["traffic"][f"group{traffic_num}"]
-        if isinstance(streams, str):
-            streams = [streams]
+        streams = cls.get_traffic_streams(traffic_num) or []
 
-        for stream in streams:
-            if sste_tgn.ixia_enable_traffic_item(
-                cls.script_args, cls.test_data["tgn_api"], stream
-            ):
-                cls.log("Traffic item: " + stream + " is enabled.")
-            else:
-                return cls.failed("Cannot enable traffic item: " + stream)
-
-        traffic_applied = False
-        for i in range(max_apply_attempts):
-            traffic_applied = sste_tgn.ixia_apply_traffic_items(
-                cls.script_args, cls.test_data["tgn_api"]
+        result = cls.update_ixia_traffic_state(
+            enable=streams, max_apply_attempts=max_apply_attempts
+        )
+        if result["failed"]:
+            return cls.failed(
+                "Cannot enable traffic item: " + ", ".join(result["failed"])
             )
-            if traffic_applied:
-                break
-            else:
-                print(
-                    f"Attempt to apply traffic items failed {i+1} time{'s' if i else ''}"
-                )
-                cls.wait(5)
-        if traffic_applied:
-            print_("Applied traffic items")
-        else:
-            print_("Cannot apply traffic. There may be no change to apply. Proceeding.")
+
+        for stream in result["enabled"]:
+            cls.log("Traffic item: " + stream + " is enabled.")
 
         cls.log(f"Enabled traffic streams {', '.join(streams)}")
         return True
 
     @classmethod
     def disable_ixia_traffic(cls, traffic_num: int = None):
+        """
+        Disables the traffic items of a traffic group, or all traffic items if traffic_num is None, then apply it.
+        Traffic items that are already disabled are not sent again, and nothing is applied if no traffic item changed.
+        If traffic_num is None, sste disables every traffic item, and the cached states are forgotten.
+        """
         if traffic_num is None:
-            streams = [None]
-        else:
-            testcase_data = cls.test_data["testcase_data"][cls.testcase]
-            streams = testcase_data["traffic"][f"group{traffic_num}"]
+            cls.get_ixia_traffic_state().forget()
+            with tgn_lock:
+                disabled = sste_tgn.ixia_disable_traffic_item(
+                    cls.script_args, cls.test_data["tgn_api"], None
+                )
+                sste_tgn.ixia_apply_traffic_items(
+                    cls.script_args, cls.test_data["tgn_api"]
+                )
+            if not disabled:
+                return cls.failed("Failed to disable all traffic items")
+            cls.log("Disabled all traffic streams")
+            return True
 
-        for stream in streams:
-            if sste_tgn.ixia_disable_traffic_item(
-                cls.script_args, cls.test_data["tgn_api"], stream
-            ):
-                cls.log("Traffic item: " + stream + " is disabled.")
-            else:
-                return cls.failed("Failed to disable traffic item: " + stream)
+        streams = cls.get_traffic_streams(traffic_num) or []
+
+        result = cls.update_ixia_traffic_state(disable=streams)
+        if result["failed"]:
+            return cls.failed(
+                "Failed to disable traffic item: " + ", ".join(result["failed"])
+            )
+
+        for stream in result["disabled"]:
+            cls.log("Traffic item: " + stream + " is disabled.")
 
-        sste_tgn.ixia_apply_traffic_items(cls.script_args, cls.test_data["tgn_api"])
         cls.log(f"Disabled traffic streams {', '.join(streams)}")
         return True
 
+    @classmethod
+    def uses_disruptive_ixia_stats(cls) -> bool:
+        """
+        Returns test_data["ixia_disruptive_stats"], or True if it is undefined.
+        """
+        return (
+            bool(cls.test_data["ixia_disruptive_stats"])
+            if "ixia_disruptive_stats" in cls.test_data.keys()
+            else True
+        )
+
+    @classmethod
+    def snapshot_ixia_counters(cls) -> tuple:
+        """
+        Returns (timestamp, {stream: {field: number}}) with the current counters of every stream.
+        Pass it as the baseline of get_ixia_stats_with_unknown_traffic_items() to get stats over everything since then.
+        """
+        timestamp = time()
+        with tgn_lock:
+            ixia_stats = sste_tgn.tgn_get_stats_flexible(
+                cls.script_args, cls.test_data["tgn"], print_output=False
+            )
+        return timestamp, {
+            stream: {field: to_number(value) for field, value in stats.items()}
+            for stream, stats in ixia_stats.items()
+        }
+
     @classmethod
     def get_ixia_stats_with_unknown_traffic_items(
-        cls, interested_fields: Union[str, list] = "Loss %"
+        cls,
+        interested_fields: Union[str, list] = "Loss %",
+        disruptive: bool = None,
+        baseline: tuple = None,
     ):
         """
-        Identifies all running traffic, pauses them temporarily to acquire their stats, then restarts them.
+        Identifies all running traffic and acquires their stats.
         If no running traffic is present, acquire all existing stats.
+
+        disruptive: bool (default: None)
+            If True, pause the running traffic temporarily to acquire their final stats, then re-enable, re-apply, and restart them.
+            If False, leave the traffic running and compute its stats from the change between two samples (see _get_ixia_stats_non_disruptively()).
+            If None, use uses_disruptive_ixia_stats().
+
+        baseline: tuple (default: None)
+            Counters from snapshot_ixia_counters(). If given, non-disruptive stats cover everything since the baseline,
+            instead of only the last two samples.
         """
         if interested_fields is not None and isinstance(interested_fields, str):
             interested_fields = [interested_fields]
 
-        baseline_ixia_stats = sste_tgn.tgn_get_stats_flexible(
-            cls.script_args, cls.test_data["tgn"], print_output=False
-        )
+        if disruptive is None:
+            disruptive = cls.uses_disruptive_ixia_stats()
+
+        start_time = time()
+        if disruptive:
+            ixia_stats = cls._get_ixia_stats_disruptively(interested_fields)
+        else:
+            ixia_stats = cls._get_ixia_stats_non_disruptively(
+                interested_fields, baseline
+            )
+        cls._record_ixia_stats_overhead(disruptive, time() - start_time)
+
+        return ixia_stats
+
+    @classmethod
+    def _get_ixia_stats_disruptively(cls, interested_fields: list = None):
+        """
+        Identifies all running traffic, pauses them temporarily to acquire their stats, then restarts them.
+        If no running traffic is present, acquire all existing stats.
+        """
+        with tgn_lock:
+            baseline_ixia_stats = sste_tgn.tgn_get_stats_flexible(
+                cls.script_args, cls.test_data["tgn"], print_output=False
+            )
         sleep(1)  # TODO determine if 1 sec is enough
-        new_ixia_stats = sste_tgn.tgn_get_stats_flexible(
-            cls.script_args, cls.test_data["tgn"], print_output=False
-        )
+        with tgn_lock:
+            new_ixia_stats = sste_tgn.tgn_get_stats_flexible(
+                cls.script_args, cls.test_data["tgn"], print_output=False
+            )
 
         running_traffic_names = [
             traffic_name
@@ -2054,36 +4323,155 @@ class Parent_Test:
         ]
 
         if running_traffic_names:
-            sste_tgn.tgn_connect(
-                cls.script_args, cls.testbed, cls.test_data["tgn"], cls.test_data
-            )
-            sste_tgn.tgn_stop_traffic(
-                cls.script_args, cls.test_data["tgn"], running_traffic_names
-            )
+            cls.run_on_tgn(sste_tgn.tgn_stop_traffic, running_traffic_names)
+            Parent_Test.ixia_state_changed_at = time()
             sleep(1)  # TODO determine if 1 sec is enough
 
-        ixia_stats = sste_tgn.tgn_get_stats_flexible(
-            cls.script_args,
-            cls.test_data["tgn"],
-            streams=running_traffic_names,
-            interested_fields=interested_fields,
-            print_output=False,
-        )
+        with tgn_lock:
+            ixia_stats = sste_tgn.tgn_get_stats_flexible(
+                cls.script_args,
+                cls.test_data["tgn"],
+                streams=running_traffic_names,
+                interested_fields=interested_fields,
+                print_output=False,
+            )
 
         if running_traffic_names:
-            sste_tgn.ixia_enable_traffic_item(
-                cls.script_args, cls.test_data["tgn_api"], running_traffic_names
+            cls.get_ixia_traffic_state().forget(running_traffic_names)
+            cls.update_ixia_traffic_state(enable=running_traffic_names)
+            cls.run_on_tgn(sste_tgn.tgn_start_traffic, running_traffic_names)
+            Parent_Test.ixia_state_changed_at = time()
+
+        return ixia_stats
+
+    @classmethod
+    def _get_ixia_stats_non_disruptively(
+        cls, interested_fields: list = None, baseline: tuple = None
+    ):
+        """
+        Identifies all running traffic and computes their stats from two samples without stopping them.
+        The samples are the baseline (see snapshot_ixia_counters()) and the current counters if a baseline is given.
+        Otherwise, they are the sampler's last two (see start_ixia_sampler()), or two ixia queries 1 second apart if the sampler has not sampled twice since traffic was last started/stopped.
+        A stream is running if its Tx Frames increased between the samples. Counters that went down, e.g. because they were cleared, count from 0. Its stats are:
+            "Tx Frames"/"Rx Frames": the counters of the second sample
+            "Tx Frame Rate"/"Rx Frame Rate": the frames sent/received per second between the samples
+            "Loss %": the percentage of frames sent between the samples that were not received
+        Frames still in flight count as lost, so a Loss % at or below test_data["ixia_in_flight_loss_tolerance"] (default: 0.1) is reported as 0.
+        If no running traffic is present, acquire all existing stats.
+        """
+        tolerance = (
+            float(cls.test_data["ixia_in_flight_loss_tolerance"])
+            if "ixia_in_flight_loss_tolerance" in cls.test_data.keys()
+            else 0.1
+        )
+
+        sampler_is_running = (
+            cls.ixia_sampler is not None and cls.ixia_sampler.is_alive()
+        )
+        samples = (
+            {
+                stream: cls.ixia_sampler.samples(stream, cls.ixia_state_changed_at)[-2:]
+                for stream in list(cls.ixia_sampler.buffers.keys())
+            }
+            if sampler_is_running and baseline is None
+            else {}
+        )
+
+        if not samples or any(len(pair) < 2 for pair in samples.values()):
+            if baseline is None:
+                baseline = cls.snapshot_ixia_counters()
+                sleep(1)
+            baseline_time, baseline_ixia_stats = baseline
+            new_time, new_ixia_stats = cls.snapshot_ixia_counters()
+            samples = {
+                stream: [
+                    (baseline_time, baseline_ixia_stats.get(stream, {})),
+                    (new_time, new_ixia_stats[stream]),
+                ]
+                for stream in new_ixia_stats.keys()
+            }
+
+        ixia_stats = {}
+        for stream, ((baseline_time, baseline), (new_time, new)) in samples.items():
+            if new.get("Tx Frames", 0.0) < baseline.get("Tx Frames", 0.0):
+                baseline = {}
+            tx_frames = new.get("Tx Frames", 0.0) - baseline.get("Tx Frames", 0.0)
+            rx_frames = new.get("Rx Frames", 0.0) - baseline.get("Rx Frames", 0.0)
+            if tx_frames <= 0:
+                continue
+
+            seconds = max(new_time - baseline_time, 0.001)
+            loss = max(0.0, (tx_frames - rx_frames) / tx_frames * 100)
+            ixia_stats[stream] = {
+                "Tx Frames": new.get("Tx Frames", 0.0),
+                "Rx Frames": new.get("Rx Frames", 0.0),
+                "Tx Frame Rate": tx_frames / seconds,
+                "Rx Frame Rate": rx_frames / seconds,
+                "Loss %": loss if loss > tolerance else 0.0,
+            }
+
+        if not ixia_stats:
+            ixia_stats = {stream: pair[-1][1] for stream, pair in samples.items()}
+
+        if interested_fields is not None:
+            ixia_stats = {
+                stream: {
+                    field: stats[field] for field in interested_fields if field in stats
+                }
+                for stream, stats in ixia_stats.items()
+            }
+
+        return ixia_stats
+
+    @classmethod
+    def _record_ixia_stats_overhead(cls, disruptive: bool, seconds: float):
+        """
+        Tracks the time spent by get_ixia_stats_with_unknown_traffic_items() in each mode, and the time saved by not stopping traffic.
+        The time saved is estimated from the average duration of the disruptive reads made so far.
+        """
+        if "ixia_stats_overhead" not in cls.script_args:
+            cls.script_args["ixia_stats_overhead"] = {
+                "disruptive": [0, 0.0],
+                "non_disruptive": [0, 0.0],
+            }
+        overhead = cls.script_args["ixia_stats_overhead"]
+        mode = "disruptive" if disruptive else "non_disruptive"
+        overhead[mode][0] += 1
+        overhead[mode][1] += seconds
+
+        disruptive_reads, disruptive_seconds = overhead["disruptive"]
+        non_disruptive_reads, non_disruptive_seconds = overhead["non_disruptive"]
+        if cls.timing is not None:
+            cls.timing["Ixia stats: disruptive reads"] = (
+                f"{disruptive_reads} in {time_to_string(disruptive_seconds)}"
             )
-            sste_tgn.ixia_apply_traffic_items(cls.script_args, cls.test_data["tgn_api"])
-            sste_tgn.tgn_start_traffic(
-                cls.script_args, cls.test_data["tgn"], running_traffic_names
+            cls.timing["Ixia stats: non-disruptive reads"] = (
+                f"{non_disruptive_reads} in {time_to_string(non_disruptive_seconds)}"
             )
 
-        return ixia_stats
+        if disruptive_reads and non_disruptive_reads:
+            average_disruptive_seconds = disruptive_seconds / disruptive_reads
+            cls.record_timing(
+                "Ixia stats: estimated time saved by non-disruptive reads",
+                max(
+                    0.0,
+                    non_disruptive_reads * average_disruptive_seconds
+                    - non_disruptive_seconds,
+                ),
+            )
 
     @classmethod
-    def sanity_traffic_check(cls, ixia_goal: str = "show"):
-        ixia_stats = cls.get_ixia_stats_with_unknown_traffic_items()
+    def sanity_traffic_check(
+        cls, ixia_goal: str = "show", disruptive: bool = None, baseline: tuple = None
+    ):
+        """
+        Shows the stats of all running traffic, and checks their Loss % if ixia_goal is "lossless" or "lossy".
+        disruptive and baseline are passed to get_ixia_stats_with_unknown_traffic_items().
+        start_step() takes the baseline when the step starts, so non-disruptive checks cover the whole step.
+        """
+        ixia_stats = cls.get_ixia_stats_with_unknown_traffic_items(
+            disruptive=disruptive, baseline=baseline
+        )
         print_(ixia_stats)
 
         if ixia_goal == "show":
@@ -2113,8 +4501,7 @@ class Parent_Test:
         """
         if isinstance(traffic, int):
             try:
-                testcase_data = cls.test_data["testcase_data"][cls.testcase]
-                traffic = testcase_data["traffic"][f"group{traffic}"]
+                traffic = cls.get_traffic_streams(traffic)
             except KeyError as e:
                 cls.log(
                     f"Cannot acquire traffic items in group {traffic}. Acquiring all traffic stats instead.",
@@ -2127,9 +4514,10 @@ class Parent_Test:
         if interested_fields is not None and isinstance(interested_fields, str):
             interested_fields = [interested_fields]
 
-        all_ixia_stats = sste_tgn.tgn_get_stats_flexible(
-            cls.script_args, cls.test_data["tgn"], traffic, interested_fields
-        )
+        with tgn_lock:
+            all_ixia_stats = sste_tgn.tgn_get_stats_flexible(
+                cls.script_args, cls.test_data["tgn"], traffic, interested_fields
+            )
 
         # cls.log(f"Acquired IXIA statistics: {all_ixia_stats}")
         return all_ixia_stats
@@ -2161,14 +4549,20 @@ class Parent_Test:
 
     @classmethod
     def clear_ixia_stats(cls, traffic_num: int):
-        testcase_data = cls.test_data["testcase_data"][cls.testcase]
-        streams = testcase_data["traffic"][f"group{traffic_num}"]
+        streams = cls.get_traffic_streams(traffic_num)
 
-        sste_tgn.tgn_clear_stats(cls.script_args, cls.test_data["tgn"], streams)
-        cls.log(f"Cleared IXIA stats for traffic streams {', '.join(streams)}")
+        with tgn_lock:
+            sste_tgn.tgn_clear_stats(cls.script_args, cls.test_data["tgn"], streams)
+        if streams is None:
+            cls.log("Cleared IXIA stats for all traffic streams")
+        else:
+            cls.log(f"Cleared IXIA stats for traffic streams {', '.join(streams)}")
 
     @classmethod
     def ensure_ixia_is_running(cls, traffic_num: int = None):
+        if cls.ixia_sampler is not None and cls.ixia_sampler.is_alive():
+            return cls._ensure_sampled_ixia_is_running(traffic_num)
+
         cls.stop_ixia_traffic(traffic_num)
 
         cls.wait(10)
@@ -2178,9 +4572,10 @@ class Parent_Test:
         )
 
         try:
-            testcase_data = cls.test_data["testcase_data"][cls.testcase]
-            streams = testcase_data["traffic"][f"group{traffic_num}"]
+            streams = cls.get_traffic_streams(traffic_num)
         except KeyError as e:
+            streams = None
+        if streams is None:
             streams = list(ixia_stats.keys())
 
         traffic_missing = [
@@ -2207,6 +4602,59 @@ class Parent_Test:
 
         cls.start_ixia_traffic(traffic_num)
 
+    @classmethod
+    def _ensure_sampled_ixia_is_running(
+        cls, traffic_num: int = None, window: float = None
+    ):
+        """
+        ensure_ixia_is_running() without stopping traffic: Tx/Rx frames must increase across the samples taken in the last <window> seconds.
+        window defaults to 3 sampling intervals.
+        """
+        if window is None:
+            window = 3 * cls.ixia_sampler.interval
+        since = max(time() - window, cls.ixia_state_changed_at)
+
+        try:
+            streams = cls.get_traffic_streams(traffic_num)
+        except KeyError as e:
+            streams = None
+        if streams is None:
+            streams = list(cls.ixia_sampler.buffers.keys())
+
+        samples = {
+            stream: cls.ixia_sampler.samples(stream, since) for stream in streams
+        }
+
+        traffic_missing = [stream for stream in streams if len(samples[stream]) < 2]
+        if traffic_missing:
+            return cls.passx(
+                f"Not enough traffic stats samples for {', '.join(traffic_missing)}"
+            )
+
+        def increasing(stream, column):
+            return samples[stream][-1][1][column] > samples[stream][0][1][column]
+
+        tx_not_increasing = [
+            stream for stream in streams if not increasing(stream, "Tx Frames")
+        ]
+        if tx_not_increasing:
+            return cls.skipped(
+                f"Traffic items not sending traffic: {', '.join(tx_not_increasing)}"
+            )
+
+        rx_not_increasing = [
+            stream for stream in streams if not increasing(stream, "Rx Frames")
+        ]
+        if rx_not_increasing:
+            return cls.passx(
+                f"Traffic items not receiving traffic: {', '.join(rx_not_increasing)}"
+            )
+
+        cls.log(
+            f"Traffic items are sending and receiving traffic: {', '.join(streams)}"
+        )
+        return True
+
     @classmethod
     def send_webex_summary(cls, testcase):
         if not cls.test_data["webex_notification"] == "none":
@@ -2217,6 +4665,18 @@ class Parent_Test:
 
     @classmethod
     def disconnect(cls):
+        cls.stop_ixia_sampler()
+        cls.save_span_trace()
+        if Parent_Test.cli_archive is not None:
+            Parent_Test.cli_archive[1].close()
+            cls.log(Parent_Test.cli_archive[1].summary())
+            Parent_Test.cli_archive = None
+        if Parent_Test.tgn_session is not None:
+            Parent_Test.tgn_session.invalidate()
+        if Parent_Test.sste_backend is not None:
+            Parent_Test.sste_backend.close()
+            cls.log(f"sste backend {Parent_Test.sste_backend.summary()}")
+            Parent_Test.sste_backend = None
         if cls.testbed.devices:
             for host, connection in cls.testbed.devices.items():
                 if connection:
@@ -2225,6 +4685,8 @@ class Parent_Test:
 
     @classmethod
     def display_timing_report(cls):
+        from texttable import Texttable
+
         table = Texttable()
         if "timing" in cls.script_args and cls.script_args["timing"]:
             cls.timing.update(cls.script_args["timing"])
@@ -2234,8 +4696,19 @@ class Parent_Test:
                 table.add_rows([["Trigger", "time"], [config, val]])
             cls.log(table.draw())
 
+    @classmethod
+    def record_timing(cls, label: str, seconds: float) -> str:
+        """
+        Adds an entry to the timing report and returns the time spent as a string.
+        """
+        time_spent = time_to_string(seconds)
+        if cls.timing is not None:
+            cls.timing[label] = time_spent
+        return time_spent
+
     @classmethod
     def upload_log(cls):
+        cls.flush_logs()
         sste_common.upload_log(cls.script_args, cls.testbed, cls.test_data)
 
     @classmethod
@@ -2286,85 +4759,193 @@ class Parent_Test:
                         cls.script_args["sste_debug_errors_list"]
                     )
                     existing_sste_debug_errors_list[key] = value
-                    cls.script_args[
-                        "sste_debug_errors_list"
-                    ] = existing_sste_debug_errors_list
+                    cls.script_args["sste_debug_errors_list"] = (
+                        existing_sste_debug_errors_list
+                    )
             else:
-                cls.script_args[
-                    "sste_debug_errors_list"
-                ] = additional_inclusion_criteria
+                cls.script_args["sste_debug_errors_list"] = (
+                    additional_inclusion_criteria
+                )
+
+        router = cls.script_args["current_alias"]
+        script_args = cls.script_args
+        if router in Parent_Test.traceback_checked_at:
+            # the logs before the previous check on this router are already scanned.
+            # log_start_time belongs to sste and apply_configs_(), so only a copy of script_args is changed
+            checked_at = Parent_Test.traceback_checked_at[router]
+            try:
+                scan_from = (
+                    max(script_args["log_start_time"], checked_at)
+                    if "log_start_time" in script_args
+                    else checked_at
+                )
+            except TypeError as e:
+                scan_from = checked_at
+            script_args = copy.copy(cls.script_args)
+            script_args["log_start_time"] = scan_from
 
-        exit_run = sste_common.xr_check_trace_dump([], {}, cls.script_args, cls.testbed)
+        clock = cls.run_cmds("show clock", log_output=False)
+        exit_run = sste_common.xr_check_trace_dump([], {}, script_args, cls.testbed)
+        Parent_Test.traceback_checked_at[router] = sste_common.parse_clock(clock)
         if exit_run:
             return cls.failed("Error detected during traceback dump")
         else:
             cls.log("No error detected during traceback dump")
 
     @classmethod
-    def rollback_testcase(cls, sequentially: bool = True):
-        all_commits = cls.run_cmds(
-            'show logging | inc "Configuration committed" | exc config_rollback',
-            "show_logging_include_configuration_commit.textfsm",
+    def _rollback_failed(cls, output) -> bool:
+        return any(
+            fail_text in output
+            for fail_text in [
+                "Rollback operation failed",
+                "failed verification",
+                "has not been modified",
+            ]
         )
-        if all_commits and "Commit_id" in all_commits.keys():
-            all_commits = all_commits["Commit_id"]
-            if sequentially:
-                for commit_id in reversed(all_commits):
-                    module_args = {
-                        "sste_commands": [f"rollback configuration {commit_id}"]
-                    }
-                    output = sste_common.exec_commands(module_args, cls.script_args)
-
-                    if any(
-                        fail_text in output
-                        for fail_text in [
-                            "Rollback operation failed",
-                            "failed verification",
-                            "has not been modified",
-                        ]
-                    ):
-                        # if "Please use the command 'show configuration failed rollback [inheritance]' to view the errors" in output:
-                        #    module_args = {
-                        #        "sste_commands": [f"show configuration failed rollback inheritance"]
-                        #    }
-                        #    sste_common.exec_commands(module_args, cls.script_args)
-                        return cls.failed(
-                            f"Unable to rollback configuration {commit_id}."
-                        )
-                cls.log(
-                    "Config has been rolled back to the beginning of this testcase."
+
+    @classmethod
+    def get_commit_history(cls) -> dict:
+        """
+        Indexes the router's commit history using "show configuration commit list detail".
+        The detailed list is used because it shows both the commit ID and the label of each commit.
+
+        Output
+        ------
+        {
+            "commits": [commit IDs, newest first],
+            "position": {commit ID or label: number of commits made since, including itself},
+        }
+        """
+        output = cls.run_cmds("show configuration commit list detail", log_output=False)
+
+        commit_parser = re.compile(
+            r"^\s*(?P<sno>\d+)\)\s+CommitId:\s+(?P<commit_id>\S+)\s+Label:\s+(?P<label>\S+)",
+            re.MULTILINE,
+        )
+        commits = [match.groupdict() for match in commit_parser.finditer(output)]
+        commits.sort(key=lambda commit: int(commit["sno"]))
+
+        position = {}
+        for commit in commits:
+            position[commit["commit_id"]] = int(commit["sno"])
+            if commit["label"] != "NONE":
+                position[commit["label"]] = int(commit["sno"])
+
+        return {
+            "commits": [commit["commit_id"] for commit in commits],
+            "position": position,
+        }
+
+    @classmethod
+    def plan_rollback(cls, commit_ids: list) -> dict:
+        """
+        Finds the commit the router needs to return to in order to undo commit_ids, and the cheapest safe way to get there.
+        A single rollback is only planned if every commit in commit_ids is found in the commit history.
+        Otherwise, a sequential walk (one rollback per commit, newest first) is planned.
+
+        Output
+        ------
+        {
+            "strategy": "single" or "sequential",
+            "cmd": the single rollback command (None if sequential),
+            "reason": an explanation of the plan,
+        }
+        """
+        history = cls.get_commit_history()
+        commits, position = history["commits"], history["position"]
+
+        missing_commits = [
+            commit_id for commit_id in commit_ids if commit_id not in position.keys()
+        ]
+        if missing_commits:
+            return {
+                "strategy": "sequential",
+                "cmd": None,
+                "reason": f"commit history does not list {', '.join(missing_commits)}",
+            }
+
+        rollbacks_needed = max(position[commit_id] for commit_id in commit_ids)
+        other_commits = rollbacks_needed - len(unique(commit_ids))
+        reason = f"{rollbacks_needed} commits to undo"
+        if other_commits > 0:
+            reason += f", including {other_commits} made outside of the testcase's syslog entries (e.g. rollbacks)"
+
+        target_in_history = rollbacks_needed < len(commits)
+        if target_in_history:
+            target_commit_id = commits[rollbacks_needed]
+            cmd = f"rollback configuration to {target_commit_id}"
+            reason += f"; target is {target_commit_id}"
+        else:
+            cmd = f"rollback configuration last {rollbacks_needed}"
+
+        return {"strategy": "single", "cmd": cmd, "reason": reason}
+
+    @classmethod
+    def rollback_testcase(cls, sequentially: bool = None):
+        """
+        Rolls the config back to what it was before the first commit of this testcase.
+        The testcase's commits are read from the syslog.
+
+        sequentially: bool (default: None)
+            None: let plan_rollback() pick the strategy. If a single rollback fails, fall back to rolling back one commit at a time.
+            True: roll back one commit at a time, newest first.
+            False: only attempt the single rollback planned by plan_rollback().
+
+        The time spent is logged and added to the timing report.
+        """
+        start_time = time()
+        all_commits = cls.parse_with_textfsm(
+            "\n".join(
+                cls.search_syslog(
+                    include="Configuration committed", exclude="config_rollback"
                 )
+            ),
+            "show_logging_include_configuration_commit.textfsm",
+        )
+        if not all_commits or "Commit_id" not in all_commits.keys():
+            cls.log("No config is applied during the testcase. No config to roll back.")
+            return True
 
-            else:
-                earliest_commit_id = all_commits[0]
-                module_args = {
-                    "sste_commands": [f"rollback configuration {earliest_commit_id}"]
-                }
-                output = sste_common.exec_commands(module_args, cls.script_args)
-
-                if any(
-                    fail_text in output
-                    for fail_text in [
-                        "Rollback operation failed",
-                        "failed verification",
-                        "has not been modified",
-                    ]
-                ):
+        all_commits = all_commits["Commit_id"]
+        if isinstance(all_commits, str):
+            all_commits = [all_commits]
+
+        cls.note_config_change()
+        rolled_back = False
+        if sequentially is not True:
+            plan = cls.plan_rollback(all_commits)
+            cls.log(f"Rollback plan: {plan['strategy']} ({plan['reason']})")
+
+            if plan["strategy"] == "single":
+                output = cls.exec_commands({"sste_commands": [plan["cmd"]]})
+                rolled_back = not cls._rollback_failed(output)
+                if not rolled_back:
+                    cls.log(f"'{plan['cmd']}' failed", "warning")
+
+            if not rolled_back and sequentially is False:
+                cls.record_timing(f"{cls.testcase} rollback", time() - start_time)
+                return cls.failed("Unable to roll back the testcase's configuration.")
+
+        if not rolled_back:
+            cls.log(f"Rolling back {len(all_commits)} commits one at a time")
+            for commit_id in reversed(all_commits):
+                module_args = {"sste_commands": [f"rollback configuration {commit_id}"]}
+                output = cls.exec_commands(module_args)
+
+                if cls._rollback_failed(output):
                     # if "Please use the command 'show configuration failed rollback [inheritance]' to view the errors" in output:
                     #    module_args = {
                     #        "sste_commands": [f"show configuration failed rollback inheritance"]
                     #    }
                     #    sste_common.exec_commands(module_args, cls.script_args)
-                    return cls.failed(
-                        f"Unable to rollback configuration {earliest_commit_id}."
-                    )
-                else:
-                    cls.log(
-                        "Config has been rolled back to the beginning of this testcase."
-                    )
+                    cls.record_timing(f"{cls.testcase} rollback", time() - start_time)
+                    return cls.failed(f"Unable to rollback configuration {commit_id}.")
 
-        else:
-            cls.log("No config is applied during the testcase. No config to roll back.")
+        time_spent = cls.record_timing(f"{cls.testcase} rollback", time() - start_time)
+        cls.log(
+            f"Config has been rolled back to the beginning of this testcase in {time_spent}."
+        )
+        return True
 
     @classmethod
     def _parse_interface(cls, interface: str = "FourHundredGigE0/0/0/0"):
@@ -2880,7 +5461,7 @@ class Parent_Test:
         cmds = [
             f"show tech-support {specification}" for specification in specifications
         ]
-        output = sste_common.exec_commands({"sste_commands": cmds}, cls.script_args)
+        output = cls.exec_commands({"sste_commands": cmds})
         return output
 
     @classmethod
@@ -3011,7 +5592,7 @@ class Parent_Test:
 
             show_ixia_stats = "ixia" in troubleshoot_categories
             if show_ixia_stats:
-                cls.sanity_traffic_check(cls, ixia_goal="show")
+                cls.sanity_traffic_check(ixia_goal="show")
 
             troubleshoot_specifications = (
                 _troubleshoot_specifications(troubleshoot_categories)
@@ -0,0 +1,770 @@
+"""
+Micro and macro benchmarks of the parapyats framework, run against a local device stand-in.
+
+Micro benchmarks time single framework functions (_format, parse_formal_configs, get_local_topology, check_cli_output_for_errors, textfsm parsing, and keep_x_interfaces_unshut's selection) on fixed inputs.
+Macro benchmarks time whole ECMP_Test flows through steps, ssh sessions, and parsing, with device calls served by sste_simulator (or sste_replay).
+Waits are counted instead of slept, so only the framework's own time is measured.
+
+Results are saved as json. Given a baseline (a previous result), each benchmark is compared to it, and the run fails if any benchmark got slower than the tolerance allows.
+
+With --import-budget, only the cost of importing the framework's modules is checked instead: each is imported in fresh interpreters with -X importtime, and the run fails if one takes longer than the budget.
+
+Usage
+-----
+python parapyats_benchmark.py --output after.json --baseline before.json
+python parapyats_benchmark.py --group micro --only format --rounds 10
+python parapyats_benchmark.py --backend replay --archive ecmp_session.json.gz --textfsm-folder <textfsm folder>/
+python parapyats_benchmark.py --import-budget 30
+"""
+
+import argparse, contextlib, copy, json, logging, os, platform, re, statistics, subprocess, sys, tempfile, timeit
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, Dict, List
+
+from texttable import Texttable
+
+from parapyats import Parent_Test, tree
+from ecmp_parapyats import ECMP_Test, RibResolutionCache
+
+# modules whose import time is checked by --import-budget
+IMPORT_MODULES = ["parapyats", "ecmp_parapyats", "cli_archive", "test_data_loader"]
+
+# textfsm templates for the outputs sste_simulator generates
+TEXTFSM_TEMPLATES = {
+    "show_lldp_neighbors.textfsm": r"""Value Key system_name (\S+)
+Value Key local_interface (\S+)
+Value hold_time (\d+)
+Value capability (\S+)
+Value port_id (\S+)
+
+Start
+  ^${system_name}\s+${local_interface}\s+${hold_time}\s+${capability}\s+${port_id}\s*$$ -> Record
+""",
+    "show_bgp_ipv6_unicast_summary_wide.textfsm": r"""Value Key Neighbor (\S+)
+Value Spk (\d+)
+Value AS (\d+)
+Value TblVer (\d+)
+Value InQ (\d+)
+Value OutQ (\d+)
+Value Up_Down (\S+)
+Value St_PfxRcd (\S+)
+
+Start
+  ^${Neighbor}\s+${Spk}\s+${AS}\s+${TblVer}\s+${InQ}\s+${OutQ}\s+${Up_Down}\s+${St_PfxRcd}\s*$$ -> Record
+""",
+    "show_bgp_ipv6_unicast_convergence.textfsm": r"""Value Converged (Converged)
+Value First_unconverged_neighbor (\S+)
+
+Start
+  ^${Converged}\.
+  ^First unconverged neighbor:?\s+${First_unconverged_neighbor}
+""",
+    "show_interfaces_counters_rates_physical.textfsm": r"""Value Key Interface (\S+)
+Value InMbps (\S+)
+Value InKpps (\S+)
+Value OutMbps (\S+)
+Value OutKpps (\S+)
+
+Start
+  ^${Interface}\s+${InMbps}\s+${InKpps}\s+${OutMbps}\s+${OutKpps}\s*$$ -> Record
+""",
+}
+
+# name -> (group, setup function)
+BENCHMARKS: Dict[str, tuple] = {}
+
+
+def benchmark(name: str, group: str):
+    """
+    Registers a benchmark. The setup function receives a BenchmarkContext and returns the function to time.
+    It can raise SkipBenchmark if the benchmark cannot run in this environment.
+    """
+
+    def register(setup: Callable):
+        BENCHMARKS[name] = (group, setup)
+        return setup
+
+    return register
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+class StepResult(Exception):
+    pass
+
+
+class BenchmarkStep:
+    """
+    Stands in for a pyats step. Finishing a step records its result and leaves its "with" block, as pyats does.
+    """
+
+    def __init__(self, steps, name: str):
+        self.steps = steps
+        self.name = name
+        self.result = "passed"
+
+    def _finish(self, result: str, reason: str = ""):
+        self.result = result
+        if result in ("failed", "errored"):
+            self.steps.failures.append(f"{self.name}: {reason}")
+        raise StepResult(reason)
+
+    def passed(self, reason: str = ""):
+        self._finish("passed", reason)
+
+    def passx(self, reason: str = ""):
+        self._finish("passx", reason)
+
+    def failed(self, reason: str = ""):
+        self._finish("failed", reason)
+
+    def errored(self, reason: str = ""):
+        self._finish("errored", reason)
+
+    def skipped(self, reason: str = ""):
+        self._finish("skipped", reason)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.steps.results[self.result] = self.steps.results.get(self.result, 0) + 1
+        return exc_type is StepResult
+
+
+class BenchmarkSteps:
+    """
+    Stands in for pyats steps: start() opens a BenchmarkStep, and the results are counted.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.failures = []  # "step: reason" of the failed steps
+
+    def start(self, name: str, continue_: bool = False) -> BenchmarkStep:
+        return BenchmarkStep(self, name)
+
+
+class BenchmarkTest(ECMP_Test):
+    """
+    ECMP_Test that counts waits instead of sleeping.
+    """
+
+    waited_seconds = 0
+
+    @classmethod
+    def wait(cls, seconds):
+        BenchmarkTest.waited_seconds += seconds
+
+
+class BenchmarkContext:
+    """
+    Holds the stand-in fabric, the test data, and the inputs shared by the benchmarks.
+    """
+
+    def __init__(self, backend, fabric, textfsm_folder: str):
+        self.backend = backend
+        self.fabric = fabric
+        self.textfsm_folder = textfsm_folder
+        self.router = f"{fabric.router_prefix}1" if fabric else "rtsw-1"
+        self.devices = (
+            [
+                f"{fabric.router_prefix}{number}"
+                for number in range(1, fabric.routers + 1)
+            ]
+            if fabric
+            else [self.router]
+        )
+        self.test_data = {
+            "UUT": self.router,
+            "submitter": "benchmark",
+            "textfsm_folder": textfsm_folder,
+            "bgp_as": 65000,
+            "ecmp_rate_sampling": {"samples": 5, "interval": 30},
+        }
+        self.steps = None
+        self.settings = None
+        self.items = None  # number of items a micro benchmark handles per call
+
+    def reset(self, test_data: dict = None):
+        """
+        Starts BenchmarkTest over, as a new pyats job would.
+        """
+        self.steps = BenchmarkSteps()
+        BenchmarkTest.initialize()
+        BenchmarkTest.set_logger("parapyats_benchmark")
+        BenchmarkTest.set_params(
+            script_args=tree(),
+            timing=tree(),
+            test_data=copy.deepcopy(test_data or self.test_data),
+            steps=self.steps,
+        )
+        BenchmarkTest.waited_seconds = 0
+        Parent_Test.ixia_traffic_state = None
+        Parent_Test.tgn_session = None
+        Parent_Test.config_generations = {}
+        Parent_Test.syslog_indexes = {}
+        ECMP_Test.rib_cache = RibResolutionCache()
+        return BenchmarkTest
+
+    def output(self, cmd: str) -> str:
+        """
+        Returns the stand-in's output of cmd on the first router.
+        """
+        self.reset()
+        BenchmarkTest.switch_router(self.router)
+        return BenchmarkTest.run_cmds(cmd, check_for_errors=False)
+
+    def parse(self, cmd: str, textfsm_file: str, **kwargs):
+        output = self.output(cmd)
+        try:
+            return BenchmarkTest.parse_with_textfsm(output, textfsm_file, **kwargs)
+        except AttributeError as e:
+            raise SkipBenchmark(f"cannot parse {cmd}: {e}")
+
+
+def fixture(cls, **functions) -> type:
+    """
+    Returns a subclass of cls whose given functions return fixed outputs, so a benchmark only times the code around them.
+    """
+    return type(
+        f"{cls.__name__}_fixture",
+        (cls,),
+        {
+            name: classmethod(lambda cls, *args, output=output, **kwargs: output)
+            for name, output in functions.items()
+        },
+    )
+
+
+@benchmark("format", "micro")
+def format_lines(context: BenchmarkContext):
+    test_data = dict(context.test_data)
+    test_data.update({f"key_{number}": f"value_{number}" for number in range(2000)})
+    context.reset(test_data)
+    lines = [
+        (
+            f"router bgp {{bgp_as}} neighbor fc00::{number:x} description {{key_{number}}}"
+            if number % 2
+            else f"interface FourHundredGigE0/0/0/{number} mtu 9216"
+        )
+        for number in range(1000)
+    ]
+    context.items = len(lines)
+    return lambda: [BenchmarkTest._format(line) for line in lines]
+
+
+@benchmark("parse_formal_configs", "micro")
+def parse_formal_configs(context: BenchmarkContext):
+    lines = ["Building configuration...", "!! IOS XR Configuration 7.11.1", "!"]
+    for number in range(5000):
+        lines += [
+            f"interface FourHundredGigE0/{number % 8}/0/{number // 8}",
+            f" description to rtsw-{number % 32 + 1}",
+            " mtu 9216",
+            f" ipv6 address fc00::{number:x}/127",
+            "!",
+        ]
+    lines.append("RP/0/RP0/CPU0:rtsw-1#")
+    output = "\n".join(lines)
+    context.items = 5000
+    return lambda: BenchmarkTest.parse_formal_configs(output)
+
+
+def _local_topology(context: BenchmarkContext, sort: str):
+    neighbors = context.parse("show lldp neighbors", "show_lldp_neighbors.textfsm")
+    test_cls = fixture(BenchmarkTest, run_cmds=neighbors)
+    context.items = context.fabric.interfaces if context.fabric else len(neighbors)
+    return lambda: test_cls.get_local_topology(sort=sort)
+
+
+@benchmark("get_local_topology_local", "micro")
+def get_local_topology_local(context: BenchmarkContext):
+    return _local_topology(context, "local")
+
+
+@benchmark("get_local_topology_target", "micro")
+def get_local_topology_target(context: BenchmarkContext):
+    return _local_topology(context, "target")
+
+
+@benchmark("check_cli_output_for_errors", "micro")
+def check_cli_output_for_errors(context: BenchmarkContext):
+    lldp_output = context.output("show lldp neighbors")
+    bgp_output = context.output("show bgp ipv6 unicast summary wide")
+    context.reset()
+    outputs = [
+        ("show lldp neighbors", lldp_output),
+        (
+            "show lldp neighbors",
+            lldp_output + "\n'sysdb' detected the 'warning' condition",
+        ),
+        ("show bgp ipv6 unicast summary wide", bgp_output),
+    ]
+    context.items = len(outputs)
+    return lambda: [
+        BenchmarkTest.check_cli_output_for_errors(cmd, output)
+        for cmd, output in outputs
+    ]
+
+
+def _textfsm(context: BenchmarkContext, **kwargs):
+    output = context.output("show bgp ipv6 unicast summary wide")
+    textfsm_file = "show_bgp_ipv6_unicast_summary_wide.textfsm"
+    try:
+        BenchmarkTest.parse_with_textfsm(output, textfsm_file, **kwargs)
+    except AttributeError as e:
+        raise SkipBenchmark(str(e))
+    context.items = len(output.splitlines())
+    return lambda: BenchmarkTest.parse_with_textfsm(output, textfsm_file, **kwargs)
+
+
+@benchmark("textfsm_nested", "micro")
+def textfsm_nested(context: BenchmarkContext):
+    return _textfsm(context)
+
+
+@benchmark("textfsm_simple", "micro")
+def textfsm_simple(context: BenchmarkContext):
+    return _textfsm(context, simple_output=True)
+
+
+@benchmark("textfsm_columnar", "micro")
+def textfsm_columnar(context: BenchmarkContext):
+    return _textfsm(context, columnar=True)
+
+
+@benchmark("keep_x_interfaces_unshut", "micro")
+def keep_x_interfaces_unshut(context: BenchmarkContext):
+    topology = _local_topology(context, "target")()
+    test_cls = fixture(BenchmarkTest, get_local_topology=topology, apply_configs=None)
+    interface_count = test_cls._count_interfaces(topology, sort="target")
+    context.items = interface_count
+    return lambda: test_cls.keep_x_interfaces_unshut(
+        target_count=interface_count // 4, sort="target"
+    )
+
+
+@benchmark("ecmp_setup", "macro")
+def ecmp_setup(context: BenchmarkContext):
+    """
+    Connects, clears BGP, and waits for it to converge and be restored, as ECMP tests' common setup does.
+    """
+
+    def flow():
+        test_cls = context.reset()
+        test_cls.start_step("Ssh into {UUT}")(test_cls.connect_to_uut)()
+        test_cls.start_step("Get topology")(test_cls.save_original_topology)()
+        test_cls.start_step("Clear BGP sessions")(test_cls.clear_bgp_sessions_hard)()
+        test_cls.troubleshootable_step(
+            "Wait for BGP to converge", troubleshoot_categories="bgp_convergence"
+        )(test_cls.check_bgp_convergence)(convergence_attempts=11)
+        test_cls.start_step("Take an initial snapshot of all BGP peers")(
+            test_cls.take_golden_bgp_peers_snapshot
+        )()
+        test_cls.start_step("Verify BGP snapshot is unchanged")(
+            test_cls.verify_bgp_peers_restored
+        )()
+
+    return flow
+
+
+@benchmark("ecmp_verify", "macro")
+def ecmp_verify(context: BenchmarkContext):
+    """
+    Keeps fewer and fewer interfaces unshut, and checks that traffic is balanced across them, as xr_ecmp_test1's verify_ecmp loop does.
+    """
+    interfaces = context.fabric.interfaces if context.fabric else 64
+    path_counts = [interfaces // 2**power for power in range(4)]
+
+    def flow():
+        test_cls = context.reset()
+        test_cls.start_step("Ssh into {UUT}")(test_cls.connect_to_uut)()
+        test_cls.start_step("Get topology")(test_cls.save_original_topology)()
+        for num_paths in path_counts:
+            test_cls.start_step(f"Keep {num_paths} interfaces")(
+                test_cls.keep_x_interfaces_unshut
+            )(
+                target_count=num_paths,
+                interested_devices=context.devices,
+                sort="target",
+            )
+            traffic_data = test_cls.start_step("Get outbound packets for each rtsw")(
+                test_cls.get_traffic_stats_for_each_device
+            )(interested_devices=context.devices, stat_name="OutMbps")
+            test_cls.start_step(
+                "Ensure the outbound packet rates are balanced across all interfaces"
+            )(test_cls.verify_similar_rates)(data=traffic_data, threshold=0.9, stdev=2)
+
+    return flow
+
+
+def measure(function: Callable, group: str, rounds: int) -> dict:
+    """
+    Times function <rounds> times after one warm-up call.
+    Micro benchmarks repeat the function enough times per round to take at least 0.2 seconds (see timeit.Timer.autorange()).
+    """
+    timer = timeit.Timer(function, timer=perf_counter)
+    if group == "micro":
+        loops, _ = timer.autorange()
+    else:
+        function()
+        loops = 1
+
+    seconds = [total / loops for total in timer.repeat(repeat=rounds, number=loops)]
+    return {
+        "group": group,
+        "loops": loops,
+        "rounds": rounds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+        "mean": statistics.mean(seconds),
+        "stdev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(
+    context: BenchmarkContext,
+    names: List[str],
+    rounds: Dict[str, int],
+) -> Dict[str, dict]:
+    results = {}
+    for name in names:
+        group, setup = BENCHMARKS[name]
+        context.items = None
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            try:
+                function = setup(context)
+            except SkipBenchmark as e:
+                results[name] = {"group": group, "skipped": str(e)}
+                continue
+
+            commands = context.fabric.commands if context.fabric else 0
+            result = measure(function, group, rounds[group])
+
+        if context.items:
+            result["items"] = context.items
+        if group == "macro":
+            calls = result["loops"] * (result["rounds"] + 1)
+            result["steps"] = context.steps.results
+            result["failed_steps"] = context.steps.failures
+            result["waited_seconds"] = BenchmarkTest.waited_seconds
+            if context.fabric:
+                result["commands"] = (context.fabric.commands - commands) // calls
+            if result["failed_steps"]:
+                # the flow did not run the way it does on a device, so its timing means little
+                result["errored"] = f"{len(result['failed_steps'])} steps failed"
+        results[name] = result
+        if "errored" in result:
+            print(
+                f"{name}: {format_seconds(result['median'])} (errored: {result['errored']}: {result['failed_steps'][0]})"
+            )
+        else:
+            print(f"{name}: {format_seconds(result['median'])}")
+    return results
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: float = 0.1, statistic: str = "min"
+) -> List[dict]:
+    """
+    Compares each benchmark's <statistic> to the baseline's.
+    A benchmark regressed if it is more than <tolerance> (a fraction) slower than the baseline.
+    A benchmark errored if any of its steps failed (see run_benchmarks()).
+
+    Output
+    ------
+    [{"name", "baseline", "current", "change", "status"}, ...], where status is "faster", "slower", "unchanged", "regressed", "new", "skipped", or "errored"
+    """
+    comparisons = []
+    for name, result in results["benchmarks"].items():
+        previous = (
+            baseline["benchmarks"][name] if name in baseline["benchmarks"] else {}
+        )
+        comparison = {"name": name, "baseline": None, "current": None, "change": None}
+        if "skipped" in result or "skipped" in previous:
+            comparison["status"] = "skipped"
+        elif "errored" in result:
+            comparison["current"] = result[statistic]
+            comparison["status"] = "errored"
+        elif not previous:
+            comparison["current"] = result[statistic]
+            comparison["status"] = "new"
+        else:
+            change = result[statistic] / previous[statistic] - 1
+            comparison.update(
+                baseline=previous[statistic], current=result[statistic], change=change
+            )
+            if change > tolerance:
+                comparison["status"] = "regressed"
+            elif change > tolerance / 2:
+                comparison["status"] = "slower"
+            elif change < -tolerance / 2:
+                comparison["status"] = "faster"
+            else:
+                comparison["status"] = "unchanged"
+        comparisons.append(comparison)
+    return comparisons
+
+
+def comparison_table(comparisons: List[dict]) -> str:
+    table = Texttable(max_width=0)
+    table.header(["Benchmark", "Baseline", "Current", "Change", "Status"])
+    for comparison in comparisons:
+        table.add_row(
+            [
+                comparison["name"],
+                (
+                    format_seconds(comparison["baseline"])
+                    if comparison["baseline"] is not None
+                    else "-"
+                ),
+                (
+                    format_seconds(comparison["current"])
+                    if comparison["current"] is not None
+                    else "-"
+                ),
+                (
+                    f"{comparison['change']:+.1%}"
+                    if comparison["change"] is not None
+                    else "-"
+                ),
+                comparison["status"],
+            ]
+        )
+    return table.draw()
+
+
+def install_backend(arguments) -> BenchmarkContext:
+    textfsm_folder = arguments.textfsm_folder
+    if textfsm_folder is None:
+        textfsm_folder = tempfile.mkdtemp(prefix="parapyats_benchmark_") + os.sep
+        for filename, template in TEXTFSM_TEMPLATES.items():
+            with open(os.path.join(textfsm_folder, filename), "w") as template_file:
+                template_file.write(template)
+
+    if arguments.backend == "replay":
+        settings = {
+            "module": "sste_replay",
+            "mode": "replay",
+            "archive": arguments.archive,
+        }
+    else:
+        settings = {
+            "module": "sste_simulator",
+            "routers": arguments.routers,
+            "bgp_peers": arguments.bgp_peers,
+            "interfaces": arguments.interfaces,
+            "time_scale": 0,
+        }
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        backend = Parent_Test.install_sste_backend(settings)
+    fabric = backend.fabric if hasattr(backend, "fabric") else None
+    context = BenchmarkContext(backend, fabric, textfsm_folder)
+    context.settings = settings
+    return context
+
+
+def import_time(module: str, rounds: int = 5) -> dict:
+    """
+    Imports module in <rounds> fresh interpreters with -X importtime, and keeps the fastest import.
+
+    Output
+    ------
+    {"seconds": cumulative import time, "imports": {module imported along the way: its own import time, slowest first}}
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [folder, environment.get("PYTHONPATH")])
+    )
+    # "import time:  <self us> | <cumulative us> | <nesting spaces><module>"
+    line_pattern = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+    fastest = None
+    for _ in range(rounds):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            env=environment,
+            cwd=folder,
+        )
+        if process.returncode:
+            raise RuntimeError(f"Cannot import {module}: {process.stderr.strip()}")
+
+        imports = {}
+        seconds = None
+        for line in process.stderr.splitlines():
+            match = line_pattern.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, nesting, name = match.groups()
+            if len(nesting) > 1:
+                imports[name] = int(self_us) / 1e6
+            elif name == module:
+                seconds = int(cumulative_us) / 1e6
+                break
+            else:
+                # imported before module started, e.g. by site: not part of its cost
+                imports = {}
+
+        if seconds is not None and (fastest is None or seconds < fastest["seconds"]):
+            fastest = {
+                "seconds": seconds,
+                "imports": dict(
+                    sorted(imports.items(), key=lambda item: item[1], reverse=True)
+                ),
+            }
+    return fastest
+
+
+def check_import_times(modules: List[str], budget: float, rounds: int = 5) -> int:
+    """
+    Prints the import time of each module, and returns 1 if any exceeds <budget> seconds.
+    """
+    table = Texttable()
+    table.header(["Module", "Import time", "Slowest imports"])
+    over_budget = []
+    for module in modules:
+        result = import_time(module, rounds)
+        slowest = ", ".join(
+            f"{name} {format_seconds(seconds)}"
+            for name, seconds in list(result["imports"].items())[:3]
+        )
+        table.add_row([module, format_seconds(result["seconds"]), slowest])
+        if result["seconds"] > budget:
+            over_budget.append(module)
+    print(table.draw())
+
+    if over_budget:
+        print(
+            f"{len(over_budget)} modules take longer than {format_seconds(budget)} to import: {', '.join(over_budget)}"
+        )
+        return 1
+    return 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parapyats framework against a local device stand-in."
+    )
+    parser.add_argument("--group", choices=["micro", "macro", "all"], default="all")
+    parser.add_argument(
+        "--only", default=None, help="Only run benchmarks whose name matches this regex"
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="Rounds per micro benchmark"
+    )
+    parser.add_argument(
+        "--macro-rounds", type=int, default=3, help="Rounds per macro benchmark"
+    )
+    parser.add_argument("--output", default="parapyats_benchmark.json")
+    parser.add_argument(
+        "--baseline", default=None, help="A previous output to compare the results to"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Fraction by which a benchmark may be slower than the baseline",
+    )
+    parser.add_argument("--statistic", choices=["min", "median", "mean"], default="min")
+    parser.add_argument(
+        "--backend", choices=["simulator", "replay"], default="simulator"
+    )
+    parser.add_argument(
+        "--archive", default="sste_session.json.gz", help="sste_replay archive"
+    )
+    parser.add_argument(
+        "--textfsm-folder",
+        default=None,
+        help="Folder of textfsm templates. Defaults to templates matching sste_simulator's outputs",
+    )
+    parser.add_argument("--routers", type=int, default=8)
+    parser.add_argument("--bgp-peers", type=int, default=2000)
+    parser.add_argument("--interfaces", type=int, default=64)
+    parser.add_argument(
+        "--import-budget",
+        type=float,
+        default=None,
+        help="Only check that each of the framework's modules imports within this many milliseconds",
+    )
+    arguments = parser.parse_args(argv)
+
+    if arguments.import_budget is not None:
+        return check_import_times(
+            IMPORT_MODULES, arguments.import_budget / 1000, arguments.rounds
+        )
+
+    logger = logging.getLogger("parapyats_benchmark")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    names = [
+        name
+        for name, (group, setup) in BENCHMARKS.items()
+        if arguments.group in (group, "all")
+        and (arguments.only is None or re.search(arguments.only, name))
+    ]
+
+    context = install_backend(arguments)
+    try:
+        benchmarks = run_benchmarks(
+            context,
+            names,
+            {"micro": arguments.rounds, "macro": arguments.macro_rounds},
+        )
+    finally:
+        context.backend.close()
+        Parent_Test.sste_backend = None
+
+    results = {
+        "version": 1,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": context.settings,
+        "benchmarks": benchmarks,
+    }
+    with open(arguments.output, "w") as output_file:
+        json.dump(results, output_file, indent=4)
+    print(f"Saved results to {arguments.output}")
+
+    errored = [name for name, result in benchmarks.items() if "errored" in result]
+    if errored:
+        print(f"{len(errored)} benchmarks had failed steps: {', '.join(errored)}")
+
+    if arguments.baseline is None:
+        return 1 if errored else 0
+
+    with open(arguments.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline["settings"] != results["settings"]:
+        print(
+            f"Warning: the baseline ran with different settings ({baseline['settings']})"
+        )
+    comparisons = compare(results, baseline, arguments.tolerance, arguments.statistic)
+    print(comparison_table(comparisons))
+
+    regressions = [c["name"] for c in comparisons if c["status"] == "regressed"]
+    if regressions:
+        print(
+            f"{len(regressions)} benchmarks regressed by more than {arguments.tolerance:.0%}: {', '.join(regressions)}"
+        )
+        return 1
+    return 1 if errored else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Record/replay backend for the sste functions that reach routers and traffic generators.
+
+In "record" mode, each patched function runs as usual, and its output and duration are saved per (function, router, key) into a gzipped json archive.
+In "replay" mode, the outputs are served back from the archive in the order they were recorded, optionally sleeping for the recorded duration.
+Parent_Test.wait() is also replaced in "replay" mode, since there is no device to wait for: it sleeps for the wait times latency_scale.
+This allows parapyats flows to run without a testbed, so framework overhead can be measured on its own.
+
+Install it from test_data:
+    sste_backend:
+        module: sste_replay
+        mode: replay
+        archive: ecmp_session.json.gz
+        latency_scale: 0
+"""
+
+import gzip, json, threading
+from time import time, sleep
+from typing import Any, Callable, Dict, Tuple
+
+import sste_common, sste_tgn
+
+
+def _router(script_args) -> str:
+    if script_args and "current_alias" in script_args:
+        return script_args["current_alias"]
+    return ""
+
+
+def _commands(args: dict) -> str:
+    cmds = args["sste_commands"]
+    return cmds if isinstance(cmds, str) else "\n".join(cmds)
+
+
+def _cli_key(args, kwargs) -> Tuple[str, str]:
+    return _router(args[1]), _commands(args[0])
+
+
+def _tgn_key(args, kwargs) -> Tuple[str, str]:
+    # (script_args, tgn or url, ...): only the remaining arguments identify the call
+    return "tgn", repr((args[2:], sorted(kwargs.items())))
+
+
+# (module, function name) -> function that returns the (router, key) of a call from its (args, kwargs)
+PATCHES: Dict[Tuple[Any, str], Callable] = {
+    (sste_common, "exec_commands"): _cli_key,
+    (sste_common, "safe_config_commands"): _cli_key,
+    (sste_common, "scp"): lambda args, kwargs: (_router(args[0]), args[2]["cmd"]),
+    (sste_common, "_get_connection"): lambda args, kwargs: (args[2], ""),
+    (sste_common, "get_version_info"): lambda args, kwargs: (_router(args[0]), ""),
+    (sste_common, "init_nest_data"): lambda args, kwargs: (_router(args[1]), ""),
+    (sste_common, "xr_check_trace_dump"): lambda args, kwargs: (_router(args[2]), ""),
+    (sste_common, "ixia_getstatsurl"): lambda args, kwargs: ("tgn", ""),
+    **{
+        (sste_tgn, function_name): _tgn_key
+        for function_name in [
+            "tgn_connect",
+            "tgn_start_traffic",
+            "tgn_stop_traffic",
+            "tgn_clear_stats",
+            "tgn_get_stats_flexible",
+            "ixia_get_traffic_items",
+            "ixia_enable_traffic_item",
+            "ixia_disable_traffic_item",
+            "ixia_apply_traffic_items",
+        ]
+    },
+}
+
+
+class ReplaySession:
+    """
+    Stands in for the ssh session returned by sste_common._get_connection() during replay.
+    """
+
+    def __init__(self, device: str):
+        self.device = device
+
+    def disconnect(self):
+        pass
+
+    def __repr__(self):
+        return f"ReplaySession({self.device})"
+
+
+class SessionArchive:
+    """
+    Recorded calls: {function: {router: {key: [[output number, seconds], ...]}}}.
+    Identical outputs are stored once.
+    """
+
+    def __init__(self):
+        self.outputs = []
+        self.output_numbers = {}  # serialized output -> output number
+        self.calls = {}
+        self.positions = {}  # (function, router, key) -> next call to replay
+        self.lock = threading.Lock()
+
+    def add(self, function: str, router: str, key: str, output, seconds: float):
+        serialized_output = json.dumps(output, default=repr, sort_keys=True)
+        with self.lock:
+            if serialized_output not in self.output_numbers:
+                self.output_numbers[serialized_output] = len(self.outputs)
+                self.outputs.append(json.loads(serialized_output))
+            self.calls.setdefault(function, {}).setdefault(router, {}).setdefault(
+                key, []
+            ).append([self.output_numbers[serialized_output], round(seconds, 4)])
+
+    def next(self, function: str, router: str, key: str):
+        """
+        Returns (output, seconds) of the next recorded call, repeating the last one once all are replayed.
+        Returns None if the call was never recorded.
+        """
+        try:
+            calls = self.calls[function][router][key]
+        except KeyError:
+            return None
+        with self.lock:
+            position = self.positions.get((function, router, key), 0)
+            self.positions[(function, router, key)] = position + 1
+        output_number, seconds = calls[min(position, len(calls) - 1)]
+        return self.outputs[output_number], seconds
+
+    def save(self, path: str):
+        with self.lock:
+            archive = {"version": 1, "outputs": self.outputs, "calls": self.calls}
+        with gzip.open(path, "wt", encoding="utf-8") as archive_file:
+            json.dump(archive, archive_file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str):
+        with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+            archive = json.load(archive_file)
+        session_archive = cls()
+        session_archive.outputs = archive["outputs"]
+        session_archive.calls = archive["calls"]
+        return session_archive
+
+
+class ReplayBackend:
+    """
+    Patches the functions in PATCHES to record their calls into, or replay them from, a SessionArchive.
+
+    mode: str
+        "record" or "replay"
+
+    archive: str
+        Path of the gzipped json archive. Written by close() when recording, and read when replaying.
+
+    latency_scale: float (default: 0)
+        During replay, sleep for the recorded duration times latency_scale, and for Parent_Test.wait()'s seconds times latency_scale. 0 replays without delay.
+
+    strict: bool (default: True)
+        During replay, raise KeyError for calls that were not recorded. If False, return "" instead.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        archive: str,
+        latency_scale: float = 0,
+        strict: bool = True,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown sste_replay mode: {mode}")
+
+        self.mode = mode
+        self.path = archive
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.archive = (
+            SessionArchive.load(archive) if mode == "replay" else SessionArchive()
+        )
+        self.originals = {}
+        self.calls = 0
+        self.misses = 0
+        self.waited_seconds = 0
+
+    def _wrap(self, function_name: str, original: Callable, get_key: Callable):
+        def record(*args, **kwargs):
+            start_time = time()
+            output = original(*args, **kwargs)
+            router, key = get_key(args, kwargs)
+            stored_output = None if function_name == "_get_connection" else output
+            self.archive.add(
+                function_name, router, key, stored_output, time() - start_time
+            )
+            self.calls += 1
+            return output
+
+        def replay(*args, **kwargs):
+            router, key = get_key(args, kwargs)
+            self.calls += 1
+            recorded = self.archive.next(function_name, router, key)
+            if recorded is None:
+                self.misses += 1
+                if self.strict:
+                    raise KeyError(
+                        f"sste_replay: no recorded {function_name} call on '{router}' for {key!r}"
+                    )
+                return ""
+
+            output, seconds = recorded
+            if self.latency_scale:
+                sleep(seconds * self.latency_scale)
+            if function_name == "_get_connection":
+                return ReplaySession(router)
+            return output
+
+        wrapper = record if self.mode == "record" else replay
+        wrapper.__name__ = function_name
+        wrapper.__wrapped__ = original
+        return wrapper
+
+    def _wait(self, test_cls, seconds):
+        test_cls.log(f"Wait {seconds} seconds (replayed)")
+        self.waited_seconds += seconds
+        if self.latency_scale:
+            sleep(seconds * self.latency_scale)
+
+    def install(self):
+        for (module, function_name), get_key in PATCHES.items():
+            original = getattr(module, function_name, None)
+            if original is None:
+                continue
+            self.originals[(module, function_name)] = original
+            setattr(module, function_name, self._wrap(function_name, original, get_key))
+
+        if self.mode == "replay":
+            # parapyats imports this module when it installs the backend, so it is loaded by now
+            from parapyats import Parent_Test
+
+            # the classmethod object itself, so that uninstall() can put it back as is
+            self.originals[(Parent_Test, "wait")] = Parent_Test.__dict__["wait"]
+            Parent_Test.wait = classmethod(self._wait)
+        return self
+
+    def uninstall(self):
+        for (module, function_name), original in self.originals.items():
+            setattr(module, function_name, original)
+        self.originals = {}
+
+    def close(self):
+        """
+        Restores the original functions, and saves the archive if recording.
+        """
+        self.uninstall()
+        if self.mode == "record":
+            self.archive.save(self.path)
+
+    def summary(self) -> str:
+        if self.mode == "record":
+            return f"recorded {self.calls} calls into {self.path}"
+        return f"replayed {self.calls - self.misses}/{self.calls} calls from {self.path}, skipped {self.waited_seconds}s of waits"
+
+
+_backend = None
+
+
+def install(
+    mode: str = "replay",
+    archive: str = "sste_session.json.gz",
+    latency_scale: float = 0,
+    strict: bool = True,
+) -> ReplayBackend:
+    """
+    Installs a ReplayBackend, replacing the one installed before, if any.
+    """
+    global _backend
+    if _backend is not None:
+        _backend.close()
+    _backend = ReplayBackend(mode, archive, latency_scale, strict).install()
+    return _backend
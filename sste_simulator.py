@@ -0,0 +1,374 @@
+"""
+Simulated router fabric that stands in for the sste device layer.
+
+Every router answers the commands parapyats uses with synthetic IOS XR style outputs sized by the fabric settings.
+Each command takes <latency> seconds plus <latency_per_kb> seconds per KB of output (both times time_scale), and can fail at a configured rate.
+This shows how the framework scales (e.g. 50 routers with 5,000 BGP peers each) without testbed time.
+
+Install it from test_data:
+    sste_backend:
+        module: sste_simulator
+        routers: 50
+        bgp_peers: 5000
+        interfaces: 64
+        latency: {"default": 0.05, "show bgp": 0.5}
+        failures: {"show lldp neighbor": 0.05}
+"""
+
+import ast, random, threading, zlib
+from time import time, sleep, strftime, gmtime
+from typing import Dict, Union
+
+import sste_common, sste_tgn
+
+LLDP_WARNING = "'sysdb' detected the 'warning' condition"
+
+
+class SimulatedSession:
+    """
+    Stands in for the ssh session returned by sste_common._get_connection().
+    """
+
+    def __init__(self, device: str):
+        self.device = device
+
+    def disconnect(self):
+        pass
+
+    def __repr__(self):
+        return f"SimulatedSession({self.device})"
+
+
+class SimulatedFabric:
+    """
+    Generates each router's outputs from a random generator seeded by the router name, so outputs are stable across calls.
+
+    routers: int (default: 8)
+        Number of routers named <router_prefix><number> that a router has LLDP neighbors with.
+
+    bgp_peers: int (default: 64)
+        BGP peers per router.
+
+    interfaces: int (default: 64)
+        FourHundredGigE interfaces per router, spread over routers as LLDP neighbors.
+
+    line_cards: int (default: 8)
+
+    latency: float or dict (default: 0)
+        Seconds per command, or {cmd_prefix: seconds}, where the longest matching prefix applies and "default" applies otherwise.
+
+    latency_per_kb: float (default: 0)
+        Extra seconds per KB of output.
+
+    time_scale: float (default: 1)
+        Multiplies every latency. 0 disables sleeping, but latencies are still counted in simulated_seconds.
+
+    failures: dict (default: None)
+        {cmd_prefix: rate} or {cmd_prefix: {"rate": rate, "output": output}}. A failing command returns the failure output instead of its normal output.
+
+    streams: list (default: ["stream-1"])
+        Ixia traffic items.
+
+    seed: int (default: 0)
+    """
+
+    def __init__(
+        self,
+        routers: int = 8,
+        bgp_peers: int = 64,
+        interfaces: int = 64,
+        line_cards: int = 8,
+        router_prefix: str = "rtsw-",
+        latency: Union[float, Dict[str, float]] = 0,
+        latency_per_kb: float = 0,
+        time_scale: float = 1,
+        failures: dict = None,
+        streams: list = ["stream-1"],
+        seed: int = 0,
+    ):
+        self.routers = routers
+        self.bgp_peers = bgp_peers
+        self.interfaces = interfaces
+        self.line_cards = line_cards
+        self.router_prefix = router_prefix
+        self.latency = latency if isinstance(latency, dict) else {"default": latency}
+        self.latency_per_kb = latency_per_kb
+        self.time_scale = time_scale
+        self.failures = {
+            cmd_prefix: failure if isinstance(failure, dict) else {"rate": failure}
+            for cmd_prefix, failure in (failures or {}).items()
+        }
+        self.streams = streams
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.start_time = time()
+
+        self.commands = 0
+        self.failed_commands = 0
+        self.simulated_seconds = 0.0
+
+        self.generators = {
+            "show lldp neighbor": self.show_lldp_neighbors,
+            "show bgp ipv6 unicast summary": self.show_bgp_summary,
+            "show bgp ipv6 unicast convergence": self.show_bgp_convergence,
+            "show interfaces counters rates": self.show_interface_rates,
+            "show platform": self.show_platform,
+            "show clock": self.show_clock,
+            "show logging": self.show_logging,
+        }
+
+    def router_random(self, router: str) -> random.Random:
+        return random.Random(self.seed ^ zlib.crc32(router.encode()))
+
+    def _longest_prefix(self, cmd: str, settings: dict):
+        matches = [prefix for prefix in settings if cmd.startswith(prefix)]
+        return max(matches, key=len) if matches else None
+
+    def interface(self, number: int) -> str:
+        return (
+            f"FourHundredGigE0/{number % self.line_cards}/0/{number // self.line_cards}"
+        )
+
+    def run(self, router: str, cmd: str) -> str:
+        """
+        Returns the output of a cmd on a router, after sleeping for its latency.
+        """
+        prefix = self._longest_prefix(cmd, self.failures)
+        with self.lock:
+            failed = (
+                prefix is not None
+                and self.random.random() < self.failures[prefix]["rate"]
+            )
+
+        if failed:
+            output = (
+                self.failures[prefix]["output"]
+                if "output" in self.failures[prefix]
+                else (
+                    LLDP_WARNING
+                    if cmd.startswith("show lldp neighbor")
+                    else f"% Failed to execute '{cmd}'"
+                )
+            )
+        else:
+            generator = self._longest_prefix(cmd, self.generators)
+            output = self.generators[generator](router, cmd) if generator else ""
+
+        prefix = self._longest_prefix(cmd, self.latency)
+        latency = self.latency[prefix] if prefix else self.latency.get("default", 0)
+        latency += self.latency_per_kb * len(output) / 1024
+
+        with self.lock:
+            self.commands += 1
+            self.failed_commands += failed
+            self.simulated_seconds += latency
+        if self.time_scale:
+            sleep(latency * self.time_scale)
+        return output
+
+    def show_lldp_neighbors(self, router: str, cmd: str) -> str:
+        lines = [
+            "Capability codes:",
+            "        (R) Router, (B) Bridge, (T) Telephone, (C) DOCSIS Cable Device",
+            "        (W) WLAN Access Point, (P) Repeater, (S) Station, (O) Other",
+            "",
+            "Device ID       Local Intf                        Hold-time  Capability     Port ID",
+        ]
+        for number in range(self.interfaces):
+            neighbor = f"{self.router_prefix}{number % self.routers + 1}"
+            lines.append(
+                f"{neighbor:<15} {self.interface(number):<33} 120        R               {self.interface(number)}"
+            )
+        lines += ["", f"Total entries displayed: {self.interfaces}"]
+        return "\n".join(lines)
+
+    def show_bgp_summary(self, router: str, cmd: str) -> str:
+        router_random = self.router_random(router)
+        lines = [
+            "BGP router identifier 10.0.0.1, local AS number 65000",
+            "BGP generic scan interval 60 secs",
+            "BGP table state: Active",
+            "",
+            "Neighbor        Spk    AS TblVer  InQ OutQ  Up/Down  St/PfxRcd",
+        ]
+        for number in range(self.bgp_peers):
+            lines.append(
+                f"fc00::{number // 256:x}:{number % 256:x}  0 {65001 + number % 16:>5} {router_random.randint(1000, 9999):>6}"
+                f"    0    0 1d02h {router_random.randint(1, 500):>13}"
+            )
+        return "\n".join(lines)
+
+    def show_bgp_convergence(self, router: str, cmd: str) -> str:
+        return "\n".join(
+            [
+                "Converged.",
+                "All received updates have been processed",
+                "All RIBs/FIBs have been updated",
+            ]
+        )
+
+    def show_interface_rates(self, router: str, cmd: str) -> str:
+        lines = ["Interface                        InMbps   InKpps  OutMbps  OutKpps"]
+        with self.lock:
+            rates = [self.random.gauss(180, 4) for _ in range(self.interfaces)]
+        for number, rate in enumerate(rates):
+            lines.append(
+                f"{self.interface(number):<32} {rate:>7.1f} {rate * 10:>8.1f} {rate:>8.1f} {rate * 10:>8.1f}"
+            )
+        return "\n".join(lines)
+
+    def show_platform(self, router: str, cmd: str) -> str:
+        lines = [
+            "Node              Type                       State                    Config state",
+            "-" * 80,
+            "0/RP0/CPU0        8800-RP(Active)            IOS XR RUN               NSHUT",
+            "0/RP1/CPU0        8800-RP(Standby)           IOS XR RUN               NSHUT",
+        ]
+        for line_card in range(self.line_cards):
+            lines.append(
+                f"{f'0/{line_card}/CPU0':<17} 88-LC0-36FH                IOS XR RUN               NSHUT"
+            )
+        return "\n".join(lines)
+
+    def show_clock(self, router: str, cmd: str) -> str:
+        now = gmtime()
+        return strftime("%H:%M:%S.000 UTC %a %b %d %Y", now)
+
+    def show_logging(self, router: str, cmd: str) -> str:
+        return "\n".join(
+            [
+                "Syslog logging: enabled (0 messages dropped, 0 flushes, 0 overruns)",
+                "Log Buffer (2097152 bytes):",
+                "",
+                strftime(
+                    "RP/0/RP0/CPU0:%b %d %H:%M:%S.000 UTC: bgp[1]: %%ROUTING-BGP-5-ADJCHANGE : neighbor fc00::0:0 Up",
+                    gmtime(self.start_time),
+                ),
+            ]
+        )
+
+    def summary(self) -> str:
+        return (
+            f"simulated {self.commands} commands ({self.failed_commands} failed), "
+            f"{self.simulated_seconds:.1f}s of simulated device time"
+        )
+
+
+class SimulatorBackend:
+    """
+    Patches the sste functions that reach devices to run on a SimulatedFabric.
+    """
+
+    def __init__(self, fabric: SimulatedFabric):
+        self.fabric = fabric
+        self.originals = {}
+
+    def _router(self, script_args) -> str:
+        if script_args and "current_alias" in script_args:
+            return script_args["current_alias"]
+        return ""
+
+    def _run_commands(self, args: dict, script_args) -> str:
+        cmds = args["sste_commands"]
+        if isinstance(cmds, str):
+            cmds = ast.literal_eval(cmds) if cmds.startswith("[") else [cmds]
+        router = self._router(script_args)
+        return "\n".join(self.fabric.run(router, cmd) for cmd in cmds)
+
+    def _stats(
+        self,
+        script_args,
+        tgn,
+        streams: list = None,
+        interested_fields: list = None,
+        print_output: bool = True,
+        **kwargs,
+    ) -> dict:
+        if not streams:
+            streams = (
+                script_args["ixia_streamlist"]
+                if script_args and "ixia_streamlist" in script_args
+                else []
+            )
+        frames = str(int((time() - self.fabric.start_time) * 100000))
+        stats = {
+            "Tx Frames": frames,
+            "Rx Frames": frames,
+            "Loss %": "0",
+            "Tx Frame Rate": "100000",
+            "Rx Frame Rate": "100000",
+        }
+        if interested_fields:
+            stats = {
+                field: value
+                for field, value in stats.items()
+                if field in interested_fields
+            }
+        return {stream: dict(stats) for stream in streams}
+
+    def _traffic_items(self, script_args, *args, **kwargs) -> bool:
+        script_args["ixia_streamlist"] = {
+            stream: stream for stream in self.fabric.streams
+        }
+        return True
+
+    def functions(self) -> dict:
+        succeed = lambda *args, **kwargs: True
+        return {
+            (sste_common, "exec_commands"): self._run_commands,
+            (sste_common, "safe_config_commands"): lambda args, script_args: (
+                self._run_commands(args, script_args) or "commit successful"
+            ),
+            (sste_common, "scp"): succeed,
+            (
+                sste_common,
+                "_get_connection",
+            ): lambda script_args, testbed, router, *args: SimulatedSession(router),
+            (sste_common, "get_version_info"): succeed,
+            (sste_common, "init_nest_data"): succeed,
+            (sste_common, "xr_check_trace_dump"): lambda *args, **kwargs: False,
+            (sste_common, "ixia_getstatsurl"): lambda *args, **kwargs: "simulated",
+            (sste_tgn, "tgn_connect"): succeed,
+            (sste_tgn, "tgn_start_traffic"): succeed,
+            (sste_tgn, "tgn_stop_traffic"): succeed,
+            (sste_tgn, "tgn_clear_stats"): succeed,
+            (sste_tgn, "tgn_get_stats_flexible"): self._stats,
+            (sste_tgn, "ixia_get_traffic_items"): self._traffic_items,
+            (sste_tgn, "ixia_enable_traffic_item"): succeed,
+            (sste_tgn, "ixia_disable_traffic_item"): succeed,
+            (sste_tgn, "ixia_apply_traffic_items"): succeed,
+        }
+
+    def install(self):
+        for (module, function_name), function in self.functions().items():
+            self.originals[(module, function_name)] = getattr(
+                module, function_name, None
+            )
+            setattr(module, function_name, function)
+        return self
+
+    def close(self):
+        for (module, function_name), original in self.originals.items():
+            if original is None:
+                delattr(module, function_name)
+            else:
+                setattr(module, function_name, original)
+        self.originals = {}
+
+    def summary(self) -> str:
+        return self.fabric.summary()
+
+
+_backend = None
+
+
+def install(**fabric_settings) -> SimulatorBackend:
+    """
+    Installs a SimulatorBackend on a SimulatedFabric(**fabric_settings), replacing the one installed before, if any.
+    """
+    global _backend
+    if _backend is not None:
+        _backend.close()
+    _backend = SimulatorBackend(SimulatedFabric(**fabric_settings)).install()
+    return _backend
@@ -0,0 +1,412 @@
+"""
+Loads test_data yaml files: validates them once, and compiles the parts that parapyats looks up repeatedly.
+
+The compiled form (CompiledTestData) holds:
+- each testcase's config numbers, positive ones (applied by number) and cleanup ones (negative, applied by cleanup_configs()) sorted,
+- each testcase's traffic groups, as lists of stream names (None for a null group, which means all streams),
+- the active testcases, without the ones that are always skipped,
+- the format templates found in configs, parsed into FormatTemplates for _format().
+
+The loaded test_data and its compiled form are pickled into <cache_folder>/<file name>.<sha256 of the file>.pickle,
+so later runs of an unchanged file skip yaml parsing and validation entirely. Editing the file changes its hash, which invalidates the cache.
+Only point cache_folder at a folder you trust: the cache is unpickled.
+
+With strict=True (or test_data["strict_templates"], checked by Parent_Test.set_test_data()), templates that use keys test_data lacks
+are reported when test_data is loaded, instead of as warnings when they are formatted mid-run.
+
+Usage (in a pyats job file)
+-----
+from test_data_loader import load_test_data
+run(testscript="ecmp_test.py", test_data=load_test_data("ecmp.yaml"))
+
+python test_data_loader.py ecmp.yaml  # validates the file and its templates, and writes its cache
+"""
+
+import hashlib, os, pickle, re, string, sys
+from typing import Dict, List, Optional, Tuple
+
+# part of the cache file names: bump it whenever CompiledTestData or FormatTemplate changes
+CACHE_VERSION = 3
+
+CONFIG_KEYS = {"purpose", "router", "path", "file", "cmds"}
+TRAFFIC_GROUP_PATTERN = re.compile(r"^group\w+$")
+FIELD_PATTERN = re.compile(r"{(\w+)}")  # only text with such a field is formatted
+
+
+class TestDataError(ValueError):
+    """
+    test_data does not match the schema. errors lists every problem found.
+    """
+
+    def __init__(self, source: str, errors: List[str]):
+        self.source = source
+        self.errors = errors
+        super().__init__(f"{len(errors)} problems in {source}:\n" + "\n".join(errors))
+
+
+class TestData(dict):
+    """
+    test_data as loaded from yaml, with its CompiledTestData in .compiled.
+    """
+
+    compiled = None
+
+
+class CompiledTestData:
+    """
+    config_numbers: {testcase: ([positive config numbers], [cleanup config numbers])}, both sorted in ascending order.
+
+    traffic_groups: {testcase: {"group<N>": [stream names], or None if the group is null (all streams)}}
+
+    active_testcases: [testcase], in test_data["active_testcases"]'s order, without test_data["always_skip_testcases"]
+
+    templates: {text: FormatTemplate}, for the config texts that are formatted
+    """
+
+    def __init__(self):
+        self.config_numbers: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.traffic_groups: Dict[str, Dict[str, Optional[List[str]]]] = {}
+        self.active_testcases: List[str] = []
+        self.templates: Dict[str, FormatTemplate] = {}
+
+
+class FormatTemplate:
+    """
+    A text to format with str.format(**values), parsed once into literal and field segments (see Parent_Test._format()).
+    Text without any {name} field is left as it is.
+    Text whose fields are all plain {name} fields renders by looking each field up.
+    Any other text, e.g. with positional fields or format specs, is rendered by str.format().
+
+    formats: bool
+        False if the text is left as it is.
+
+    segments: ((literal, field name or None), ...), or None if str.format() renders the text
+
+    fields: tuple
+        Names of the fields the text uses.
+    """
+
+    __slots__ = ("text", "formats", "segments", "fields")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.formats = FIELD_PATTERN.search(text) is not None
+        self.segments = None
+        self.fields = ()
+        if not self.formats:
+            return
+
+        self.fields = tuple(dict.fromkeys(FIELD_PATTERN.findall(text)))
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError:
+            return
+        if all(
+            field_name is None
+            or (field_name.isidentifier() and not format_spec and not conversion)
+            for _, field_name, format_spec, conversion in parsed
+        ):
+            self.segments = tuple(
+                (literal, field_name) for literal, field_name, _, _ in parsed
+            )
+            self.fields = tuple(
+                dict.fromkeys(
+                    field_name for _, field_name in self.segments if field_name
+                )
+            )
+
+    def render(self, values: dict) -> str:
+        """
+        Raises KeyError for a field values lacks, like str.format().
+        """
+        if not self.formats:
+            return self.text
+        if self.segments is None:
+            return self.text.format(**values)
+        return "".join(
+            [
+                (
+                    literal
+                    if field_name is None
+                    else literal + format(values[field_name], "")
+                )
+                for literal, field_name in self.segments
+            ]
+        )
+
+    def missing(self, values: dict) -> List[str]:
+        return [field_name for field_name in self.fields if field_name not in values]
+
+    def __repr__(self):
+        return f"FormatTemplate({self.text!r})"
+
+
+def _is_string_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _mapping(value) -> dict:
+    return value if isinstance(value, dict) else {}
+
+
+def _validate_config(config_data, location: str, errors: List[str]):
+    if isinstance(config_data, str) or _is_string_list(config_data):
+        return
+    if not isinstance(config_data, dict):
+        errors.append(
+            f"{location}: expected a command, a list of commands, or a mapping"
+        )
+        return
+
+    unknown_keys = sorted(str(key) for key in config_data if key not in CONFIG_KEYS)
+    if unknown_keys:
+        errors.append(
+            f"{location}: unknown keys {', '.join(unknown_keys)} (expected {', '.join(sorted(CONFIG_KEYS))})"
+        )
+    for key in ("purpose", "router", "path", "file"):
+        if key in config_data and not isinstance(config_data[key], str):
+            errors.append(f"{location}.{key}: expected a string")
+    if "cmds" in config_data and not (
+        isinstance(config_data["cmds"], str) or _is_string_list(config_data["cmds"])
+    ):
+        errors.append(f"{location}.cmds: expected a command or a list of commands")
+
+
+def validate(test_data) -> List[str]:
+    """
+    Returns the problems found in test_data, or an empty list if it matches the schema.
+    Only the parts parapyats interprets are checked: testcase_data, golden_configs, active_testcases, and always_skip_testcases.
+    """
+    if not isinstance(test_data, dict):
+        return ["test_data: expected a mapping"]
+
+    errors = []
+    for key in ("active_testcases", "always_skip_testcases"):
+        if key in test_data and not _is_string_list(test_data[key]):
+            errors.append(f"{key}: expected a list of testcase names")
+
+    golden_configs = test_data.get("golden_configs", {})
+    if not isinstance(golden_configs, dict):
+        errors.append("golden_configs: expected a mapping of router to configs")
+        golden_configs = {}
+    for router, config_data in golden_configs.items():
+        _validate_config(config_data, f"golden_configs.{router}", errors)
+
+    testcase_data = test_data.get("testcase_data", {})
+    if not isinstance(testcase_data, dict):
+        errors.append("testcase_data: expected a mapping of testcase to its data")
+        testcase_data = {}
+    for testcase, data in testcase_data.items():
+        location = f"testcase_data.{testcase}"
+        if not isinstance(data, dict):
+            errors.append(f"{location}: expected a mapping")
+            continue
+
+        configs = data.get("configs", {})
+        if not isinstance(configs, dict):
+            errors.append(
+                f"{location}.configs: expected a mapping of config number to config"
+            )
+            configs = {}
+        for config_num, config_data in configs.items():
+            if isinstance(config_num, bool) or not isinstance(config_num, int):
+                errors.append(
+                    f"{location}.configs.{config_num}: config numbers must be integers"
+                )
+            _validate_config(config_data, f"{location}.configs.{config_num}", errors)
+
+        traffic = data.get("traffic", {})
+        if not isinstance(traffic, dict):
+            errors.append(
+                f"{location}.traffic: expected a mapping of group<N> to streams"
+            )
+            traffic = {}
+        for group, streams in traffic.items():
+            if not TRAFFIC_GROUP_PATTERN.match(str(group)):
+                errors.append(f"{location}.traffic.{group}: expected a group<N> key")
+            if not (
+                streams is None or isinstance(streams, str) or _is_string_list(streams)
+            ):
+                errors.append(
+                    f"{location}.traffic.{group}: expected a stream or a list of streams"
+                )
+
+        routers = data.get("additional_routers_used", [])
+        if not (isinstance(routers, str) or _is_string_list(routers)):
+            errors.append(
+                f"{location}.additional_routers_used: expected a router or a list of routers"
+            )
+    return errors
+
+
+def _config_strings(config_data) -> List[str]:
+    if isinstance(config_data, str):
+        return [config_data]
+    if isinstance(config_data, list):
+        return [item for item in config_data if isinstance(item, str)]
+    if not isinstance(config_data, dict):
+        return []
+    strings = [
+        config_data[key]
+        for key in ("purpose", "router", "path", "file")
+        if isinstance(config_data.get(key), str)
+    ]
+    return strings + _config_strings(config_data.get("cmds", []))
+
+
+def compile_test_data(test_data: dict) -> CompiledTestData:
+    """
+    Builds the CompiledTestData of test_data.
+    test_data is not validated here (see validate()): entries that don't match the schema are left out.
+    """
+    compiled = CompiledTestData()
+    configs = list(_mapping(test_data.get("golden_configs")).values())
+
+    for testcase, data in _mapping(test_data.get("testcase_data")).items():
+        if not isinstance(data, dict):
+            continue
+        testcase_configs = _mapping(data.get("configs"))
+        config_numbers = sorted(
+            config_num
+            for config_num in testcase_configs.keys()
+            if isinstance(config_num, int)
+        )
+        compiled.config_numbers[testcase] = (
+            [config_num for config_num in config_numbers if config_num > 0],
+            [config_num for config_num in config_numbers if config_num < 0],
+        )
+        configs.extend(testcase_configs.values())
+
+        compiled.traffic_groups[testcase] = {
+            group: (
+                [streams]
+                if isinstance(streams, str)
+                else None if streams is None else list(streams)
+            )
+            for group, streams in _mapping(data.get("traffic")).items()
+            if streams is None or isinstance(streams, (str, list))
+        }
+
+    always_skipped_testcases = set(test_data.get("always_skip_testcases") or [])
+    compiled.active_testcases = [
+        testcase
+        for testcase in test_data.get("active_testcases") or []
+        if testcase not in always_skipped_testcases
+    ]
+
+    for config_data in configs:
+        for text in _config_strings(config_data):
+            if text not in compiled.templates:
+                template = FormatTemplate(text)
+                if template.formats:
+                    compiled.templates[text] = template
+    return compiled
+
+
+def check_templates(test_data: dict, compiled: CompiledTestData = None) -> List[str]:
+    """
+    Returns a problem for each of test_data's templates (see CompiledTestData.templates) that uses keys test_data lacks.
+    compiled defaults to test_data.compiled.
+    """
+    if compiled is None:
+        compiled = test_data.compiled
+    return [
+        f"{template.text!r}: missing {', '.join(template.missing(test_data))}"
+        for template in compiled.templates.values()
+        if template.missing(test_data)
+    ]
+
+
+def cache_path(path: str, file_hash: str, cache_folder: str = None) -> str:
+    if cache_folder is None:
+        cache_folder = os.path.join(
+            os.path.dirname(os.path.abspath(path)), ".test_data_cache"
+        )
+    return os.path.join(
+        cache_folder,
+        f"{os.path.basename(path)}.{file_hash[:16]}.v{CACHE_VERSION}.pickle",
+    )
+
+
+def load_test_data(
+    path: str, cache_folder: str = None, use_cache: bool = True, strict: bool = None
+) -> TestData:
+    """
+    Returns the test_data in the yaml file at path, with its compiled form in .compiled.
+    Raises TestDataError if the file does not match the schema (see validate()).
+
+    cache_folder: str (default: .test_data_cache, next to the yaml file)
+
+    use_cache: bool (default: True)
+        If False, always parse the yaml file, and do not write the cache.
+
+    strict: bool (default: test_data["strict_templates"], or False if it is undefined)
+        If True, also raise TestDataError if templates use keys test_data lacks (see check_templates()).
+    """
+    with open(path, "rb") as yaml_file:
+        content = yaml_file.read()
+    cache_file = cache_path(path, hashlib.sha256(content).hexdigest(), cache_folder)
+
+    test_data = None
+    if use_cache and os.path.isfile(cache_file):
+        try:
+            with open(cache_file, "rb") as cache:
+                test_data = pickle.load(cache)
+        except Exception:
+            pass  # unreadable, e.g. cut short: parse the yaml again
+
+    if test_data is None:
+        import yaml
+
+        test_data = yaml.load(
+            content, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        )
+        errors = validate(test_data)
+        if errors:
+            raise TestDataError(path, errors)
+        test_data = TestData(test_data)
+        test_data.compiled = compile_test_data(test_data)
+
+        if use_cache:
+            temporary_file = f"{cache_file}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                with open(temporary_file, "wb") as cache:
+                    pickle.dump(test_data, cache, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary_file, cache_file)
+            except OSError:
+                pass  # e.g. a read-only folder: the next run parses the yaml again
+
+    if strict is None:
+        strict = bool(test_data.get("strict_templates", False))
+    if strict:
+        errors = check_templates(test_data)
+        if errors:
+            raise TestDataError(path, errors)
+    return test_data
+
+
+def main(argv: List[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python test_data_loader.py <test_data yaml> ...")
+        return 2
+
+    problems = 0
+    for path in argv:
+        try:
+            test_data = load_test_data(path, strict=True)
+        except TestDataError as e:
+            print(e)
+            problems += 1
+            continue
+        compiled = test_data.compiled
+        print(
+            f"{path}: {len(compiled.config_numbers)} testcases, "
+            f"{len(compiled.active_testcases)} active, {len(compiled.templates)} templates"
+        )
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+import os, sys
+
+# the framework's modules live at the top of the repository, next to the test scripts that import them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
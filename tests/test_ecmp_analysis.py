@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import ecmp_analysis
+
+
+def test_metrics_are_computed_per_sample_and_per_device():
+    rates, groups, devices, _ = ecmp_analysis.to_rate_matrix(
+        {"a": [[10, 10], [10, 30]], "b": [[20, 20, 20], [20, 20, 20]]}
+    )
+    overall, per_device = ecmp_analysis.distribution_metrics(rates, groups)
+
+    assert devices == ["a", "b"]
+    assert overall["mean"].shape == (2,)
+    assert per_device["mean"].shape == (2, 2)
+    np.testing.assert_allclose(per_device["mean"], [[10, 20], [20, 20]])
+    np.testing.assert_allclose(per_device["max_min_ratio"], [[1, 1], [3, 1]])
+    np.testing.assert_allclose(per_device["jain"][:, 1], [1, 1])
+
+
+def test_verdicts_do_not_depend_on_the_unit():
+    mbps = {"a": [100, 95, 105, 90], "b": [50, 52, 48, 51]}
+    methods = ["cv", "jain", "min_ratio", "max_min_ratio", "stdev_band"]
+
+    in_mbps = ecmp_analysis.analyze(mbps, methods, scope="device")
+    in_kbps = ecmp_analysis.analyze(
+        {device: [rate * 1000 for rate in rates] for device, rates in mbps.items()},
+        methods,
+        scope="device",
+    )
+
+    for method in methods:
+        assert (
+            in_mbps["checks"][method]["passed"] == in_kbps["checks"][method]["passed"]
+        )
+    assert in_mbps["passed"]
+
+
+def test_unbalanced_rates_fail():
+    analysis = ecmp_analysis.analyze([100, 100, 10], ["min_ratio", "cv", "jain"])
+
+    assert not analysis["passed"]
+    assert not any(check["passed"] for check in analysis["checks"].values())
+
+
+def test_scope_selects_overall_or_per_device_checks():
+    data = {"a": [10, 10], "b": [100, 100]}
+
+    assert not ecmp_analysis.analyze(data, ["min_ratio"], scope="overall")["passed"]
+    assert ecmp_analysis.analyze(data, ["min_ratio"], scope="device")["passed"]
+    assert not ecmp_analysis.analyze(data, ["min_ratio"], scope="both")["passed"]
+
+
+def test_devices_without_members_are_skipped():
+    analysis = ecmp_analysis.analyze({"a": [10, 11], "b": []}, ["min_ratio"])
+
+    assert analysis["devices"] == ["a"]
+    assert analysis["empty_devices"] == ["b"]
+    assert analysis["passed"]
+
+
+def test_no_members_at_all_fails():
+    assert not ecmp_analysis.analyze({"a": []})["passed"]
+
+
+def test_unknown_methods_and_uneven_samples_are_rejected():
+    with pytest.raises(ValueError):
+        ecmp_analysis.analyze([1, 2], ["chi_square"])
+    with pytest.raises(ValueError):
+        ecmp_analysis.analyze({"a": [[1, 2], [1, 2]], "b": [1, 2]})
+
+
+def test_running_stats_match_numpy():
+    samples = np.array([[10.0, 20.0], [12.0, 18.0], [11.0, 22.0], [9.0, 19.0]])
+    stats = ecmp_analysis.RunningStats(2)
+    for values in samples:
+        stats.update(values)
+
+    np.testing.assert_allclose(stats.mean, samples.mean(axis=0))
+    np.testing.assert_allclose(stats.variance, samples.var(axis=0, ddof=1))
+    assert stats.is_precise(0.5)
+    assert not stats.is_precise(0.001)
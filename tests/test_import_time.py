@@ -0,0 +1,26 @@
+import pytest
+
+from parapyats_benchmark import IMPORT_MODULES, import_time
+
+# seconds; the framework modules import in tens of milliseconds once their heavy dependencies load lazily
+IMPORT_BUDGET = 0.2
+
+# loaded by parapyats.lazy_import() or inside functions, so importing the framework must not run them
+LAZY_MODULES = [
+    "pyats.aetest",
+    "sste_common",
+    "sste_tgn",
+    "sste_cli_keys",
+    "yaml",
+    "pdb",
+    "texttable",
+]
+
+
+@pytest.mark.parametrize("module", IMPORT_MODULES)
+def test_import_time_is_within_budget(module):
+    result = import_time(module, rounds=3)
+
+    slowest = list(result["imports"].items())[:5]
+    assert result["seconds"] <= IMPORT_BUDGET, f"slowest imports: {slowest}"
+    assert not [name for name in LAZY_MODULES if name in result["imports"]]
@@ -0,0 +1,275 @@
+import pytest
+
+from parapyats import CliErrorScanner, IxiaTrafficState, Parent_Test, SyslogIndex
+
+
+@pytest.fixture
+def commit_history(monkeypatch):
+    """
+    Replaces get_commit_history() with a fixed history: 1000000005 is the newest commit.
+    """
+    commits = [f"100000000{number}" for number in range(5, 0, -1)]
+    history = {
+        "commits": commits,
+        "position": {commit_id: i + 1 for i, commit_id in enumerate(commits)},
+    }
+    monkeypatch.setattr(
+        Parent_Test, "get_commit_history", classmethod(lambda cls: history)
+    )
+    return history
+
+
+def test_plan_rollback_targets_the_commit_before_the_oldest_one(commit_history):
+    plan = Parent_Test.plan_rollback(["1000000005", "1000000004"])
+
+    assert plan["strategy"] == "single"
+    assert plan["cmd"] == "rollback configuration to 1000000003"
+
+
+def test_plan_rollback_counts_commits_made_in_between(commit_history):
+    plan = Parent_Test.plan_rollback(["1000000005", "1000000003"])
+
+    assert plan["cmd"] == "rollback configuration to 1000000002"
+    assert "including 1 made outside" in plan["reason"]
+
+
+def test_plan_rollback_uses_last_when_the_target_is_not_listed(commit_history):
+    plan = Parent_Test.plan_rollback(["1000000001"])
+
+    assert plan["strategy"] == "single"
+    assert plan["cmd"] == "rollback configuration last 5"
+
+
+def test_plan_rollback_walks_sequentially_when_a_commit_is_missing(commit_history):
+    plan = Parent_Test.plan_rollback(["1000000005", "1000000009"])
+
+    assert plan["strategy"] == "sequential"
+    assert plan["cmd"] is None
+    assert "1000000009" in plan["reason"]
+
+
+class FakeTgn:
+    """
+    Records the requests IxiaTrafficState sends, in place of sste_tgn.
+    """
+
+    def __init__(self, apply_results=None):
+        self.requests = []
+        self.apply_results = list(apply_results or [])
+
+    def ixia_enable_traffic_item(self, script_args, tgn_api, streams):
+        self.requests.append(("enable", list(streams)))
+        return True
+
+    def ixia_disable_traffic_item(self, script_args, tgn_api, streams):
+        self.requests.append(("disable", list(streams)))
+        return True
+
+    def ixia_apply_traffic_items(self, script_args, tgn_api):
+        self.requests.append(("apply",))
+        return self.apply_results.pop(0) if self.apply_results else True
+
+
+def test_traffic_state_sends_only_changes():
+    tgn = FakeTgn()
+    state = IxiaTrafficState(tgn)
+
+    state.update({}, "api", enable=["a", "b"])
+    result = state.update({}, "api", enable=["a"], disable=["b"])
+
+    assert tgn.requests == [
+        ("enable", ["a", "b"]),
+        ("apply",),
+        ("disable", ["b"]),
+        ("apply",),
+    ]
+    assert result == {"enabled": [], "disabled": ["b"], "failed": [], "applied": True}
+
+
+def test_traffic_state_skips_the_apply_without_changes():
+    tgn = FakeTgn()
+    state = IxiaTrafficState(tgn)
+    state.update({}, "api", enable=["a"])
+
+    result = state.update({}, "api", enable=["a"])
+
+    assert result["applied"] is None
+    assert tgn.requests == [("enable", ["a"]), ("apply",)]
+    assert state.skipped_applies == 1
+
+
+def test_traffic_state_resends_after_a_failed_apply():
+    tgn = FakeTgn(apply_results=[False])
+    state = IxiaTrafficState(tgn)
+
+    assert state.update({}, "api", enable=["a"])["applied"] is False
+    result = state.update({}, "api", enable=["a"])
+
+    assert result == {"enabled": ["a"], "disabled": [], "failed": [], "applied": True}
+    assert tgn.requests == [("enable", ["a"]), ("apply",)] * 2
+    assert (state.applies, state.failed_applies) == (1, 1)
+
+
+def test_traffic_state_resends_forgotten_streams():
+    tgn = FakeTgn()
+    state = IxiaTrafficState(tgn)
+    state.update({}, "api", enable=["a", "b"])
+
+    state.forget(["a"])
+
+    assert state.plan(enable=["a", "b"]) == (["a"], [])
+    state.forget()
+    assert state.plan(enable=["a", "b"]) == (["a", "b"], [])
+
+
+@pytest.fixture
+def scanner():
+    return CliErrorScanner(
+        {
+            "*": {"fatal error": ["crash"], "error": ["generic"]},
+            "show bgp": {"% BGP instance": ["bgp"]},
+            "show bgp ipv6": {"not active": ["bgp", "ipv6"]},
+        }
+    )
+
+
+def test_scanner_applies_rules_by_cmd_prefix(scanner):
+    output = "% BGP instance 'default' not active"
+
+    assert [
+        hit["message"] for hit in scanner.scan("show bgp ipv6 unicast", output)
+    ] == [
+        "% BGP instance",
+        "not active",
+    ]
+    assert [hit["message"] for hit in scanner.scan("show bgp summary", output)] == [
+        "% BGP instance"
+    ]
+    assert scanner.scan("show run", output) == []
+
+
+def test_scanner_reports_overlapping_messages(scanner):
+    hits = scanner.scan("show run", "xx fatal error yy")
+
+    assert hits == [
+        {"message": "fatal error", "offset": 3, "categories": ["crash"]},
+        {"message": "error", "offset": 9, "categories": ["generic"]},
+    ]
+
+
+def test_scanner_reports_the_first_occurrence_of_each_message(scanner):
+    hits = scanner.scan(["show run", "show bgp"], "error\nerror\n% BGP instance")
+
+    assert [(hit["message"], hit["offset"]) for hit in hits] == [
+        ("error", 0),
+        ("% BGP instance", 12),
+    ]
+
+
+def test_scanner_merges_categories_of_repeated_messages():
+    scanner = CliErrorScanner({"*": {"error": ["a"]}, "show": {"error": ["a", "b"]}})
+
+    assert scanner.scan("show run", "error")[0]["categories"] == ["a", "b"]
+
+
+def test_scanner_without_rules_finds_nothing():
+    assert CliErrorScanner({"show": {}}).scan("show run", "error") == []
+
+
+def test_scanner_reports_partially_overlapping_messages():
+    scanner = CliErrorScanner({"*": {"link down": ["a"], "down state": ["b"]}})
+
+    hits = scanner.scan("show run", "link down state")
+
+    assert [(hit["message"], hit["offset"]) for hit in hits] == [
+        ("link down", 0),
+        ("down state", 5),
+    ]
+
+
+def test_scanner_reports_messages_that_start_at_the_same_offset():
+    scanner = CliErrorScanner({"*": {"error": ["a"], "error code": ["b"]}})
+
+    hits = scanner.scan("show run", "xx error code 5")
+
+    assert [(hit["message"], hit["offset"]) for hit in hits] == [
+        ("error code", 3),
+        ("error", 3),
+    ]
+
+
+class FakeSession:
+    def __init__(self):
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+
+def test_close_device_context_adopts_new_sessions_and_disconnects_duplicates():
+    shared, duplicate, new = FakeSession(), FakeSession(), FakeSession()
+    test_cls = type(
+        "Test",
+        (Parent_Test,),
+        {"script_args": {"uut_list": {"router-a": {"session": shared}}}},
+    )
+    device_cls = type(
+        "Test_router-b",
+        (test_cls,),
+        {
+            "script_args": {
+                "uut_list": {
+                    "router-a": {"session": duplicate},
+                    "router-b": {"session": new},
+                },
+                "current_alias": "router-b",
+            }
+        },
+    )
+
+    test_cls.close_device_context(device_cls)
+
+    assert test_cls.script_args["uut_list"]["router-a"]["session"] is shared
+    assert test_cls.script_args["uut_list"]["router-b"]["session"] is new
+    assert shared.connected and new.connected
+    assert not duplicate.connected
+    assert device_cls.script_args["uut_list"] == {}
+
+
+SHOW_LOGGING = """Mon Oct 19 18:13:57.123 UTC
+Syslog logging: enabled (0 messages dropped, 0 flushes, 0 overruns)
+    Buffer logging: level debugging, 2 messages logged
+
+Log Buffer (2097152 bytes):
+
+RP/0/RP0/CPU0:Oct 19 18:10:01.001 UTC: ifmgr[257]: %PKT_INFRA-LINK-3-UPDOWN : Interface Hu0/0/0/1, changed state to Down
+    retried at Oct 19 18:10:00
+RP/0/RP0/CPU0:Oct 19 18:12:30.500 UTC: bgp[1052]: %ROUTING-BGP-5-ADJCHANGE : neighbor 10.0.0.2 Up
+"""
+
+
+def test_syslog_index_skips_the_lines_before_the_first_entry():
+    index = SyslogIndex()
+
+    assert index.add(SHOW_LOGGING) == 2
+    assert index.entries[0][0] == ("Oct", "19", "18:10:01")
+    assert index.entries[0][1].endswith("retried at Oct 19 18:10:00")
+    assert index.last_timestamp == ("Oct", "19", "18:12:30")
+    assert index.search("UTC") == [line for _, line in index.entries]
+
+
+def test_syslog_index_drops_lines_it_already_has():
+    index = SyslogIndex()
+    index.add(SHOW_LOGGING)
+
+    new_output = "\n".join(
+        [
+            "Mon Oct 19 18:14:10.000 UTC",
+            SHOW_LOGGING.splitlines()[-1],
+            "RP/0/RP0/CPU0:Oct 19 18:14:05.000 UTC: bgp[1052]: %ROUTING-BGP-5-ADJCHANGE : neighbor 10.0.0.2 Down",
+        ]
+    )
+
+    assert index.fetch_cmd() == "show logging start Oct 19 18:12:30"
+    assert index.add(new_output) == 1
+    assert index.search("Down", exclude="Interface") == [new_output.splitlines()[-1]]
@@ -0,0 +1,172 @@
+import pytest
+
+import test_data_loader
+
+TEST_DATA_YAML = """
+active_testcases: [tc1, tc2, tc3]
+always_skip_testcases: [tc2]
+golden_configs:
+  r1: "hostname {UUT}"
+testcase_data:
+  tc1:
+    configs:
+      1: ["interface {interface}", "shutdown"]
+      -1: {"cmds": "no interface {interface}", "router": "{UUT}"}
+      2: {"file": "harddisk:/tc1.cfg"}
+      -2: "no shutdown"
+    traffic:
+      group1: stream1
+      group2: [stream1, stream2]
+      group3:
+"""
+
+
+def test_valid_test_data_has_no_errors():
+    import yaml
+
+    assert test_data_loader.validate(yaml.safe_load(TEST_DATA_YAML)) == []
+
+
+def test_validate_reports_each_problem_with_its_location():
+    errors = test_data_loader.validate(
+        {
+            "active_testcases": "tc1",
+            "testcase_data": {
+                "tc1": {
+                    "configs": {"1": {"cmds": 5, "unknown": ""}},
+                    "traffic": {"streams": [1]},
+                }
+            },
+        }
+    )
+
+    assert "active_testcases: expected a list of testcase names" in errors
+    assert any(
+        error.startswith("testcase_data.tc1.configs.1: config numbers")
+        for error in errors
+    )
+    assert any(error.startswith("testcase_data.tc1.configs.1.cmds") for error in errors)
+    assert any("unknown" in error for error in errors)
+    assert any(
+        error.startswith("testcase_data.tc1.traffic.streams: expected a group")
+        for error in errors
+    )
+    assert any("expected a stream or a list of streams" in error for error in errors)
+
+
+def test_compile_sorts_config_numbers_and_skips_testcases():
+    import yaml
+
+    compiled = test_data_loader.compile_test_data(yaml.safe_load(TEST_DATA_YAML))
+
+    assert compiled.config_numbers["tc1"] == ([1, 2], [-2, -1])
+    assert compiled.active_testcases == ["tc1", "tc3"]
+
+
+def test_compile_keeps_null_traffic_groups_as_all_streams():
+    import yaml
+
+    compiled = test_data_loader.compile_test_data(yaml.safe_load(TEST_DATA_YAML))
+
+    assert compiled.traffic_groups["tc1"] == {
+        "group1": ["stream1"],
+        "group2": ["stream1", "stream2"],
+        "group3": None,
+    }
+
+
+def test_compile_collects_templates_from_configs():
+    import yaml
+
+    compiled = test_data_loader.compile_test_data(yaml.safe_load(TEST_DATA_YAML))
+
+    assert set(compiled.templates) == {
+        "hostname {UUT}",
+        "interface {interface}",
+        "no interface {interface}",
+        "{UUT}",
+    }
+
+
+def test_load_reuses_the_cache_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "test_data.yaml"
+    path.write_text(TEST_DATA_YAML)
+    cache_folder = tmp_path / "cache"
+
+    first = test_data_loader.load_test_data(str(path), cache_folder=str(cache_folder))
+    monkeypatch.setattr(
+        test_data_loader, "validate", lambda test_data: pytest.fail("parsed again")
+    )
+    cached = test_data_loader.load_test_data(str(path), cache_folder=str(cache_folder))
+
+    assert cached == first
+    assert cached.compiled.traffic_groups == first.compiled.traffic_groups
+
+    monkeypatch.undo()
+    path.write_text(TEST_DATA_YAML.replace("tc3", "tc4"))
+    changed = test_data_loader.load_test_data(str(path), cache_folder=str(cache_folder))
+    assert changed.compiled.active_testcases == ["tc1", "tc4"]
+
+
+def test_load_raises_test_data_error(tmp_path):
+    path = tmp_path / "test_data.yaml"
+    path.write_text("active_testcases: tc1\n")
+
+    with pytest.raises(test_data_loader.TestDataError) as error:
+        test_data_loader.load_test_data(str(path), use_cache=False)
+
+    assert error.value.errors == ["active_testcases: expected a list of testcase names"]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "interface {interface}",
+        "{UUT}{UUT} and {{escaped}} {interface}",
+        "no fields here",
+        "rate {rate:>5}",
+        "positional {} and {0}",
+        "attribute {UUT.upper}",
+        "index {paths[0]}",
+        "{{interface}}",
+        "{ spaced }",
+        "broken {interface",
+    ],
+)
+def test_format_template_renders_like_str_format(text):
+    values = {"interface": "Hu0/0/0/1", "UUT": "r1", "rate": 12, "paths": [4]}
+    template = test_data_loader.FormatTemplate(text)
+
+    if not template.formats:
+        assert template.render(values) == text
+        return
+    try:
+        expected = text.format(**values)
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        with pytest.raises(type(e)):
+            template.render(values)
+    else:
+        assert template.render(values) == expected
+
+
+def test_format_template_parses_plain_fields_into_segments():
+    template = test_data_loader.FormatTemplate("interface {interface} on {UUT}")
+
+    assert template.segments == (("interface ", "interface"), (" on ", "UUT"))
+    assert template.fields == ("interface", "UUT")
+    assert template.missing({"UUT": "r1"}) == ["interface"]
+    with pytest.raises(KeyError):
+        template.render({"UUT": "r1"})
+
+
+def test_strict_loading_reports_missing_template_keys(tmp_path):
+    path = tmp_path / "test_data.yaml"
+    path.write_text(TEST_DATA_YAML + "UUT: r1\n")
+
+    with pytest.raises(test_data_loader.TestDataError) as error:
+        test_data_loader.load_test_data(str(path), use_cache=False, strict=True)
+
+    assert error.value.errors == [
+        "'interface {interface}': missing interface",
+        "'no interface {interface}': missing interface",
+    ]